@@ -10,80 +10,736 @@ import ast
 import fitz
 import tempfile
 from io import BytesIO
-from typing import TypedDict, Optional, Dict
+from typing import TypedDict, Optional, Dict, Annotated
 from dotenv import load_dotenv
 from docxtpl import DocxTemplate
+from jinja2 import Environment
 from langchain_groq import ChatGroq
 from langgraph.graph import StateGraph, END
-import subprocess
-import tempfile
+from langgraph.config import get_stream_writer
+import shutil
 import time
-from collections import deque
+import random
+import threading
+import contextvars
+import asyncio
+import inspect
+import logging
+from concurrent.futures import ThreadPoolExecutor
 from langchain_google_genai import ChatGoogleGenerativeAI
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
 import html
+import math
+from collections import Counter
+from llm_cache import get_response_cache
+from skills_lexicon import SKILLS_LEXICON, MAX_PHRASE_TOKENS
+from soffice_pool import get_soffice_pool, WorkerError, ConversionError
+from pdf_extract import extract_resume_layout
+from prompt_budget import estimate_tokens, compress_prompt_inputs, strip_jd_boilerplate
+from tracing import span, add_to_span, set_on_span, current_node, estimate_cost
+
 
+# Operational events (pool failover); per-call detail goes on trace spans
+logger = logging.getLogger("resumeforge")
 
 
 # =========================================================
 # LLM FACTORY (Groq + Gemini)
 # =========================================================
 
-def get_llm(provider: str, api_key: str, rpm: int, model: str):
+_LLM_REGISTRY = {}
+_LLM_REGISTRY_LOCK = threading.Lock()
 
-    if not api_key:
-        raise ValueError(f"{provider} API Key is required")
 
-    limiter = APIRateLimiter(rpm)
+# Extra providers, e.g. the offline benchmark's fake model:
+# {provider: factory(api_key, model) -> chat model}
+CHAT_MODEL_FACTORIES = {}
+
+
+def register_chat_model(provider, factory):
+
+    # Drops cached clients so the next get_llm builds from the new factory
+    CHAT_MODEL_FACTORIES[provider.lower()] = factory
+    clear_llm_registry()
+
 
-    if provider.lower() == "groq":
-        llm = ChatGroq(
+def _build_chat_model(provider, api_key, model):
+
+    if provider in CHAT_MODEL_FACTORIES:
+        return CHAT_MODEL_FACTORIES[provider](api_key, model)
+
+    if provider == "groq":
+        return ChatGroq(
             model=model,
             groq_api_key=api_key,
             temperature=0.2
 
         )
 
-    elif provider.lower() == "gemini":
-        llm = ChatGoogleGenerativeAI(
-            model=model,
-            google_api_key=api_key,
-            temperature=0.2
-        )
+    return ChatGoogleGenerativeAI(
+        model=model,
+        google_api_key=api_key,
+        temperature=0.2
+    )
 
-    else:
-        raise ValueError("Provider must be either 'groq' or 'gemini'")
+
+# Tokens-per-minute budget for single-key providers; unset means RPM only
+DEFAULT_TPM = int(os.getenv("LLM_TPM", 0)) or None
+
+
+def get_llm(provider: str, api_key: str, rpm: int, model: str, tpm: Optional[int] = None):
+
+    provider = provider.lower()
+
+    # "pool" routes across the configured keys/providers (LLM_POOL)
+    if provider == "pool":
+        return get_llm_pool(), NULL_LIMITER
+
+    if not api_key:
+        raise ValueError(f"{provider} API Key is required")
+
+    if provider not in ("groq", "gemini") and provider not in CHAT_MODEL_FACTORIES:
+        raise ValueError("Provider must be either 'groq', 'gemini' or 'pool'")
+
+    # One client + one limiter per (provider, key, model) for the whole
+    # process, so the RPM budget holds across nodes, calls and sessions.
+    key = (provider, api_key, model)
+
+    with _LLM_REGISTRY_LOCK:
+        entry = _LLM_REGISTRY.get(key)
+
+        if entry is None:
+            entry = (_build_chat_model(provider, api_key, model), APIRateLimiter(rpm, tpm or DEFAULT_TPM))
+            _LLM_REGISTRY[key] = entry
+
+    llm, limiter = entry
+    limiter.set_budget(rpm, tpm or DEFAULT_TPM)
 
     return llm, limiter
 
 
+def clear_llm_registry():
+    global _LLM_POOL
+
+    with _LLM_REGISTRY_LOCK:
+        _LLM_REGISTRY.clear()
+        _LLM_POOL = None
+
+
 # =========================================================
 # RATE LIMITER
 # =========================================================
 
 class APIRateLimiter:
-    def __init__(self, rpm: int):
+    # Two token buckets refilled continuously: one counts requests (RPM),
+    # one counts LLM tokens (TPM). A call reserves one request and its
+    # estimated prompt tokens up front; reconcile() then charges the
+    # difference once the response reports actual usage. Waits are the
+    # exact time until both buckets can cover the call.
+
+    def __init__(self, rpm: int, tpm: Optional[int] = None):
         self.rpm = rpm
-        self.calls = deque()
+        self.tpm = tpm
+        self._requests = float(rpm)
+        self._tokens = float(tpm or 0)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def set_budget(self, rpm: int, tpm: Optional[int] = None):
+        with self._lock:
+            self._refill(time.monotonic())
+            if tpm and not self.tpm:
+                self._tokens = float(tpm)
+            self.rpm = rpm
+            self.tpm = tpm
+            self._requests = min(self._requests, float(rpm))
+            if tpm:
+                self._tokens = min(self._tokens, float(tpm))
+
+    def _refill(self, now):
+        # Caller holds the lock
+        elapsed = now - self._updated
+        self._updated = now
+        self._requests = min(float(self.rpm), self._requests + elapsed * self.rpm / 60)
+        if self.tpm:
+            self._tokens = min(float(self.tpm), self._tokens + elapsed * self.tpm / 60)
+
+    def _wait_time(self, tokens):
+        # Seconds until a call of this size fits; 0 when it fits now.
+        # Caller holds the lock and has refilled the buckets.
+        wait = 0.0
+
+        if self._requests < 1:
+            wait = (1 - self._requests) * 60 / self.rpm
+
+        if self.tpm:
+            # A prompt bigger than the whole budget waits for a full bucket
+            # instead of forever
+            needed = min(tokens, self.tpm)
+            if self._tokens < needed:
+                wait = max(wait, (needed - self._tokens) * 60 / self.tpm)
+
+        return wait
+
+    def _try_acquire(self, tokens=0):
+        # Claims a slot and returns None, or returns how long to wait
+        with self._lock:
+            self._refill(time.monotonic())
+
+            wait = self._wait_time(tokens)
+            if wait:
+                return wait
+
+            self._requests -= 1
+            if self.tpm:
+                # May go negative for oversized prompts; later calls wait
+                # for the debt to refill
+                self._tokens -= tokens
+            return None
+
+    def reconcile(self, estimated, actual):
+        # Charge (or refund) the gap between the estimate reserved before
+        # the call and the tokens the provider actually counted
+        if not self.tpm or actual is None:
+            return
+        with self._lock:
+            self._refill(time.monotonic())
+            self._tokens = min(float(self.tpm), self._tokens - (actual - estimated))
+
+    def next_free_in(self, tokens=0):
+        # Like _try_acquire, but only looks
+        with self._lock:
+            self._refill(time.monotonic())
+            return self._wait_time(tokens)
+
+    def remaining(self):
+        # Fraction of the tighter budget currently available
+        with self._lock:
+            self._refill(time.monotonic())
+            free = self._requests / max(self.rpm, 1)
+            if self.tpm:
+                free = min(free, self._tokens / self.tpm)
+            return max(free, 0.0)
+
+    def wait_if_needed(self, tokens=0):
+        while True:
+            sleep_time = self._try_acquire(tokens)
+            if sleep_time is None:
+                return
+
+            # Sleep outside the lock so other threads can still claim
+            time.sleep(sleep_time)
+            add_to_span("limiter_wait_seconds", sleep_time)
+
+    async def await_if_needed(self, tokens=0):
+        # Same budget as wait_if_needed, shared with sync callers, but the
+        # wait yields to the event loop and can be cancelled. The lock is
+        # only held for the arithmetic, never across an await.
+        while True:
+            sleep_time = self._try_acquire(tokens)
+            if sleep_time is None:
+                return
+            await asyncio.sleep(sleep_time)
+            add_to_span("limiter_wait_seconds", sleep_time)
+
+
+class _NullLimiter:
+    # Paired with LLMRouter, which rate-limits each pool entry itself
+    def set_budget(self, rpm, tpm=None):
+        pass
+
+    def wait_if_needed(self, tokens=0):
+        pass
+
+    async def await_if_needed(self, tokens=0):
+        pass
+
+    def reconcile(self, estimated, actual):
+        pass
+
+NULL_LIMITER = _NullLimiter()
+
+
+# =========================================================
+# MULTI-KEY LLM POOL
+# =========================================================
+
+# Errors worth retrying on another key: throttling and provider outages
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+RETRYABLE_MESSAGE_RE = re.compile(
+    r"\b(?:429|50[0234])\b|rate.?limit|quota|too many requests|overloaded|"
+    r"unavailable|resource.?exhausted",
+    re.IGNORECASE
+)
+
+# Cooldown after a retryable failure: base * 2^failures, jittered, capped
+POOL_BACKOFF_BASE = float(os.getenv("LLM_POOL_BACKOFF", 1.0))
+POOL_BACKOFF_MAX = float(os.getenv("LLM_POOL_BACKOFF_MAX", 60.0))
+
+
+def prompt_tokens(prompt):
+    if isinstance(prompt, str):
+        return estimate_tokens(prompt)
+    return sum(estimate_tokens(str(message.content)) for message in prompt)
+
+
+def is_retryable_error(error):
+
+    for attr in ("status_code", "code", "status"):
+        value = getattr(error, attr, None)
+        if isinstance(value, int) and value in RETRYABLE_STATUS:
+            return True
+
+    response = getattr(error, "response", None)
+    if getattr(response, "status_code", None) in RETRYABLE_STATUS:
+        return True
+
+    return bool(RETRYABLE_MESSAGE_RE.search(str(error)))
+
+
+class PoolEntry:
+    def __init__(self, provider, api_key, model, rpm=30, tpm=None, llm=None):
+        self.provider = provider.lower()
+        self.model = model
+        self.rpm = rpm
+        self.tpm = tpm
+        # A prebuilt chat model (e.g. a stub in tests) skips client creation
+        self.llm = llm or _build_chat_model(self.provider, api_key, model)
+        self.limiter = APIRateLimiter(rpm, tpm)
+        self.cooldown_until = 0.0
+        self.failures = 0
+
+    @property
+    def name(self):
+        return f"{self.provider}:{self.model}"
+
+    def cool_down(self):
+        self.failures += 1
+        delay = min(POOL_BACKOFF_MAX, POOL_BACKOFF_BASE * 2 ** (self.failures - 1))
+        self.cooldown_until = time.time() + delay * random.uniform(0.5, 1.5)
+
+    def succeeded(self):
+        self.failures = 0
+        self.cooldown_until = 0.0
+
+
+class LLMRouter:
+    # Looks like a chat model to the nodes: invoke / ainvoke / stream. Each
+    # call goes to the entry with the most budget left in its RPM/TPM
+    # buckets; a 429 or 5xx puts that entry on a jittered cooldown and the
+    # call moves to the next one.
+
+    def __init__(self, entries, temperature=0.2):
+        if not entries:
+            raise ValueError("LLM pool needs at least one entry")
+
+        self.entries = list(entries)
+        self.temperature = temperature
+        # Cache identity: the same pool config replays the same responses
+        self.model_name = ",".join(sorted(entry.name for entry in self.entries))
+        self._lock = threading.Lock()
+
+    @property
+    def rpm(self):
+        return sum(entry.rpm for entry in self.entries)
+
+    def _pick(self, tokens, tried):
+
+        # Returns (entry, wait_seconds); entries already tried for this call
+        # are used only when nothing else is left
+        with self._lock:
+            now = time.time()
+            candidates = [e for e in self.entries if e not in tried] or self.entries
+
+            def wait_for(entry):
+                return max(entry.cooldown_until - now, entry.limiter.next_free_in(tokens))
+
+            ready = [e for e in candidates if wait_for(e) == 0]
+            if ready:
+                return max(ready, key=lambda e: e.limiter.remaining()), 0.0
+
+            entry = min(candidates, key=wait_for)
+            return entry, wait_for(entry)
+
+    def _attempts(self):
+        return len(self.entries) + 1
+
+    def _failed(self, entry, error, tried):
+        if not is_retryable_error(error):
+            raise error
+        with self._lock:
+            entry.cool_down()
+        tried.add(entry)
+        add_to_span("retries", 1)
+        set_on_span(last_error=type(error).__name__)
+        logger.warning("LLM pool: %s failed (%s), trying next entry", entry.name, type(error).__name__)
+
+    def invoke(self, prompt, **kwargs):
+
+        tokens = prompt_tokens(prompt)
+        tried = set()
+        error = None
+
+        for _ in range(self._attempts()):
+            entry, wait = self._pick(tokens, tried)
+            if wait:
+                time.sleep(min(wait, POOL_BACKOFF_MAX))
+                add_to_span("limiter_wait_seconds", min(wait, POOL_BACKOFF_MAX))
+            entry.limiter.wait_if_needed(tokens)
+
+            try:
+                response = entry.llm.invoke(prompt, **kwargs)
+            except Exception as e:
+                self._failed(entry, e, tried)
+                error = e
+                continue
+
+            entry.limiter.reconcile(tokens, charged_tokens(response))
+            entry.succeeded()
+            set_on_span(entry=entry.name)
+            return response
+
+        raise error
+
+    async def ainvoke(self, prompt, **kwargs):
+
+        tokens = prompt_tokens(prompt)
+        tried = set()
+        error = None
+
+        for _ in range(self._attempts()):
+            entry, wait = self._pick(tokens, tried)
+            if wait:
+                await asyncio.sleep(min(wait, POOL_BACKOFF_MAX))
+                add_to_span("limiter_wait_seconds", min(wait, POOL_BACKOFF_MAX))
+            await entry.limiter.await_if_needed(tokens)
+
+            try:
+                response = await entry.llm.ainvoke(prompt, **kwargs)
+            except Exception as e:
+                self._failed(entry, e, tried)
+                error = e
+                continue
+
+            entry.limiter.reconcile(tokens, charged_tokens(response))
+            entry.succeeded()
+            set_on_span(entry=entry.name)
+            return response
+
+        raise error
+
+    def stream(self, prompt, **kwargs):
+
+        # Fails over only before the first chunk; a stream that breaks
+        # midway cannot be resumed on another key
+        tokens = prompt_tokens(prompt)
+        tried = set()
+        error = None
+
+        for _ in range(self._attempts()):
+            entry, wait = self._pick(tokens, tried)
+            if wait:
+                time.sleep(min(wait, POOL_BACKOFF_MAX))
+                add_to_span("limiter_wait_seconds", min(wait, POOL_BACKOFF_MAX))
+            entry.limiter.wait_if_needed(tokens)
+
+            started = False
+            usage_chunk = None
+            try:
+                for chunk in entry.llm.stream(prompt, **kwargs):
+                    started = True
+                    if getattr(chunk, "usage_metadata", None):
+                        usage_chunk = chunk
+                    yield chunk
+            except Exception as e:
+                if started:
+                    raise
+                self._failed(entry, e, tried)
+                error = e
+                continue
+
+            entry.limiter.reconcile(tokens, charged_tokens(usage_chunk))
+            entry.succeeded()
+            set_on_span(entry=entry.name)
+            return
+
+        raise error
+
+    def status(self):
+        now = time.time()
+        return [
+            {
+                "entry": entry.name,
+                "rpm": entry.rpm,
+                "tpm": entry.tpm,
+                "remaining": round(entry.limiter.remaining(), 3),
+                "cooldown_seconds": round(max(0.0, entry.cooldown_until - now), 1),
+                "failures": entry.failures
+            }
+            for entry in self.entries
+        ]
+
+
+_LLM_POOL = None
+
+
+def configure_llm_pool(entries):
+
+    # entries: PoolEntry objects or dicts with provider, api_key, model,
+    # rpm, tpm (and optionally a prebuilt llm)
+    global _LLM_POOL
+
+    pool = LLMRouter([
+        entry if isinstance(entry, PoolEntry) else PoolEntry(**entry)
+        for entry in entries
+    ])
+
+    with _LLM_REGISTRY_LOCK:
+        _LLM_POOL = pool
+
+    return pool
+
+
+def get_llm_pool():
+
+    with _LLM_REGISTRY_LOCK:
+        pool = _LLM_POOL
+
+    if pool is not None:
+        return pool
+
+    # LLM_POOL is a JSON list of entries; api_key may name an env var
+    raw = os.getenv("LLM_POOL")
+    if not raw:
+        raise ValueError("LLM pool is not configured (set LLM_POOL or call configure_llm_pool)")
+
+    entries = json.loads(raw)
+    for entry in entries:
+        key = entry.get("api_key", "")
+        entry["api_key"] = os.getenv(key, key)
+
+    return configure_llm_pool(entries)
+
+# =========================================================
+# PER-NODE TOKEN USAGE
+# =========================================================
+
+class NodeUsage:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.response_cache_hits = 0
+        self.input_tokens = 0
+        self.cached_input_tokens = 0
+        self.output_tokens = 0
+
+    def add(self, input_tokens=0, cached_input_tokens=0, output_tokens=0, cache_hit=False):
+        with self._lock:
+            if cache_hit:
+                self.response_cache_hits += 1
+                return
+            self.calls += 1
+            self.input_tokens += input_tokens
+            self.cached_input_tokens += cached_input_tokens
+            self.output_tokens += output_tokens
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "calls": self.calls,
+                "response_cache_hits": self.response_cache_hits,
+                "input_tokens": self.input_tokens,
+                "cached_input_tokens": self.cached_input_tokens,
+                "uncached_input_tokens": self.input_tokens - self.cached_input_tokens,
+                "output_tokens": self.output_tokens
+            }
+
+
+# Set by timed_node for the duration of a node; worker threads inside a node
+# must run under contextvars.copy_context() to report into it
+_NODE_USAGE = contextvars.ContextVar("node_usage", default=None)
+
+
+def token_usage(response):
+
+    # Returns (input, cached input, output) tokens. LangChain normalises
+    # usage_metadata; older integrations only expose the provider payload.
+    usage = getattr(response, "usage_metadata", None) or {}
+    metadata = getattr(response, "response_metadata", None) or {}
+    raw = metadata.get("token_usage") or metadata.get("usage") or {}
+
+    input_tokens = usage.get("input_tokens") or raw.get("prompt_tokens") or 0
+    output_tokens = usage.get("output_tokens") or raw.get("completion_tokens") or 0
+    cached = (
+        (usage.get("input_token_details") or {}).get("cache_read")
+        or (raw.get("prompt_tokens_details") or {}).get("cached_tokens")
+        or raw.get("cached_content_token_count")
+        or 0
+    )
+
+    return input_tokens, cached, output_tokens
+
+
+def charged_tokens(response):
+    # Tokens the provider counts against TPM; None when it did not say, so
+    # the limiter keeps the estimate
+    input_tokens, _, output_tokens = token_usage(response)
+    return (input_tokens + output_tokens) or None
+
+
+def record_llm_usage(response):
+
+    usage = _NODE_USAGE.get()
+    if usage is None:
+        return
+
+    if response is None:
+        usage.add(cache_hit=True)
+        return
+
+    input_tokens, cached, output_tokens = token_usage(response)
+    usage.add(input_tokens, cached, output_tokens)
+
+# =========================================================
+# CACHED LLM INVOCATION
+# =========================================================
+
+def _llm_identity(llm):
+    provider = type(llm).__name__
+    model = getattr(llm, "model_name", None) or getattr(llm, "model", None)
+    temperature = getattr(llm, "temperature", None)
+    return provider, model, temperature
+
+
+def _cache_prompt(prompt):
+    # Message lists are keyed by role and content only
+    if isinstance(prompt, str):
+        return prompt
+    return [[message.type, message.content] for message in prompt]
+
+
+def extend_prompt(prompt, text):
+    # Follow-up instructions go after the original messages so the cached
+    # system prefix stays identical
+    if isinstance(prompt, str):
+        return f"{prompt}\n{text}"
+    return list(prompt) + [HumanMessage(content=text)]
+
+
+def _cached_response(llm, prompt, use_cache):
+
+    # Returns (cache, key, cached AIMessage or None); key is None when the
+    # cache is not consulted
+    cache = get_response_cache()
+
+    if not use_cache or cache.bypass:
+        return cache, None, None
+
+    provider, model, temperature = _llm_identity(llm)
+    key = cache.make_key(provider, model, temperature, _cache_prompt(prompt))
+    cached = cache.get(key)
+
+    if cached is None:
+        return cache, key, None
+
+    record_llm_usage(None)
+    return cache, key, AIMessage(content=cached)
+
+
+def _store_response(cache, key, response, validate):
+    # Only keep responses the caller could actually use, so a truncated
+    # generation is not replayed on the next attempt
+    if key is not None and (validate is None or validate(response.content)):
+        cache.set(key, response.content)
+
+
+def _payload_bytes(content):
+    if isinstance(content, str):
+        return len(content.encode("utf-8"))
+    if isinstance(content, list) and content and hasattr(content[0], "content"):
+        return sum(_payload_bytes(message.content) for message in content)
+    return len(str(content).encode("utf-8"))
+
+
+def _llm_span(llm, prompt):
+    # Labelled with the calling node; records sizes, never the text
+    return span(
+        "llm",
+        current_node(),
+        model=_llm_identity(llm)[1],
+        prompt_bytes=_payload_bytes(prompt),
+        cache_hit=False
+    )
+
+
+def _trace_response(trace, response, cache_hit=False):
+
+    trace.set(response_bytes=_payload_bytes(response.content))
+
+    if cache_hit:
+        trace.set(cache_hit=True)
+        return
+
+    input_tokens, cached, output_tokens = token_usage(response)
+    trace.set(
+        input_tokens=input_tokens,
+        cached_input_tokens=cached,
+        output_tokens=output_tokens,
+        cost_usd=estimate_cost(trace.attrs.get("model"), input_tokens, output_tokens)
+    )
+
+
+def invoke_llm(llm, limiter, prompt, use_cache=True, validate=None):
+
+    with _llm_span(llm, prompt) as trace:
+        cache, key, cached = _cached_response(llm, prompt, use_cache)
+        if cached is not None:
+            _trace_response(trace, cached, cache_hit=True)
+            return cached
+
+        trace.set(limiter_wait_seconds=0.0)
+        tokens = prompt_tokens(prompt)
+        limiter.wait_if_needed(tokens)
+        response = llm.invoke(prompt)
+        limiter.reconcile(tokens, charged_tokens(response))
+        record_llm_usage(response)
+        _trace_response(trace, response)
+
+    _store_response(cache, key, response, validate)
+
+    return response
+
 
-    def wait_if_needed(self):
-        current_time = time.time()
+async def ainvoke_llm(llm, limiter, prompt, use_cache=True, validate=None, timeout=None):
 
-        # Remove old timestamps
-        while self.calls and current_time - self.calls[0] > 60:
-            self.calls.popleft()
+    with _llm_span(llm, prompt) as trace:
+        cache, key, cached = _cached_response(llm, prompt, use_cache)
+        if cached is not None:
+            _trace_response(trace, cached, cache_hit=True)
+            return cached
 
-        if len(self.calls) >= self.rpm:
-            sleep_time = 60 - (current_time - self.calls[0])
-            if sleep_time > 0:
-                print(f"Rate limit reached. Sleeping for {int(sleep_time)} seconds...")
-                time.sleep(sleep_time)
+        trace.set(limiter_wait_seconds=0.0)
+        tokens = prompt_tokens(prompt)
+        await limiter.await_if_needed(tokens)
 
-        self.calls.append(time.time())
+        # The timeout covers the request itself, not the time queued on the limiter
+        response = await asyncio.wait_for(llm.ainvoke(prompt), timeout)
+        limiter.reconcile(tokens, charged_tokens(response))
+        record_llm_usage(response)
+        _trace_response(trace, response)
+
+    _store_response(cache, key, response, validate)
+
+    return response
 
 # =========================================================
 # STATE
 # =========================================================
 
+def merge_dicts(left, right):
+    return {**(left or {}), **(right or {})}
+
+
 class ResumeState(TypedDict):
     structured_resume: Optional[Dict]
     resume_text: Optional[str]
@@ -92,24 +748,35 @@ class ResumeState(TypedDict):
     ats_score: Optional[Dict]
     gap_questions: Optional[list]
     user_answers: Optional[Dict]
+    # "incremental" (default) regenerates only the sections answers touch
+    update_mode: Optional[str]
+    # Per-request timeout (seconds) for model calls on the async path
+    llm_timeout: Optional[float]
     provider: str
     api_key: str
     rpm: int
     model: str  
+    jd_keywords: Optional[list]
+    resume_keywords: Optional[list]
+    use_cache: Optional[bool]
+    stream: Optional[bool]
+    generation_report: Optional[Dict]
+    additional_analysis: Optional[Dict]
+    # Compressed job_description / user_info / resume_text for generation
+    prompt_inputs: Optional[Dict]
+    prompt_budget: Optional[Dict]
+    # Parallel branches each report their own timing, so merge instead of overwrite
+    node_timings: Annotated[dict, merge_dicts]
+    llm_usage: Annotated[dict, merge_dicts]
 
 # =========================================================
 # UTILITIES
 # =========================================================
 
-def extract_text_from_pdf(file_bytes):
-    pdf = fitz.open(stream=file_bytes, filetype="pdf")
-    text = ""
-    for page in pdf:
-        text += page.get_text()
-    return text
-
-def clean_text(text):
-    return re.sub(r"\s+", " ", text).strip()
+def clean_resume_text(text):
+    # Collapses whitespace but keeps one entry per line so headings and bullets survive
+    lines = (re.sub(r"[ \t\u00a0]+", " ", line).strip() for line in text.splitlines())
+    return "\n".join(line for line in lines if line)
 
 def safe_json_parse(text):
     text = re.sub(r"```json|```", "", text)
@@ -125,169 +792,728 @@ def safe_json_parse(text):
             return {}
 
 # =========================================================
-# ATS SCORING (UNCHANGED)
+# STREAMING JSON PARSER
 # =========================================================
 
-def extract_keywords(text):
-    return set(re.findall(r"\b[A-Za-z]{4,}\b", text.lower()))
+class TruncatedJSONError(ValueError):
+    def __init__(self, message, text="", sections=None, open_key=None):
+        super().__init__(message)
+        self.text = text
+        self.sections = sections or {}
+        self.open_key = open_key
+
+
+class IncrementalJSONParser:
+    """Feeds on streamed text and reports top-level sections (and each
+    element of top-level arrays) as soon as their JSON closes."""
+
+    def __init__(self):
+        self.buffer = ""
+        self.sections = {}
+        self.done = False
+        self._pos = 0
+        self._started = False
+        self._stack = []
+        self._in_string = False
+        self._escape = False
+        self._string_is_key = False
+        self._expect = "key"
+        self._key = None
+        self._value_start = None
+        self._item_start = None
+        self._item_index = 0
+
+    @property
+    def open_key(self):
+        # Top-level key whose value had started but not closed
+        if self._value_start is not None and self._key not in self.sections:
+            return self._key
+        return None
+
+    def feed(self, chunk):
+        self.buffer += chunk
+        events = []
+        buf = self.buffer
+
+        for i in range(self._pos, len(buf)):
+            if self.done:
+                break
+
+            c = buf[i]
+
+            if not self._started:
+                if c == "{":
+                    self._started = True
+                    self._stack.append(c)
+                continue
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif c == "\\":
+                    self._escape = True
+                elif c == '"':
+                    self._in_string = False
+                    if self._string_is_key:
+                        self._key = self._loads(buf[self._value_start:i + 1])
+                        self._value_start = None
+                        self._string_is_key = False
+                        self._expect = "colon"
+                continue
+
+            if c.isspace():
+                continue
+
+            depth = len(self._stack)
+            in_top_array = depth == 2 and self._stack[1] == "["
+
+            if c == ":" and depth == 1:
+                self._expect = "value"
+
+            elif c == ",":
+                if depth == 1:
+                    if self._expect == "scalar":
+                        self._emit_section(buf[self._value_start:i], events)
+                    self._expect = "key"
+                elif in_top_array and self._item_start is not None:
+                    self._emit_item(buf[self._item_start:i], events)
+
+            elif c in "{[":
+                if depth == 1 and self._expect == "value":
+                    self._value_start = i
+                    self._expect = "container"
+                    self._item_index = 0
+                elif in_top_array and self._item_start is None:
+                    self._item_start = i
+                self._stack.append(c)
+
+            elif c in "}]":
+                if in_top_array and c == "]" and self._item_start is not None:
+                    self._emit_item(buf[self._item_start:i], events)
+                if depth == 1 and self._expect == "scalar":
+                    self._emit_section(buf[self._value_start:i], events)
+
+                self._stack.pop()
+                depth = len(self._stack)
+
+                if depth == 0:
+                    self.done = True
+                elif depth == 1:
+                    self._emit_section(buf[self._value_start:i + 1], events)
+                    self._expect = "comma"
+                elif depth == 2 and self._stack[1] == "[" and self._item_start is not None:
+                    self._emit_item(buf[self._item_start:i + 1], events)
+
+            else:
+                if c == '"':
+                    self._in_string = True
+                    self._string_is_key = depth == 1 and self._expect == "key"
+
+                if depth == 1 and self._expect in ("key", "value"):
+                    self._value_start = i
+                    if self._expect == "value":
+                        self._expect = "scalar"
+                elif in_top_array and self._item_start is None:
+                    self._item_start = i
+
+        self._pos = len(buf)
+        return events
+
+    def _loads(self, raw):
+        raw = raw.strip()
+        try:
+            return json.loads(raw)
+        except ValueError:
+            try:
+                return ast.literal_eval(raw)
+            except Exception:
+                return None
+
+    def _emit_section(self, raw, events):
+        value = self._loads(raw)
+        self.sections[self._key] = value
+        self._value_start = None
+        events.append({"type": "section", "key": self._key, "value": value})
+
+    def _emit_item(self, raw, events):
+        value = self._loads(raw)
+        self._item_start = None
+        events.append({
+            "type": "item",
+            "key": self._key,
+            "index": self._item_index,
+            "value": value
+        })
+        self._item_index += 1
+
+
+def _chunk_text(chunk):
+    content = chunk.content
+    if isinstance(content, str):
+        return content
+    return chunk.text
+
+
+def _stream_writer():
+    try:
+        return get_stream_writer()
+    except Exception:
+        # Called outside a streaming graph run
+        return lambda event: None
 
-def calculate_keyword_score(resume_text, jd_text):
-    resume_words = extract_keywords(resume_text)
-    jd_words = extract_keywords(jd_text)
-    if not jd_words:
-        return 0
-    return int((len(resume_words & jd_words) / len(jd_words)) * 100)
 
-def calculate_quant_score(resume_text):
-    numbers = re.findall(r"\d+%|\d+\+?|\₹\d+", resume_text)
-    return min(len(numbers) * 10, 100)
+def stream_llm_json(llm, limiter, prompt, emit, use_cache=True):
 
-# =========================================================
-# NODE 1 — GENERATE RESUME (UNCHANGED)
-# =========================================================
+    parser = IncrementalJSONParser()
 
-def generate_resume_node(state: ResumeState):
+    with _llm_span(llm, prompt) as trace:
+        cache, key, cached = _cached_response(llm, prompt, use_cache)
+        if cached is not None:
+            _trace_response(trace, cached, cache_hit=True)
+            for event in parser.feed(cached.content):
+                emit(event)
+            return cached.content, parser, None
 
-    prompt = f"""
-You are a Senior Executive Resume Strategist, ATS Optimization Expert, and Truth-Validation Auditor.
+        trace.set(limiter_wait_seconds=0.0, streamed=True)
+        tokens = prompt_tokens(prompt)
+        limiter.wait_if_needed(tokens)
 
-MISSION:
-Create a HIGH-IMPACT, ATS-OPTIMIZED, KPI-DRIVEN resume aligned precisely with the Job Description.
+        parts = []
+        finish_reason = None
+        usage_chunk = None
+        first_chunk_at = None
 
-CRITICAL RULES (VERY IMPORTANT):
+        for chunk in llm.stream(prompt):
+            if first_chunk_at is None:
+                first_chunk_at = trace.elapsed()
+                trace.set(first_chunk_seconds=round(first_chunk_at, 4))
 
-1. STRICT NO-HALLUCINATION POLICY:
-   - DO NOT invent skills, tools, certifications, projects, or achievements.
-   - Only use information from:
-        a) USER INFO
-        b) EXISTING RESUME
-   - If a JD mentions a skill NOT present in user data,
-     DO NOT automatically add it.
-   - Instead, ask a confirmation question in gap analysis.
+            text = _chunk_text(chunk)
+            parts.append(text)
 
-2. SKILL VALIDATION:
-   - Only include skills that are explicitly present in user resume or user info.
-   - If unsure whether user has a skill, DO NOT include it.
-   - Missing but important JD skills must be converted into questions.
+            for event in parser.feed(text):
+                emit(event)
 
-3. KPI ENFORCEMENT:
-   - Convert responsibilities into measurable achievements.
-   - Use realistic conservative metrics.
-   - Do NOT fabricate unrealistic numbers.
+            metadata = getattr(chunk, "response_metadata", None) or {}
+            finish_reason = metadata.get("finish_reason") or finish_reason
 
-4. SKILLS STRUCTURE (ROLE-ADAPTIVE):
+            # Usage arrives once, on the final chunk
+            if getattr(chunk, "usage_metadata", None):
+                usage_chunk = chunk
 
-   - Detect industry/domain from Job Description.
-   - Create domain-specific skill categories dynamically.
-   - Examples:
+        limiter.reconcile(tokens, charged_tokens(usage_chunk))
+        record_llm_usage(usage_chunk or AIMessage(content=""))
 
-        For Finance:
-            "Financial Analysis": [...]
-            "Accounting Tools": [...]
-            "Regulatory Compliance": [...]
+        full_text = "".join(parts)
+        _trace_response(trace, usage_chunk or AIMessage(content=""))
+        trace.set(response_bytes=_payload_bytes(full_text), finish_reason=finish_reason)
 
-        For Banking:
-            "Credit Risk Management": [...]
-            "Core Banking Systems": [...]
+    if key is not None and parser.done:
+        cache.set(key, full_text)
 
-        For Marketing:
-            "Digital Marketing": [...]
-            "Campaign Strategy": [...]
+    return full_text, parser, finish_reason
 
-        For Tech:
-            "Programming Languages": [...]
-            "Cloud & DevOps": [...]
+# =========================================================
+# TRUNCATION REPAIR + CONTINUATION
+# =========================================================
 
-   - DO NOT force technical categories for non-tech roles.
-   - Skills must align with JD industry.
+RESUME_SECTION_KEYS = [
+    "name", "title", "location", "phone", "email", "linkedin", "github",
+    "website", "summary", "experience", "education", "open_source",
+    "projects", "technical_skills", "certifications", "gap_questions"
+]
+
+_CLOSERS = {"{": "}", "[": "]"}
+
+
+def repair_json(text):
+    """Close open strings/brackets of a truncated JSON object and return
+    (value, salvaged_prefix). Falls back to the last clean element
+    boundary when the cut landed mid-key or mid-literal."""
+
+    text = re.sub(r"```json|```", "", text or "")
+    start = text.find("{")
+    if start < 0:
+        return {}, ""
+    text = text[start:]
+
+    stack = []
+    in_string = False
+    escape = False
+    cuts = []
+
+    for i, c in enumerate(text):
+        if in_string:
+            if escape:
+                escape = False
+            elif c == "\\":
+                escape = True
+            elif c == '"':
+                in_string = False
+            continue
+
+        if c == '"':
+            in_string = True
+        elif c in "{[":
+            stack.append(c)
+            cuts.append((i + 1, tuple(stack)))
+        elif c in "}]":
+            if stack:
+                stack.pop()
+            if not stack:
+                value = safe_json_parse(text[:i + 1])
+                return value, text[:i + 1]
+            cuts.append((i + 1, tuple(stack)))
+        elif c == ",":
+            cuts.append((i, tuple(stack)))
+
+    candidates = [(text + ('"' if in_string else ""), tuple(stack))]
+    candidates += [(text[:index], opened) for index, opened in reversed(cuts)]
+
+    for prefix, opened in candidates:
+        closing = "".join(_CLOSERS[b] for b in reversed(opened))
+        try:
+            value = json.loads(prefix.rstrip().rstrip(",") + closing)
+        except ValueError:
+            continue
+        if isinstance(value, dict):
+            return value, prefix
 
-5. PROFESSIONAL STRUCTURE:
-   - Executive tone
-   - ATS friendly formatting
-   - Strong action verbs
-   - Concise but impact-driven
+    return {}, ""
 
-6. ORDERING:
-   - Skills must be ordered by JD relevance.
-   - Most relevant skills appear first.
 
-7. GAP QUESTIONS RULE:
-   - Ask ONLY 5 to 10 HIGH-IMPACT questions.
-   - Questions must be strategic.
-   - Focus only on:
-        • Missing KPIs
-        • Missing leadership impact
-        • Missing measurable outcomes
-        • Important JD skill confirmations
-        • High-value certifications or tools
+def _response_output_tokens(response):
+    usage = getattr(response, "usage_metadata", None) or {}
+    return usage.get("output_tokens") or estimate_tokens(response.content)
 
-   - Do NOT ask trivial questions.
-   - Do NOT exceed 10 questions.
-   - Minimum 5, Maximum 10.
 
-8.EXPERIENCE BULLET RULE (CRITICAL):
+def _salvage_truncated(text, required_keys):
 
-    - Experience description MUST be a list of bullet points.
-    - Provide 3 to 6 bullet points per role.
-    - Each bullet must:
-        • Start with strong action verb
-        • Be 20–40 words
-        • Include measurable impact if possible
-    - DO NOT return paragraph descriptions.
+    # Sections whose JSON fully closed are kept verbatim
+    parser = IncrementalJSONParser()
+    parser.feed(text or "")
+    complete = dict(parser.sections)
 
-INTERNAL STRATEGY (Do NOT output this reasoning):
-1. Extract JD required skills & keywords.
-2. Compare with user resume.
-3. Identify confirmed skills.
-4. Identify unconfirmed JD skills → convert to confirmation questions.
-5. Strengthen measurable achievements.
-6. Build dynamic technical skill categories.
+    # The section that was cut off is repaired as a fallback only
+    salvaged, prefix = repair_json(text)
+    result = dict(salvaged)
+    result.update(complete)
 
-PROJECT & OPEN SOURCE DEPTH ENFORCEMENT (CRITICAL):
+    missing = [k for k in required_keys if k not in complete]
 
-For each project and open source contribution:
+    report = {
+        "truncated": True,
+        "salvaged_tokens": estimate_tokens(prefix),
+        "continuation_tokens": 0,
+        "continued_keys": missing,
+        "missing_keys": []
+    }
 
-1. Provide 3 to 5 bullet points.
-2. Each bullet must be 2 to 3 complete sentences.
-3. Each bullet must clearly describe:
-    • The business or technical problem
-    • The solution or architecture approach
-    • Technologies or frameworks used
-    • The measurable or qualitative impact
+    return result, complete, missing, report
 
-4. Avoid short, generic statements such as:
-    - "Built a web app."
-    - "Implemented ML model."
-    - "Created automation script."
 
-5. Each bullet must demonstrate:
-    - Problem-solving ability
-    - Technical reasoning
-    - Decision-making context
-    - Engineering depth
+def _continuation_prompt(prompt, complete, missing):
+    return extend_prompt(prompt, f"""CONTINUATION REQUEST:
+Your previous answer was cut off. These keys were already returned and
+MUST NOT be repeated: {json.dumps(list(complete))}
 
-6. Minimum 20–30 words per bullet.
-7. Maximum 60 words per bullet.
-8. Use strong action verbs and executive tone.
-9. Do NOT fabricate metrics.
-10. If insufficient information exists, expand context realistically but DO NOT invent tools or skills not mentioned in resume.
+Return STRICT JSON containing ONLY these keys, following all rules above:
+{json.dumps(missing)}
+""")
 
-If a description is too short, expand it before returning JSON.
 
-INPUTS:
+def _merge_continuation(result, missing, response, report, emit):
 
-JOB DESCRIPTION:
-{state["job_description"]}
+    report["continuation_tokens"] = _response_output_tokens(response)
 
-USER INFO:
-{state["user_info"]}
+    extra = safe_json_parse(response.content) or repair_json(response.content)[0]
 
-EXISTING RESUME:
-{state["resume_text"]}
+    for key in missing:
+        if key in extra:
+            result[key] = extra[key]
+            if emit:
+                emit({"type": "section", "key": key, "value": extra[key]})
+
+
+def _is_json(content):
+    return bool(safe_json_parse(content))
+
+
+def recover_truncated_json(text, prompt, llm, limiter, required_keys, use_cache=True, emit=None):
+
+    result, complete, missing, report = _salvage_truncated(text, required_keys)
+
+    if missing:
+        response = invoke_llm(
+            llm,
+            limiter,
+            _continuation_prompt(prompt, complete, missing),
+            use_cache=use_cache,
+            validate=_is_json
+        )
+        _merge_continuation(result, missing, response, report, emit)
+
+    report["missing_keys"] = [k for k in required_keys if k not in result]
+
+    return result, report
+
+
+async def arecover_truncated_json(text, prompt, llm, limiter, required_keys, use_cache=True, emit=None, timeout=None):
+
+    result, complete, missing, report = _salvage_truncated(text, required_keys)
+
+    if missing:
+        response = await ainvoke_llm(
+            llm,
+            limiter,
+            _continuation_prompt(prompt, complete, missing),
+            use_cache=use_cache,
+            validate=_is_json,
+            timeout=timeout
+        )
+        _merge_continuation(result, missing, response, report, emit)
+
+    report["missing_keys"] = [k for k in required_keys if k not in result]
+
+    return result, report
+
+
+def invoke_json(llm, limiter, prompt, required_keys, use_cache=True):
+
+    # One JSON-returning call, repaired and continued if it was cut off
+    response = invoke_llm(llm, limiter, prompt, use_cache=use_cache, validate=_is_json)
+    parsed = safe_json_parse(response.content)
+    report = {"truncated": False}
+
+    if not parsed:
+        parsed, report = recover_truncated_json(
+            response.content,
+            prompt,
+            llm,
+            limiter,
+            required_keys,
+            use_cache=use_cache
+        )
+
+    return parsed, report, response
+
+
+async def ainvoke_json(llm, limiter, prompt, required_keys, use_cache=True, timeout=None):
+
+    response = await ainvoke_llm(
+        llm, limiter, prompt, use_cache=use_cache, validate=_is_json, timeout=timeout
+    )
+    parsed = safe_json_parse(response.content)
+    report = {"truncated": False}
+
+    if not parsed:
+        parsed, report = await arecover_truncated_json(
+            response.content,
+            prompt,
+            llm,
+            limiter,
+            required_keys,
+            use_cache=use_cache,
+            timeout=timeout
+        )
+
+    return parsed, report, response
+
+# =========================================================
+# ATS SCORING (UNCHANGED)
+# =========================================================
+
+def extract_keywords(text):
+    return set(re.findall(r"\b[A-Za-z]{4,}\b", text.lower()))
+
+def calculate_keyword_score(resume_text, jd_text):
+    resume_words = extract_keywords(resume_text)
+    jd_words = extract_keywords(jd_text)
+    if not jd_words:
+        return 0
+    return int((len(resume_words & jd_words) / len(jd_words)) * 100)
+
+def calculate_quant_score(resume_text):
+    numbers = re.findall(r"\d+%|\d+\+?|\₹\d+", resume_text)
+    return min(len(numbers) * 10, 100)
+
+# =========================================================
+# LOCAL ATS SCORING (NO LLM)
+# =========================================================
+
+STOPWORDS = {
+    "with", "that", "this", "from", "will", "have", "your", "their", "they",
+    "into", "about", "such", "also", "than", "then", "were", "been", "being",
+    "more", "most", "must", "should", "would", "could", "which", "while",
+    "where", "when", "what", "over", "under", "across", "within", "using",
+    "strong", "ability", "experience", "work", "working", "team", "role",
+    "including", "years", "year", "other", "some", "each", "very", "well"
+}
+
+
+def resume_to_text(structured_resume):
+    # Values only: json.dumps would also match schema keys like "description"
+    if isinstance(structured_resume, dict):
+        return " ".join(resume_to_text(v) for v in structured_resume.values())
+    if isinstance(structured_resume, list):
+        return " ".join(resume_to_text(v) for v in structured_resume)
+    if structured_resume is None:
+        return ""
+    return str(structured_resume)
+
+
+def tokenize_for_matching(text):
+    tokens = re.findall(r"[a-z0-9.+#&/\-]*[a-z0-9+#]", text.lower())
+    return [t.lstrip("-/") for t in tokens]
+
+
+def extract_skill_phrases(text, lexicon=SKILLS_LEXICON, max_n=MAX_PHRASE_TOKENS):
+    tokens = tokenize_for_matching(text)
+    found = set()
+
+    for n in range(1, max_n + 1):
+        for i in range(len(tokens) - n + 1):
+            phrase = " ".join(tokens[i:i + n])
+            if phrase in lexicon:
+                found.add(phrase)
+
+    return found
+
+
+def match_keywords_in_text(keywords, text):
+
+    # Multi-word keywords ("Credit Risk Modeling") match as token n-grams
+    tokens = tokenize_for_matching(text)
+    phrases = {}
+    for keyword in keywords:
+        phrases.setdefault(len(tokenize_for_matching(keyword)), []).append(keyword)
+
+    found = set()
+    for n, group in phrases.items():
+        if n == 0:
+            continue
+        grams = {" ".join(tokens[i:i + n]) for i in range(len(tokens) - n + 1)}
+        for keyword in group:
+            if " ".join(tokenize_for_matching(keyword)) in grams:
+                found.add(keyword)
+
+    return found
+
+
+def calculate_phrase_score(resume_text, jd_text):
+    jd_phrases = extract_skill_phrases(jd_text)
+    resume_phrases = extract_skill_phrases(resume_text)
+    word_score = calculate_keyword_score(resume_text, jd_text)
+
+    if not jd_phrases:
+        return word_score, jd_phrases, resume_phrases
+
+    phrase_score = len(jd_phrases & resume_phrases) / len(jd_phrases) * 100
+
+    # Lexicon phrases carry the signal; plain word overlap smooths it
+    score = int(phrase_score * 0.7 + word_score * 0.3)
+    return score, jd_phrases, resume_phrases
+
+
+def calculate_local_relevance_score(resume_text, jd_text):
+    resume_counts = Counter(
+        w for w in re.findall(r"\b[A-Za-z]{4,}\b", resume_text.lower())
+        if w not in STOPWORDS
+    )
+    jd_counts = Counter(
+        w for w in re.findall(r"\b[A-Za-z]{4,}\b", jd_text.lower())
+        if w not in STOPWORDS
+    )
+
+    if not resume_counts or not jd_counts:
+        return 0
+
+    dot = sum(count * resume_counts[w] for w, count in jd_counts.items())
+    norm = math.sqrt(sum(c * c for c in resume_counts.values())) * \
+        math.sqrt(sum(c * c for c in jd_counts.values()))
+    cosine = dot / norm if norm else 0.0
+
+    # Term-frequency cosine between a resume and a JD rarely passes 0.5,
+    # so 0.5 is treated as a full match
+    return int(min(1.0, cosine / 0.5) * 100)
+
+
+def local_ats_score(structured_resume, jd_text):
+
+    resume_text = resume_to_text(structured_resume)
+
+    keyword_score, jd_phrases, resume_phrases = calculate_phrase_score(
+        resume_text,
+        jd_text
+    )
+    quant_score = calculate_quant_score(resume_text)
+    relevance_score = calculate_local_relevance_score(resume_text, jd_text)
+
+    overall = int(
+        (keyword_score * 0.4) +
+        (quant_score * 0.2) +
+        (relevance_score * 0.4)
+    )
+
+    ats_score = {
+        "keyword_match_score": keyword_score,
+        "quantification_score": quant_score,
+        "semantic_relevance_score": relevance_score,
+        "overall_ats_score": overall,
+        "scoring_mode": "local"
+    }
+
+    return ats_score, sorted(jd_phrases), sorted(resume_phrases)
+
+# =========================================================
+# NODE 0 — PROMPT-SIZE REDUCTION
+# =========================================================
+
+def compress_inputs_node(state: ResumeState):
+
+    compressed, report = compress_prompt_inputs(
+        state["job_description"],
+        state.get("user_info"),
+        state.get("resume_text")
+    )
+    set_on_span(prompt_tokens_before=report["total_before"], prompt_tokens_after=report["total_after"])
+
+    return {"prompt_inputs": compressed, "prompt_budget": report}
+
+# =========================================================
+# NODE 1 — GENERATE RESUME (UNCHANGED)
+# =========================================================
+
+# Rules and schema are a constant system message and the JD/resume follow
+# as the user message, so providers with prefix caching can reuse it
+GENERATE_RESUME_SYSTEM_PROMPT = """You are a Senior Executive Resume Strategist, ATS Optimization Expert, and Truth-Validation Auditor.
+
+MISSION:
+Create a HIGH-IMPACT, ATS-OPTIMIZED, KPI-DRIVEN resume aligned precisely with the Job Description.
+
+CRITICAL RULES (VERY IMPORTANT):
+
+1. STRICT NO-HALLUCINATION POLICY:
+   - DO NOT invent skills, tools, certifications, projects, or achievements.
+   - Only use information from:
+        a) USER INFO
+        b) EXISTING RESUME
+   - If a JD mentions a skill NOT present in user data,
+     DO NOT automatically add it.
+   - Instead, ask a confirmation question in gap analysis.
+
+2. SKILL VALIDATION:
+   - Only include skills that are explicitly present in user resume or user info.
+   - If unsure whether user has a skill, DO NOT include it.
+   - Missing but important JD skills must be converted into questions.
+
+3. KPI ENFORCEMENT:
+   - Convert responsibilities into measurable achievements.
+   - Use realistic conservative metrics.
+   - Do NOT fabricate unrealistic numbers.
+
+4. SKILLS STRUCTURE (ROLE-ADAPTIVE):
+
+   - Detect industry/domain from Job Description.
+   - Create domain-specific skill categories dynamically.
+   - Examples:
+
+        For Finance:
+            "Financial Analysis": [...]
+            "Accounting Tools": [...]
+            "Regulatory Compliance": [...]
+
+        For Banking:
+            "Credit Risk Management": [...]
+            "Core Banking Systems": [...]
+
+        For Marketing:
+            "Digital Marketing": [...]
+            "Campaign Strategy": [...]
+
+        For Tech:
+            "Programming Languages": [...]
+            "Cloud & DevOps": [...]
+
+   - DO NOT force technical categories for non-tech roles.
+   - Skills must align with JD industry.
+
+5. PROFESSIONAL STRUCTURE:
+   - Executive tone
+   - ATS friendly formatting
+   - Strong action verbs
+   - Concise but impact-driven
+
+6. ORDERING:
+   - Skills must be ordered by JD relevance.
+   - Most relevant skills appear first.
+
+7. GAP QUESTIONS RULE:
+   - Ask ONLY 5 to 10 HIGH-IMPACT questions.
+   - Questions must be strategic.
+   - Focus only on:
+        • Missing KPIs
+        • Missing leadership impact
+        • Missing measurable outcomes
+        • Important JD skill confirmations
+        • High-value certifications or tools
+
+   - Do NOT ask trivial questions.
+   - Do NOT exceed 10 questions.
+   - Minimum 5, Maximum 10.
+
+8.EXPERIENCE BULLET RULE (CRITICAL):
+
+    - Experience description MUST be a list of bullet points.
+    - Provide 3 to 6 bullet points per role.
+    - Each bullet must:
+        • Start with strong action verb
+        • Be 20–40 words
+        • Include measurable impact if possible
+    - DO NOT return paragraph descriptions.
+
+INTERNAL STRATEGY (Do NOT output this reasoning):
+1. Extract JD required skills & keywords.
+2. Compare with user resume.
+3. Identify confirmed skills.
+4. Identify unconfirmed JD skills → convert to confirmation questions.
+5. Strengthen measurable achievements.
+6. Build dynamic technical skill categories.
+
+PROJECT & OPEN SOURCE DEPTH ENFORCEMENT (CRITICAL):
+
+For each project and open source contribution:
+
+1. Provide 3 to 5 bullet points.
+2. Each bullet must be 2 to 3 complete sentences.
+3. Each bullet must clearly describe:
+    • The business or technical problem
+    • The solution or architecture approach
+    • Technologies or frameworks used
+    • The measurable or qualitative impact
+
+4. Avoid short, generic statements such as:
+    - "Built a web app."
+    - "Implemented ML model."
+    - "Created automation script."
+
+5. Each bullet must demonstrate:
+    - Problem-solving ability
+    - Technical reasoning
+    - Decision-making context
+    - Engineering depth
+
+6. Minimum 20–30 words per bullet.
+7. Maximum 60 words per bullet.
+8. Use strong action verbs and executive tone.
+9. Do NOT fabricate metrics.
+10. If insufficient information exists, expand context realistically but DO NOT invent tools or skills not mentioned in resume.
+
+If a description is too short, expand it before returning JSON.
 
 RETURN STRICT JSON ONLY IN THIS FORMAT:
 
-{{
+{
   "name": "",
   "title": "",
   "location": "",
@@ -300,7 +1526,7 @@ RETURN STRICT JSON ONLY IN THIS FORMAT:
   "summary": "",
 
   "experience": [
-    {{
+    {
       "position": "",
       "company": "",
       "duration": "",
@@ -309,46 +1535,46 @@ RETURN STRICT JSON ONLY IN THIS FORMAT:
   "Bullet 2",
   "Bullet 3"
      ]
-    }}
+    }
   ],
 
   "education": [
-    {{
+    {
       "degree": "",
       "institution": "",
       "duration": "",
       "details": ""
-    }}
+    }
   ],
 
   "open_source": [
-  {{
+  {
   "title": "",
   "description": [
     "Bullet 1",
     "Bullet 2"
   ],
   "link": ""
-}}],
+}],
 
 "projects": [
-  {{
+  {
     "title": "",
     "description": [
       "Bullet 1",
       "Bullet 2",
       "Bullet 3"
-    ] }}
+    ] }
 ],
 
-  "technical_skills": {{
+  "technical_skills": {
     "Dynamic Skill Category": ["skill1", "skill2"]
-  }},
+  },
 
   "certifications": [],
 
   "gap_questions": []
-}}
+}
 
 STRICT REQUIREMENTS:
 
@@ -360,219 +1586,954 @@ STRICT REQUIREMENTS:
 - If a section has no data, return empty list.
 """
 
+def build_generate_prompt(state):
+
+    # Falls back to the raw inputs when the compression stage did not run
+    inputs = state.get("prompt_inputs") or {
+        "job_description": state["job_description"],
+        "user_info": state["user_info"],
+        "resume_text": state["resume_text"]
+    }
+
+    return [
+        SystemMessage(content=GENERATE_RESUME_SYSTEM_PROMPT),
+        HumanMessage(content=f"""INPUTS:
+
+JOB DESCRIPTION:
+{inputs["job_description"]}
+
+USER INFO:
+{inputs["user_info"]}
+
+EXISTING RESUME:
+{inputs["resume_text"]}
+""")
+    ]
+
+
+def _generation_update(parsed, report):
+
+    if not parsed:
+        raise ValueError(
+            "LLM returned invalid or truncated JSON. "
+            "Increase max tokens or reduce prompt size."
+        )
+
+    return {"structured_resume": parsed, "generation_report": report}
+
+
+def generate_resume_node(state: ResumeState):
+
+    prompt = build_generate_prompt(state)
+
+    llm, limiter = get_llm(
+    state["provider"],
+    state["api_key"],
+    state["rpm"],
+     state["model"]
+)
+
+    if state.get("stream"):
+        return _stream_generate_resume(state, llm, limiter, prompt)
+
+    parsed, report, response = invoke_json(
+        llm,
+        limiter,
+        prompt,
+        RESUME_SECTION_KEYS,
+        use_cache=state.get("use_cache", True)
+    )
+
+    return _generation_update(parsed, report)
+
+
+async def agenerate_resume_node(state: ResumeState):
+
+    prompt = build_generate_prompt(state)
+
+    llm, limiter = get_llm(
+        state["provider"],
+        state["api_key"],
+        state["rpm"],
+        state["model"]
+    )
+
+    parsed, report, _ = await ainvoke_json(
+        llm,
+        limiter,
+        prompt,
+        RESUME_SECTION_KEYS,
+        use_cache=state.get("use_cache", True),
+        timeout=state.get("llm_timeout")
+    )
+
+    return _generation_update(parsed, report)
+
+
+def _stream_generate_resume(state, llm, limiter, prompt):
+
+    writer = _stream_writer()
+
+    text, parser, finish_reason = stream_llm_json(
+        llm,
+        limiter,
+        prompt,
+        writer,
+        use_cache=state.get("use_cache", True)
+    )
+
+    # The parser knows the moment the stream ends with open brackets, and
+    # providers flag a max-token cut-off explicitly
+    if parser.done and finish_reason not in ("length", "MAX_TOKENS"):
+        return {
+            "structured_resume": parser.sections,
+            "generation_report": {"truncated": False}
+        }
+
+    writer({
+        "type": "truncated",
+        "open_key": parser.open_key,
+        "completed_keys": list(parser.sections)
+    })
+
+    parsed, report = recover_truncated_json(
+        text,
+        prompt,
+        llm,
+        limiter,
+        RESUME_SECTION_KEYS,
+        use_cache=state.get("use_cache", True),
+        emit=writer
+    )
+
+    if not parsed:
+        raise TruncatedJSONError(
+            "LLM returned invalid or truncated JSON. "
+            "Increase max tokens or reduce prompt size.",
+            text=text,
+            sections=parser.sections,
+            open_key=parser.open_key
+        )
+
+    writer({"type": "recovered", "report": report})
+
+    return {"structured_resume": parsed, "generation_report": report}
+
+# =========================================================
+# NODE 2 — ADVANCED ATS SCORE
+# =========================================================
+
+def _relevance_prompt(resume_text, jd_text):
+    return f"""
+Rate resume relevance to JD from 0 to 100.
+Return ONLY integer.
+
+RESUME:
+{resume_text}
+
+JOB DESCRIPTION:
+{jd_text}
+"""
+
+
+def _has_number(content):
+    return bool(re.search(r"\d+", content))
+
+
+def _parse_relevance(content):
+    try:
+        relevance_score = int(re.findall(r"\d+", content)[0])
+        relevance_score = max(0, min(100, relevance_score))
+    except:
+        relevance_score = 50
+
+    return relevance_score
+
+
+def score_semantic_relevance(resume_text, jd_text, llm, limiter, use_cache=True):
+
+    relevance_response = invoke_llm(
+        llm,
+        limiter,
+        _relevance_prompt(resume_text, jd_text),
+        use_cache=use_cache,
+        validate=_has_number
+    )
+
+    return _parse_relevance(relevance_response.content)
+
+
+async def ascore_semantic_relevance(resume_text, jd_text, llm, limiter, use_cache=True, timeout=None):
+
+    relevance_response = await ainvoke_llm(
+        llm,
+        limiter,
+        _relevance_prompt(resume_text, jd_text),
+        use_cache=use_cache,
+        validate=_has_number,
+        timeout=timeout
+    )
+
+    return _parse_relevance(relevance_response.content)
+
+
+def score_semantic_relevance_batch(resumes, jd_text, llm, limiter, use_cache=True, max_chars=6000):
+
+    # resumes: list of (resume_id, resume_text); one LLM call rates them all
+    blocks = "\n\n".join(
+        f"RESUME [{resume_id}]:\n{text[:max_chars]}"
+        for resume_id, text in resumes
+    )
+
+    prompt = f"""
+Rate each resume's relevance to the JD from 0 to 100.
+Return STRICT JSON mapping each resume id to an integer, e.g. {{"id1": 72}}.
+
+JOB DESCRIPTION:
+{jd_text}
+
+{blocks}
+"""
+
+    response = invoke_llm(
+        llm,
+        limiter,
+        prompt,
+        use_cache=use_cache,
+        validate=lambda content: bool(safe_json_parse(content))
+    )
+    data = safe_json_parse(response.content)
+
+    scores = {}
+    for resume_id, _ in resumes:
+        try:
+            scores[resume_id] = max(0, min(100, int(data[str(resume_id)])))
+        except (KeyError, TypeError, ValueError):
+            scores[resume_id] = 50
+
+    return scores
+
+
+def ats_score_node(state: ResumeState):
+
+    resume_text = json.dumps(state["structured_resume"])
+    jd_text = state["job_description"]
+    use_cache = state.get("use_cache", True)
+
+    llm, limiter = get_llm(
+        state["provider"],
+        state["api_key"],
+        state["rpm"],
+         state["model"]
+    )
+
+    # Keyword extraction and semantic relevance are independent, so both
+    # requests are in flight together; the shared limiter still gates each
+    with ThreadPoolExecutor(max_workers=2, thread_name_prefix="ats") as pool:
+
+        # -------- LLM KEYWORD EXTRACTION --------
+        keywords_future = pool.submit(
+            contextvars.copy_context().run,
+            extract_quality_keywords_llm,
+            resume_text,
+            jd_text,
+            llm,
+            limiter,
+            use_cache
+        )
+
+        # -------- SEMANTIC RELEVANCE SCORE --------
+        relevance_future = pool.submit(
+            contextvars.copy_context().run,
+            score_semantic_relevance,
+            resume_text,
+            jd_text,
+            llm,
+            limiter,
+            use_cache
+        )
+
+        jd_keywords, resume_keywords = keywords_future.result()
+        relevance_score = relevance_future.result()
+
+    return _ats_score_update(resume_text, jd_keywords, resume_keywords, relevance_score)
+
+
+async def aats_score_node(state: ResumeState):
+
+    resume_text = json.dumps(state["structured_resume"])
+    jd_text = state["job_description"]
+    use_cache = state.get("use_cache", True)
+    timeout = state.get("llm_timeout")
+
+    llm, limiter = get_llm(
+        state["provider"],
+        state["api_key"],
+        state["rpm"],
+        state["model"]
+    )
+
+    (jd_keywords, resume_keywords), relevance_score = await asyncio.gather(
+        aextract_quality_keywords_llm(resume_text, jd_text, llm, limiter, use_cache, timeout),
+        ascore_semantic_relevance(resume_text, jd_text, llm, limiter, use_cache, timeout)
+    )
+
+    return _ats_score_update(resume_text, jd_keywords, resume_keywords, relevance_score)
+
+
+def _ats_score_update(resume_text, jd_keywords, resume_keywords, relevance_score):
+
+    if jd_keywords:
+        keyword_score = int(
+            (len(jd_keywords & resume_keywords) / len(jd_keywords)) * 100
+        )
+    else:
+        keyword_score = 0
+
+    # -------- QUANT SCORE --------
+    quant_score = calculate_quant_score(resume_text)
+
+    # -------- FINAL WEIGHTING --------
+    overall = int(
+        (keyword_score * 0.4) +
+        (quant_score * 0.2) +
+        (relevance_score * 0.4)
+    )
+
+    # Partial update: this node can run alongside gap_analysis in one step
+    return {
+        "ats_score": {
+            "keyword_match_score": keyword_score,
+            "quantification_score": quant_score,
+            "semantic_relevance_score": relevance_score,
+            "overall_ats_score": overall
+        },
+        # Kept on the state so the public functions can derive missing
+        # keywords without repeating the extraction call
+        "jd_keywords": sorted(jd_keywords),
+        "resume_keywords": sorted(resume_keywords)
+    }
+
+# =========================================================
+# NODE 3 & 4
+# =========================================================
+
+GAP_ANALYSIS_SYSTEM_PROMPT = """You are an ATS Resume Intelligence Auditor and Truth Validator.
+
+GOAL:
+Ask 5 to 10 high-impact, strategic questions to improve ATS score.
+
+RULES:
+
+1. Ask ONLY between 5 and 10 questions.
+2. Prioritize:
+   - Missing measurable KPIs
+   - Missing leadership signals
+   - Confirmation of important JD skills
+   - Certifications that improve ranking
+   - Quantification gaps
+3. If JD mentions a skill NOT present in resume,
+   ask confirmation question:
+   Example:
+   "Do you have experience with Kubernetes? If yes, describe usage."
+
+4. DO NOT:
+   - Invent missing information
+   - Ask trivial questions
+   - Exceed 10 questions
+   - Ask vague questions
+
+Return STRICT JSON:
+
+{ "questions": [] }
+"""
+
+
+def _gap_prompt(state):
+    return [
+        SystemMessage(content=GAP_ANALYSIS_SYSTEM_PROMPT),
+        HumanMessage(content=f"""Resume:
+{state["structured_resume"]}
+
+Job Description:
+{(state.get("prompt_inputs") or state)["job_description"]}
+""")
+    ]
+
+
+def gap_analysis_node(state: ResumeState):
+    prompt = _gap_prompt(state)
+    llm, limiter = get_llm(
+    state["provider"],
+    state["api_key"],
+    state["rpm"],
+     state["model"]
+)
+
+    response = invoke_llm(
+        llm,
+        limiter,
+        prompt,
+        use_cache=state.get("use_cache", True),
+        validate=_is_json
+    )
+    data = safe_json_parse(response.content)
+    return {"gap_questions": data.get("questions", [])}
+
+
+async def agap_analysis_node(state: ResumeState):
+
+    llm, limiter = get_llm(
+        state["provider"],
+        state["api_key"],
+        state["rpm"],
+        state["model"]
+    )
+
+    response = await ainvoke_llm(
+        llm,
+        limiter,
+        _gap_prompt(state),
+        use_cache=state.get("use_cache", True),
+        validate=_is_json,
+        timeout=state.get("llm_timeout")
+    )
+    data = safe_json_parse(response.content)
+    return {"gap_questions": data.get("questions", [])}
+
+
+# =========================================================
+# INCREMENTAL UPDATE (SECTION-LEVEL DIFF)
+# =========================================================
+
+# Which resume sections an answer can touch, by wording of the Q/A pair
+SECTION_HINTS = [
+    ("certifications", re.compile(r"certif|licen[cs]e|accredit|course", re.I)),
+    ("open_source", re.compile(r"open[- ]source|contribut|pull request|maintainer", re.I)),
+    ("projects", re.compile(r"\bprojects?\b|side project|hackathon|portfolio", re.I)),
+    ("education", re.compile(r"educat|degree|gpa|cgpa|universit|college|graduat", re.I)),
+    # Only metric-style outcomes; "team" or "role" alone says nothing about
+    # which bullet to rewrite
+    ("experience", re.compile(
+        r"\b(?:kpis?|metrics?|quantif(?:y|ied)|revenue|cost savings?|"
+        r"(?:reduced|increased|improved|grew|saved|cut) (?:\w+ ){0,3}by|"
+        r"led (?:a |the )?team of|managed (?:a |the )?team of|mentored \d+)\b|"
+        r"\d+(?:\.\d+)?\s*%|[$€£]\s?\d", re.I)),
+    ("technical_skills", re.compile(
+        r"skill|tool|framework|language|platform|software|stack|proficien|"
+        r"familiar|experience (?:with|in|using)|hands-on|worked with|knowledge of|"
+        r"d(?:o|id) you (?:know|use|have)", re.I)),
+]
+
+# Sections regenerated per entry when an answer names that entry
+ENTRY_SECTIONS = {
+    "experience": ("company", "position"),
+    "projects": ("title",),
+    "open_source": ("title",),
+}
+
+SECTION_KEY_RE = re.compile(r"^(\w+)\[(\d+)\]$")
+
+
+def _answered_pairs(user_answers):
+    return [
+        (str(q), str(a).strip())
+        for q, a in (user_answers or {}).items()
+        if a is not None and str(a).strip()
+    ]
+
+
+def map_answers_to_sections(structured_resume, user_answers):
+
+    # Returns {target key: [(question, answer)]}. Target keys are top-level
+    # sections ("technical_skills") or single entries ("experience[2]") when
+    # the Q/A names that entry.
+    resume = structured_resume or {}
+    targets = {}
+
+    for question, answer in _answered_pairs(user_answers):
+        text = f"{question}\n{answer}"
+        lowered = text.lower()
+        keys = []
+
+        for section, fields in ENTRY_SECTIONS.items():
+            for index, entry in enumerate(resume.get(section) or []):
+                if not isinstance(entry, dict):
+                    continue
+                names = [str(entry.get(f) or "").strip().lower() for f in fields]
+                if any(len(name) > 2 and name in lowered for name in names):
+                    keys.append(f"{section}[{index}]")
+
+        for section, pattern in SECTION_HINTS:
+            if pattern.search(text) and not any(k.startswith(section + "[") for k in keys):
+                keys.append(section)
+
+        # A skill confirmation with a real description also earns a bullet
+        if "technical_skills" in keys and len(answer.split()) >= 12 and not any(
+            k.startswith("experience") for k in keys
+        ):
+            keys.append("experience")
+
+        # Unclassified answers are most often skill confirmations
+        for key in keys or ["technical_skills"]:
+            targets.setdefault(key, []).append((question, answer))
+
+    # A whole-section target already covers its single entries, so no entry
+    # is sent twice or patched over the section rewrite
+    for key in list(targets):
+        section = _section_of(key)
+        if section != key and section in targets:
+            targets[section].extend(
+                pair for pair in targets.pop(key) if pair not in targets[section]
+            )
+
+    return targets
+
+
+def _section_of(key):
+    match = SECTION_KEY_RE.match(key)
+    return match.group(1) if match else key
+
+
+def _current_section(resume, key):
+    match = SECTION_KEY_RE.match(key)
+    if match:
+        entries = resume.get(match.group(1)) or []
+        index = int(match.group(2))
+        return entries[index] if index < len(entries) else None
+    return resume.get(key)
+
+
+def merge_sections(structured_resume, updates):
+
+    # Only the replaced sections are new objects; everything else is the
+    # original value, so it serialises byte-identically
+    merged = dict(structured_resume)
+
+    for key, value in updates.items():
+        match = SECTION_KEY_RE.match(key)
+        if not match:
+            merged[key] = value
+            continue
+
+        section, index = match.group(1), int(match.group(2))
+        entries = list(merged.get(section) or [])
+        if index < len(entries):
+            entries[index] = value
+            merged[section] = entries
+
+    return merged
+
+
+UPDATE_SECTIONS_SYSTEM_PROMPT = """You are an Elite Resume Optimization Specialist.
+
+Enhance ONLY the resume sections you are given, using the user's answers.
+
+RULES:
+1. Return STRICT JSON whose keys are exactly the requested section keys.
+2. Keep each section's shape: a key like "experience[1]" is one experience
+   entry object; a plain key like "technical_skills" is the whole section.
+3. Preserve every existing fact; add only what the answers state.
+4. DO NOT invent skills, tools, metrics or certifications.
+5. Experience and project descriptions stay lists of bullet points that
+   start with a strong action verb and include measurable impact if given.
+6. Order skills by relevance to the job description.
+7. Do NOT include markdown, explanations or commentary.
+"""
+
+
+def _section_update_prompt(state, targets):
+
+    resume = state["structured_resume"]
+    keys = list(targets)
+
+    current = {key: _current_section(resume, key) for key in keys}
+    answers = [
+        {"question": q, "answer": a, "sections": [k for k in keys if (q, a) in targets[k]]}
+        for q, a in dict.fromkeys(pair for pairs in targets.values() for pair in pairs)
+    ]
+
+    prompt = [
+        SystemMessage(content=UPDATE_SECTIONS_SYSTEM_PROMPT),
+        HumanMessage(content=f"""JOB DESCRIPTION:
+{strip_jd_boilerplate(state["job_description"])}
+
+SECTIONS TO UPDATE:
+{json.dumps(current, ensure_ascii=False, indent=1)}
+
+USER ANSWERS:
+{json.dumps(answers, ensure_ascii=False, indent=1)}
+
+Return STRICT JSON with exactly these keys: {json.dumps(keys)}
+""")
+    ]
+
+    return prompt, keys, current
+
+
+def _merge_section_updates(resume, keys, current, parsed, report, response):
+
+    updates = {}
+    for key in keys:
+        value = parsed.get(key)
+        original = current[key]
+        # Reject values whose type would corrupt the structure
+        if value is None or (original is not None and type(value) is not type(original)):
+            continue
+        updates[key] = value
+
+    report.update({
+        "mode": "incremental",
+        "updated_sections": list(updates),
+        "missing_keys": [k for k in keys if k not in updates],
+        "unchanged_sections": [
+            k for k in resume if k not in {_section_of(u) for u in updates}
+        ],
+        "output_tokens": _response_output_tokens(response)
+    })
+
+    return merge_sections(resume, updates), report
+
+
+def _update_sections(state, targets):
+
+    prompt, keys, current = _section_update_prompt(state, targets)
+
+    llm, limiter = get_llm(
+        state["provider"],
+        state["api_key"],
+        state["rpm"],
+        state["model"]
+    )
+
+    parsed, report, response = invoke_json(
+        llm, limiter, prompt, keys, use_cache=state.get("use_cache", True)
+    )
+
+    return _merge_section_updates(state["structured_resume"], keys, current, parsed, report, response)
+
+
+async def _aupdate_sections(state, targets):
+
+    prompt, keys, current = _section_update_prompt(state, targets)
+
+    llm, limiter = get_llm(
+        state["provider"],
+        state["api_key"],
+        state["rpm"],
+        state["model"]
+    )
+
+    parsed, report, response = await ainvoke_json(
+        llm,
+        limiter,
+        prompt,
+        keys,
+        use_cache=state.get("use_cache", True),
+        timeout=state.get("llm_timeout")
+    )
+
+    return _merge_section_updates(state["structured_resume"], keys, current, parsed, report, response)
+
+
+def route_update(state: ResumeState):
+    # Blank answers carry no new information, so there is nothing to write;
+    # the resume goes straight to scoring (usually a response-cache hit)
+    if _answered_pairs(state.get("user_answers")):
+        return "update_resume"
+    return "ats_score"
+
+
+def _update_targets(state):
+    # Section targets for an incremental update, or None for a full rewrite
+    resume = state.get("structured_resume")
+    if state.get("update_mode", "incremental") == "incremental" and resume:
+        return map_answers_to_sections(resume, state.get("user_answers"))
+    return None
+
+
+def _unchanged_update(resume):
+    return {
+        "structured_resume": resume,
+        "generation_report": {
+            "truncated": False,
+            "mode": "incremental",
+            "updated_sections": [],
+            "missing_keys": [],
+            "unchanged_sections": list(resume)
+        }
+    }
+
+
+def update_resume_node(state: ResumeState):
+
+    targets = _update_targets(state)
+
+    if targets is None:
+        return _rewrite_resume(state)
+    if not targets:
+        return _unchanged_update(state["structured_resume"])
+
+    structured_resume, report = _update_sections(state, targets)
+    return {"structured_resume": structured_resume, "generation_report": report}
+
+
+async def aupdate_resume_node(state: ResumeState):
+
+    targets = _update_targets(state)
+
+    if targets is None:
+        return await _arewrite_resume(state)
+    if not targets:
+        return _unchanged_update(state["structured_resume"])
+
+    structured_resume, report = await _aupdate_sections(state, targets)
+    return {"structured_resume": structured_resume, "generation_report": report}
+
+
+def _rewrite_prompt(state):
+
+    # Full regeneration; used when there is no structure to diff against
+    return f"""
+You are an Elite Resume Optimization Specialist.
+
+Enhance the resume using user answers.
+
+JOB DESCRIPTION:
+{state["job_description"]}
+
+CURRENT RESUME:
+{state["structured_resume"]}
+
+USER ANSWERS:
+{state["user_answers"]}
+
+Return STRICT JSON only.
+"""
+
+
+def _rewrite_resume(state):
+
     llm, limiter = get_llm(
     state["provider"],
     state["api_key"],
     state["rpm"],
      state["model"]
 )
-    print("Invoking LLM with prompt:", state["resume_text"][:500])  # Print the first 500 characters of the prompt for debugging
-    limiter.wait_if_needed()
-    response = llm.invoke(prompt)
-    print(3,response.content)
-    parsed = safe_json_parse(response.content)
-
-    if not parsed:
-        raise ValueError(
-            "LLM returned invalid or truncated JSON. "
-            "Increase max tokens or reduce prompt size."
-        )
 
-    state["structured_resume"] = parsed
-    return state
+    parsed, report, response = invoke_json(
+        llm,
+        limiter,
+        _rewrite_prompt(state),
+        list(state["structured_resume"] or RESUME_SECTION_KEYS),
+        use_cache=state.get("use_cache", True)
+    )
 
-# =========================================================
-# NODE 2 — ADVANCED ATS SCORE
-# =========================================================
+    return _generation_update(parsed, report)
 
-def ats_score_node(state: ResumeState):
 
-    resume_text = json.dumps(state["structured_resume"])
-    jd_text = state["job_description"]
+async def _arewrite_resume(state):
 
     llm, limiter = get_llm(
         state["provider"],
         state["api_key"],
         state["rpm"],
-         state["model"]
+        state["model"]
     )
 
-    # -------- LLM KEYWORD EXTRACTION --------
-    jd_keywords, resume_keywords = extract_quality_keywords_llm(
-        resume_text,
-        jd_text,
+    parsed, report, _ = await ainvoke_json(
         llm,
-        limiter
+        limiter,
+        _rewrite_prompt(state),
+        list(state["structured_resume"] or RESUME_SECTION_KEYS),
+        use_cache=state.get("use_cache", True),
+        timeout=state.get("llm_timeout")
     )
 
-    if jd_keywords:
-        keyword_score = int(
-            (len(jd_keywords & resume_keywords) / len(jd_keywords)) * 100
-        )
-    else:
-        keyword_score = 0
+    return _generation_update(parsed, report)
 
-    # -------- QUANT SCORE --------
-    quant_score = calculate_quant_score(resume_text)
+# =========================================================
+# NODE 5 — ADDITIONAL ANALYSIS (FAN-IN)
+# =========================================================
 
-    # -------- SEMANTIC RELEVANCE SCORE --------
-    relevance_prompt = f"""
-Rate resume relevance to JD from 0 to 100.
-Return ONLY integer.
+def build_additional_analysis(ats_score, jd_keywords, resume_keywords):
 
-RESUME:
-{resume_text}
+    level, inference = generate_match_insight(ats_score)
+    missing = missing_keywords_from_sets(jd_keywords, resume_keywords)
 
-JOB DESCRIPTION:
-{jd_text}
-"""
+    return {
+        "match_level": level,
+        "inference": inference,
+        "missing_keywords": missing
+    }
 
-    limiter.wait_if_needed()
-    relevance_response = llm.invoke(relevance_prompt)
 
-    try:
-        relevance_score = int(re.findall(r"\d+", relevance_response.content)[0])
-        relevance_score = max(0, min(100, relevance_score))
-    except:
-        relevance_score = 50
+def analysis_node(state: ResumeState):
+    return {
+        "additional_analysis": build_additional_analysis(
+            state["ats_score"],
+            state["jd_keywords"],
+            state["resume_keywords"]
+        )
+    }
 
-    # -------- FINAL WEIGHTING --------
-    overall = int(
-        (keyword_score * 0.4) +
-        (quant_score * 0.2) +
-        (relevance_score * 0.4)
-    )
+# =========================================================
+# NODE TIMING
+# =========================================================
 
-    state["ats_score"] = {
-        "keyword_match_score": keyword_score,
-        "quantification_score": quant_score,
-        "semantic_relevance_score": relevance_score,
-        "overall_ats_score": overall
+def timed_node(name, fn):
+
+    if inspect.iscoroutinefunction(fn):
+        async def awrapper(state):
+            usage = NodeUsage()
+            token = _NODE_USAGE.set(usage)
+            started_at = time.perf_counter()
+            try:
+                with span("node", name) as trace:
+                    update = await fn(state)
+                    trace.set(usage=usage.snapshot())
+            finally:
+                _NODE_USAGE.reset(token)
+            return _timed_update(name, update, started_at, time.perf_counter(), usage)
+
+        awrapper.__name__ = getattr(fn, "__name__", name)
+        return awrapper
+
+    def wrapper(state):
+        usage = NodeUsage()
+        token = _NODE_USAGE.set(usage)
+        started_at = time.perf_counter()
+        try:
+            with span("node", name) as trace:
+                update = fn(state)
+                trace.set(usage=usage.snapshot())
+        finally:
+            _NODE_USAGE.reset(token)
+        return _timed_update(name, update, started_at, time.perf_counter(), usage)
+
+    wrapper.__name__ = getattr(fn, "__name__", name)
+    return wrapper
+
+
+def _timed_update(name, update, started_at, finished_at, usage):
+
+    update = dict(update or {})
+    update["node_timings"] = {
+        name: {
+            "started_at": started_at,
+            "finished_at": finished_at,
+            "seconds": round(finished_at - started_at, 4)
+        }
     }
 
-    return state
+    usage = usage.snapshot()
+    if usage["calls"] or usage["response_cache_hits"]:
+        update["llm_usage"] = {name: usage}
 
-# =========================================================
-# NODE 3 & 4 (UNCHANGED)
-# =========================================================
+    return update
 
-def gap_analysis_node(state: ResumeState):
-    prompt = f"""
-You are an ATS Resume Intelligence Auditor and Truth Validator.
 
-GOAL:
-Ask 5 to 10 high-impact, strategic questions to improve ATS score.
+def timing_report(node_timings, graph=None):
 
-RULES:
+    if not node_timings:
+        return {}
 
-1. Ask ONLY between 5 and 10 questions.
-2. Prioritize:
-   - Missing measurable KPIs
-   - Missing leadership signals
-   - Confirmation of important JD skills
-   - Certifications that improve ranking
-   - Quantification gaps
-3. If JD mentions a skill NOT present in resume,
-   ask confirmation question:
-   Example:
-   "Do you have experience with Kubernetes? If yes, describe usage."
+    origin = min(t["started_at"] for t in node_timings.values())
+    end = max(t["finished_at"] for t in node_timings.values())
 
-4. DO NOT:
-   - Invent missing information
-   - Ask trivial questions
-   - Exceed 10 questions
-   - Ask vague questions
+    nodes = {
+        name: {
+            "start": round(t["started_at"] - origin, 4),
+            "end": round(t["finished_at"] - origin, 4),
+            "seconds": t["seconds"]
+        }
+        for name, t in node_timings.items()
+    }
 
-Resume:
-{state["structured_resume"]}
+    report = {
+        "nodes": nodes,
+        "wall_seconds": round(end - origin, 4),
+        "sum_node_seconds": round(sum(t["seconds"] for t in node_timings.values()), 4)
+    }
 
-Job Description:
-{state["job_description"]}
+    if graph is not None:
+        path, seconds = _critical_path(graph, node_timings)
+        report["critical_path"] = path
+        report["critical_path_seconds"] = round(seconds, 4)
 
-Return STRICT JSON:
+    return report
 
-{{ "questions": [] }}
-"""
-    llm, limiter = get_llm(
-    state["provider"],
-    state["api_key"],
-    state["rpm"],
-     state["model"]
-)
 
-    limiter.wait_if_needed()
-    response = llm.invoke(prompt)
-    print("Gap LLM Output:", response.content[:500])
-    data = safe_json_parse(response.content)
-    state["gap_questions"] = data.get("questions", [])
-    return state
+def _critical_path(graph, node_timings):
 
+    # Longest duration-weighted path through the compiled DAG
+    edges = [(e.source, e.target) for e in graph.get_graph().edges]
+    best = {}
 
-def update_resume_node(state: ResumeState):
+    def longest_from(node):
+        if node in best:
+            return best[node]
 
-    prompt = f"""
-You are an Elite Resume Optimization Specialist.
+        cost = node_timings.get(node, {}).get("seconds", 0.0)
+        tails = [longest_from(target) for source, target in edges if source == node]
+        path, seconds = max(tails, key=lambda t: t[1], default=([], 0.0))
 
-Enhance the resume using user answers.
+        own = [node] if node in node_timings else []
+        best[node] = (own + path, cost + seconds)
+        return best[node]
 
-JOB DESCRIPTION:
-{state["job_description"]}
+    return longest_from("__start__")
 
-CURRENT RESUME:
-{state["structured_resume"]}
+# =========================================================
+# GRAPHS
+# =========================================================
 
-USER ANSWERS:
-{state["user_answers"]}
+def build_initial_graph(generate, ats_score, gap_analysis):
 
-Return STRICT JSON only.
-"""
+    builder = StateGraph(ResumeState)
+    builder.add_node("compress_inputs", timed_node("compress_inputs", compress_inputs_node))
+    builder.add_node("generate_resume", timed_node("generate_resume", generate))
+    builder.add_node("ats_score", timed_node("ats_score", ats_score))
+    builder.add_node("gap_analysis", timed_node("gap_analysis", gap_analysis))
+    builder.add_node("build_analysis", timed_node("build_analysis", analysis_node))
 
-    llm, limiter = get_llm(
-    state["provider"],
-    state["api_key"],
-    state["rpm"],
-     state["model"]
-)
+    builder.set_entry_point("compress_inputs")
+    builder.add_edge("compress_inputs", "generate_resume")
 
-    limiter.wait_if_needed()
-    response = llm.invoke(prompt)
-    print(1,response.content)
-    parsed = safe_json_parse(response.content)
+    # Gap analysis only reads structured_resume, so it runs beside scoring;
+    # build_analysis waits for both branches
+    builder.add_edge("generate_resume", "ats_score")
+    builder.add_edge("generate_resume", "gap_analysis")
+    builder.add_edge(["ats_score", "gap_analysis"], "build_analysis")
+    builder.add_edge("build_analysis", END)
 
-    if not parsed:
-        raise ValueError(
-            "LLM returned invalid or truncated JSON. "
-            "Increase max tokens or reduce prompt size."
-        )
+    return builder.compile()
 
-    state["structured_resume"] = parsed
-    return state
 
-# =========================================================
-# GRAPHS (UNCHANGED)
-# =========================================================
+def build_update_graph(update, ats_score):
 
-builder1 = StateGraph(ResumeState)
-builder1.add_node("generate_resume", generate_resume_node)
-builder1.add_node("ats_score", ats_score_node)
-builder1.add_node("gap_analysis", gap_analysis_node)
+    builder = StateGraph(ResumeState)
+    builder.add_node("update_resume", timed_node("update_resume", update))
+    builder.add_node("ats_score", timed_node("ats_score", ats_score))
+    builder.add_node("build_analysis", timed_node("build_analysis", analysis_node))
 
-builder1.set_entry_point("generate_resume")
-builder1.add_edge("generate_resume", "ats_score")
-builder1.add_edge("ats_score", "gap_analysis")
-builder1.add_edge("gap_analysis", END)
+    builder.set_conditional_entry_point(
+        route_update,
+        {"update_resume": "update_resume", "ats_score": "ats_score"}
+    )
+    builder.add_edge("update_resume", "ats_score")
+    builder.add_edge("ats_score", "build_analysis")
+    builder.add_edge("build_analysis", END)
 
-graph_initial = builder1.compile()
+    return builder.compile()
 
-builder2 = StateGraph(ResumeState)
-builder2.add_node("update_resume", update_resume_node)
-builder2.add_node("ats_score", ats_score_node)
 
-builder2.set_entry_point("update_resume")
-builder2.add_edge("update_resume", "ats_score")
-builder2.add_edge("ats_score", END)
+graph_initial = build_initial_graph(generate_resume_node, ats_score_node, gap_analysis_node)
+graph_update = build_update_graph(update_resume_node, ats_score_node)
 
-graph_update = builder2.compile()
+# Same graphs with coroutine nodes, for ainvoke; CPU-only nodes are shared
+agraph_initial = build_initial_graph(agenerate_resume_node, aats_score_node, agap_analysis_node)
+agraph_update = build_update_graph(aupdate_resume_node, aats_score_node)
 
 # =========================================================
 # ADDITIONAL ANALYSIS (NEW FEATURE)
@@ -582,9 +2543,8 @@ graph_update = builder2.compile()
 # LLM QUALITY KEYWORD EXTRACTION
 # =========================================================
 
-def extract_quality_keywords_llm(resume_text, jd_text, llm, limiter):
-
-    prompt = f"""
+def _keywords_prompt(resume_text, jd_text):
+    return f"""
 You are an ATS keyword intelligence engine.
 
 Extract ONLY high-impact technical and domain-specific keywords.
@@ -612,30 +2572,46 @@ RESUME:
 {resume_text}
 """
 
-    limiter.wait_if_needed()
-    response = llm.invoke(prompt)
-    print(2,response.content)
-    data = safe_json_parse(response.content)
+
+def _parse_keywords(content):
+    data = safe_json_parse(content)
 
     return (
         set(data.get("jd_keywords", [])),
         set(data.get("resume_keywords", []))
     )
 
-def extract_missing_keywords(structured_resume, jd_text, provider, api_key, rpm,model):
 
-    llm, limiter = get_llm(provider, api_key, rpm,model)
+def extract_quality_keywords_llm(resume_text, jd_text, llm, limiter, use_cache=True):
 
-    resume_text = json.dumps(structured_resume)
+    response = invoke_llm(
+        llm,
+        limiter,
+        _keywords_prompt(resume_text, jd_text),
+        use_cache=use_cache,
+        validate=_is_json
+    )
 
-    jd_keywords, resume_keywords = extract_quality_keywords_llm(
-        resume_text,
-        jd_text,
+    return _parse_keywords(response.content)
+
+
+async def aextract_quality_keywords_llm(resume_text, jd_text, llm, limiter, use_cache=True, timeout=None):
+
+    response = await ainvoke_llm(
         llm,
-        limiter
+        limiter,
+        _keywords_prompt(resume_text, jd_text),
+        use_cache=use_cache,
+        validate=_is_json,
+        timeout=timeout
     )
 
-    missing = list(jd_keywords - resume_keywords)
+    return _parse_keywords(response.content)
+
+def missing_keywords_from_sets(jd_keywords, resume_keywords):
+
+    resume_keywords = set(resume_keywords)
+    missing = [k for k in jd_keywords if k not in resume_keywords]
 
     return missing[:15]
 
@@ -658,77 +2634,201 @@ def generate_match_insight(ats_score):
 # PUBLIC FUNCTIONS (ENHANCED)
 # =========================================================
 
-def initial_build(uploaded_file=None,user_info=None,job_description="", provider="groq",api_key="", rpm=30, model="openai/gpt-oss-120b"):
+def load_resume_text(uploaded_file):
 
     resume_text = ""
 
-    if uploaded_file:
-        if uploaded_file.type == "application/pdf":
-            resume_text = extract_text_from_pdf(uploaded_file.read())
-        elif uploaded_file.type == "text/plain":
-            resume_text = uploaded_file.read().decode("utf-8")
-    print("Extracted Resume Text:", resume_text[:500])
-
-    resume_text = clean_text(resume_text)
-    print("Extracted Resume Text:", resume_text[:500])
-
-    result = graph_initial.invoke({
-    "resume_text": resume_text,
-    "user_info": user_info,
-    "job_description": job_description,
-    "provider": provider,
-    "api_key": api_key,
-    "rpm": rpm,
-    "model": model
-    })
-    print("State_result",result["structured_resume"])
-
-
-    # Additional Analysis Layer
-    level, inference = generate_match_insight(result["ats_score"])
-    missing = extract_missing_keywords(
-    result["structured_resume"],
-    job_description,
-    provider,
-    api_key,
-    rpm,
-    model
-)
+    with span("parse", "load_resume_text") as trace:
+        if uploaded_file:
+            data = uploaded_file.read()
+            trace.set(input_bytes=len(data), content_type=uploaded_file.type)
 
-    result["additional_analysis"] = {
-        "match_level": level,
-        "inference": inference,
-        "missing_keywords": missing
-    }
+            if uploaded_file.type == "application/pdf":
+                resume_text = extract_resume_layout(data)["text"]
+            elif uploaded_file.type == "text/plain":
+                resume_text = data.decode("utf-8")
+
+        resume_text = clean_resume_text(resume_text)
+        trace.set(output_bytes=len(resume_text.encode("utf-8")))
+
+    return resume_text
+
+
+def initial_build(uploaded_file=None,user_info=None,job_description="", provider="groq",api_key="", rpm=30, model="openai/gpt-oss-120b", use_cache=True):
+
+    resume_text = load_resume_text(uploaded_file)
+
+    return build_from_text(resume_text, user_info, job_description, provider, api_key, rpm, model, use_cache)
+
+
+def build_from_text(resume_text, user_info=None, job_description="", provider="groq", api_key="", rpm=30, model="openai/gpt-oss-120b", use_cache=True):
+
+    # Same as initial_build for callers that already extracted the resume
+    with span("graph", "initial_build"):
+        result = graph_initial.invoke({
+        "resume_text": resume_text,
+        "user_info": user_info,
+        "job_description": job_description,
+        "provider": provider,
+        "api_key": api_key,
+        "rpm": rpm,
+        "model": model,
+        "use_cache": use_cache
+        })
+
+    result["timing_report"] = timing_report(result.get("node_timings"), graph_initial)
 
     return result
 
 
-def update_resume(    existing_resume, user_answers, job_description,provider="groq",api_key="",rpm=30,model="openai/gpt-oss-120b"):
-
-    result = graph_update.invoke({
-    "structured_resume": existing_resume,
-    "user_answers": user_answers,
-    "job_description": job_description,
-    "provider": provider,
-    "api_key": api_key,
-    "rpm": rpm,
-    "model": model
-     })
-    level, inference = generate_match_insight(result["ats_score"])
-    missing = extract_missing_keywords(
-    result["structured_resume"],
-    job_description,
-    provider,
-    api_key,
-    rpm,model
-   )
-
-    result["additional_analysis"] = {
-        "match_level": level,
-        "inference": inference,
-        "missing_keywords": missing
-    }
+def stream_initial_build(uploaded_file=None,user_info=None,job_description="", provider="groq",api_key="", rpm=30, model="openai/gpt-oss-120b", use_cache=True):
+
+    # Yields resume sections as they close, then {"type": "result", ...}
+    resume_text = load_resume_text(uploaded_file)
+
+    result = None
+
+    for mode, chunk in graph_initial.stream({
+        "resume_text": resume_text,
+        "user_info": user_info,
+        "job_description": job_description,
+        "provider": provider,
+        "api_key": api_key,
+        "rpm": rpm,
+        "model": model,
+        "use_cache": use_cache,
+        "stream": True
+    }, stream_mode=["custom", "values"]):
+
+        if mode == "custom":
+            yield chunk
+        else:
+            result = chunk
+
+    result["timing_report"] = timing_report(result.get("node_timings"), graph_initial)
+
+    yield {"type": "result", "result": result}
+
+
+def update_resume(    existing_resume, user_answers, job_description,provider="groq",api_key="",rpm=30,model="openai/gpt-oss-120b", use_cache=True, update_mode="incremental"):
+
+    with span("graph", "update_resume"):
+        result = graph_update.invoke({
+        "structured_resume": existing_resume,
+        "user_answers": user_answers,
+        "job_description": job_description,
+        "provider": provider,
+        "api_key": api_key,
+        "rpm": rpm,
+        "model": model,
+        "use_cache": use_cache,
+        "update_mode": update_mode
+         })
+
+    return _update_result(result, graph_update)
+
+
+def _update_result(result, graph):
+
+    result["timing_report"] = timing_report(result.get("node_timings"), graph)
+
+    # Steps the graph routed around, and whether scoring needed the model
+    result["skipped_steps"] = [
+        name for name in ("update_resume",)
+        if name not in (result.get("node_timings") or {})
+    ]
+    ats_usage = (result.get("llm_usage") or {}).get("ats_score", {})
+    result["rescored_from_cache"] = (
+        not ats_usage.get("calls") and bool(ats_usage.get("response_cache_hits"))
+    )
+
+    return result
+
+
+# =========================================================
+# ASYNC PUBLIC FUNCTIONS
+# =========================================================
+#
+# Same pipelines on the coroutine graphs: model calls use ainvoke and the
+# limiter waits with asyncio.sleep, so one process can serve many builds.
+# `timeout` bounds the whole run and `llm_timeout` each model request; both
+# raise TimeoutError. Cancelling the awaiting task cancels in-flight calls.
+
+async def ainitial_build(uploaded_file=None, user_info=None, job_description="", provider="groq", api_key="", rpm=30, model="openai/gpt-oss-120b", use_cache=True, timeout=None, llm_timeout=None):
+
+    # PDF parsing is CPU-bound, so it runs off the event loop
+    resume_text = await asyncio.to_thread(load_resume_text, uploaded_file)
+
+    return await abuild_from_text(resume_text, user_info, job_description, provider, api_key, rpm, model, use_cache, timeout, llm_timeout)
+
+
+async def abuild_from_text(resume_text, user_info=None, job_description="", provider="groq", api_key="", rpm=30, model="openai/gpt-oss-120b", use_cache=True, timeout=None, llm_timeout=None):
+
+    with span("graph", "initial_build", mode="async"):
+        result = await asyncio.wait_for(agraph_initial.ainvoke({
+        "resume_text": resume_text,
+        "user_info": user_info,
+        "job_description": job_description,
+        "provider": provider,
+        "api_key": api_key,
+        "rpm": rpm,
+        "model": model,
+        "use_cache": use_cache,
+        "llm_timeout": llm_timeout
+        }), timeout)
+
+    result["timing_report"] = timing_report(result.get("node_timings"), agraph_initial)
+
+    return result
+
+
+async def aupdate_resume(existing_resume, user_answers, job_description, provider="groq", api_key="", rpm=30, model="openai/gpt-oss-120b", use_cache=True, update_mode="incremental", timeout=None, llm_timeout=None):
+
+    with span("graph", "update_resume", mode="async"):
+        result = await asyncio.wait_for(agraph_update.ainvoke({
+        "structured_resume": existing_resume,
+        "user_answers": user_answers,
+        "job_description": job_description,
+        "provider": provider,
+        "api_key": api_key,
+        "rpm": rpm,
+        "model": model,
+        "use_cache": use_cache,
+        "update_mode": update_mode,
+        "llm_timeout": llm_timeout
+        }), timeout)
+
+    return _update_result(result, agraph_update)
+
+
+def rescore_resume(structured_resume, job_description, use_llm=False, provider="groq", api_key="", rpm=30, model="openai/gpt-oss-120b", use_cache=True):
+
+    # Local mode needs no key and no network; the LLM scorer is opt-in
+    if use_llm:
+        result = {
+            "structured_resume": structured_resume,
+            "job_description": job_description,
+            "provider": provider,
+            "api_key": api_key,
+            "rpm": rpm,
+            "model": model,
+            "use_cache": use_cache
+        }
+        result.update(ats_score_node(result))
+    else:
+        ats_score, jd_keywords, resume_keywords = local_ats_score(
+            structured_resume,
+            job_description
+        )
+        result = {
+            "structured_resume": structured_resume,
+            "job_description": job_description,
+            "ats_score": ats_score,
+            "jd_keywords": jd_keywords,
+            "resume_keywords": resume_keywords
+        }
+
+    result.update(analysis_node(result))
 
     return result
 
@@ -748,24 +2848,100 @@ def sanitize_for_docx(data):
     else:
         return data
 
-def generate_docx(structured_resume, template_name="Classic"):
+TEMPLATE_MAP = {
+    "Classic": "templates/classic.docx",
+    "Modern": "templates/modern.docx",
+    "Minimal": "templates/minimal.docx"
+}
 
-    template_map = {
-        "Classic": "templates/classic.docx",
-        "Modern": "templates/modern.docx",
-        "Minimal": "templates/minimal.docx"
-    }
 
-    template_path = template_map.get(template_name, "templates/classic.docx")
+class _MemoizedEnvironment(Environment):
 
-    doc = DocxTemplate(template_path)
-    safe_data = sanitize_for_docx(structured_resume)
-    doc.render(safe_data)
-    # doc.render(structured_resume)
+    # docxtpl calls from_string on every render; the patched XML of a given
+    # template never changes, so its compiled form can be reused
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._compiled = {}
+
+    def from_string(self, source, globals=None, template_class=None):
+        if globals is not None or template_class is not None or not isinstance(source, str):
+            return super().from_string(source, globals, template_class)
+
+        template = self._compiled.get(source)
+        if template is None:
+            template = super().from_string(source)
+            self._compiled[source] = template
+        return template
+
+
+class _RegisteredDocxTemplate(DocxTemplate):
+
+    def __init__(self, template_file, patch_cache):
+        super().__init__(template_file)
+        self._patch_cache = patch_cache
+
+    def patch_xml(self, src_xml):
+        patched = self._patch_cache.get(src_xml)
+        if patched is None:
+            patched = super().patch_xml(src_xml)
+            self._patch_cache[src_xml] = patched
+        return patched
+
+
+class TemplateRegistry:
+
+    def __init__(self):
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def _entry(self, path):
+        mtime = os.path.getmtime(path)
+
+        with self._lock:
+            entry = self._entries.get(path)
+
+            # Editing a template on disk drops its cached forms
+            if entry is None or entry["mtime"] != mtime:
+                with open(path, "rb") as f:
+                    raw = f.read()
+                entry = {
+                    "mtime": mtime,
+                    "raw": raw,
+                    "patched": {},
+                    "env": _MemoizedEnvironment()
+                }
+                self._entries[path] = entry
 
-    buffer = BytesIO()
-    doc.save(buffer)
-    buffer.seek(0)
+        return entry
+
+    def render(self, path, context):
+        entry = self._entry(path)
+
+        # Each render opens its own in-memory copy of the template
+        doc = _RegisteredDocxTemplate(BytesIO(entry["raw"]), entry["patched"])
+        doc.render(context, jinja_env=entry["env"])
+
+        buffer = BytesIO()
+        doc.save(buffer)
+        buffer.seek(0)
+        return buffer
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+_TEMPLATE_REGISTRY = TemplateRegistry()
+
+
+def generate_docx(structured_resume, template_name="Classic"):
+
+    template_path = TEMPLATE_MAP.get(template_name, "templates/classic.docx")
+
+    with span("render", "generate_docx", template=template_name) as trace:
+        safe_data = sanitize_for_docx(structured_resume)
+        buffer = _TEMPLATE_REGISTRY.render(template_path, safe_data)
+        trace.set(output_bytes=buffer.getbuffer().nbytes)
 
     return buffer
 
@@ -777,37 +2953,69 @@ def generate_docx(structured_resume, template_name="Classic"):
 
 
 
+def _conversion_work_root():
+    # tmpfs keeps the DOCX/PDF round trip off shared volumes in containers
+    root = os.getenv("PDF_WORK_DIR")
+    if root:
+        return root
+    if os.path.isdir("/dev/shm") and os.access("/dev/shm", os.W_OK):
+        return "/dev/shm"
+    return None
+
+
+def _write_buffer(docx_buffer, path):
+    with open(path, "wb") as f:
+        if hasattr(docx_buffer, "getbuffer"):
+            # Hands BytesIO's memory to the file without an intermediate copy
+            with docx_buffer.getbuffer() as view:
+                f.write(view)
+        elif isinstance(docx_buffer, (bytes, bytearray, memoryview)):
+            f.write(docx_buffer)
+        else:
+            shutil.copyfileobj(docx_buffer, f)
+
+
+def _buffer_size(docx_buffer):
+    if hasattr(docx_buffer, "getbuffer"):
+        return docx_buffer.getbuffer().nbytes
+    if isinstance(docx_buffer, (bytes, bytearray, memoryview)):
+        return len(docx_buffer)
+    return None
+
+
 def generate_pdf_from_docx(docx_buffer, environment="website"):
 
-    import os
-    import tempfile
-    import subprocess
+    with span("render", "generate_pdf_from_docx", environment=environment, input_bytes=_buffer_size(docx_buffer)) as trace:
+        pdf_bytes = _convert_docx_to_pdf(docx_buffer, environment)
+        trace.set(output_bytes=len(pdf_bytes))
 
-    with tempfile.NamedTemporaryFile(delete=False, suffix=".docx") as tmp_docx:
-        tmp_docx.write(docx_buffer.read())
-        tmp_docx_path = tmp_docx.name
+    return pdf_bytes
 
-    pdf_path = tmp_docx_path.replace(".docx", ".pdf")
 
-    try:
+def _convert_docx_to_pdf(docx_buffer, environment):
+
+    # One private directory per request; removed on success and failure alike
+    with tempfile.TemporaryDirectory(prefix="resume_pdf_", dir=_conversion_work_root()) as work_dir:
+
+        tmp_docx_path = os.path.join(work_dir, "resume.docx")
+        pdf_path = os.path.join(work_dir, "resume.pdf")
+
+        _write_buffer(docx_buffer, tmp_docx_path)
 
         # ======================================================
         # WEBSITE / LINUX MODE (LibreOffice)
         # ======================================================
         if environment == "website":
             try:
-                subprocess.run([
-                    "soffice",
-                    "--headless",
-                    "--convert-to", "pdf",
-                    tmp_docx_path,
-                    "--outdir", os.path.dirname(tmp_docx_path)
-                ], check=True)
+                # Warm, profile-isolated soffice workers shared by all sessions
+                get_soffice_pool().convert(tmp_docx_path, work_dir)
             except FileNotFoundError:
                 raise Exception(
                     "LibreOffice (soffice) not found. "
                     "Install LibreOffice or switch to Windows mode."
                 )
+            except (WorkerError, ConversionError) as e:
+                raise Exception(f"LibreOffice conversion failed.\n\n{str(e)}")
 
         # ======================================================
         # WINDOWS MODE (MS Word COM)
@@ -848,11 +3056,117 @@ def generate_pdf_from_docx(docx_buffer, environment="website"):
 
         return pdf_bytes
 
-    finally:
-        # Always clean temp DOCX
-        if os.path.exists(tmp_docx_path):
-            os.remove(tmp_docx_path)
 
-        # Clean PDF if exists
-        if os.path.exists(pdf_path):
-            os.remove(pdf_path)
\ No newline at end of file
+# =========================================================
+# RENDER ALL TEMPLATES (BATCH DOCX + PDF)
+# =========================================================
+
+def generate_pdfs_from_docx(docx_buffers, environment="website"):
+
+    # docx_buffers: {name: BytesIO}; returns {name: pdf bytes or Exception}
+    if environment != "website":
+        results = {}
+        for name, buffer in docx_buffers.items():
+            try:
+                results[name] = generate_pdf_from_docx(buffer, environment)
+            except Exception as e:
+                results[name] = e
+        return results
+
+    with tempfile.TemporaryDirectory(prefix="resume_pdf_", dir=_conversion_work_root()) as work_dir:
+
+        sources = {}
+        for index, (name, buffer) in enumerate(docx_buffers.items()):
+            path = os.path.join(work_dir, f"resume_{index}.docx")
+            _write_buffer(buffer, path)
+            sources[name] = path
+
+        # A missing LibreOffice fails every item, not the whole batch
+        try:
+            pool = get_soffice_pool()
+        except FileNotFoundError:
+            error = Exception(
+                "LibreOffice (soffice) not found. "
+                "Install LibreOffice or switch to Windows mode."
+            )
+            return {name: error for name in docx_buffers}
+        except Exception as e:
+            return {name: e for name in docx_buffers}
+
+        def convert(name, path):
+            with span("render", "generate_pdf_from_docx", environment=environment, template=name, input_bytes=os.path.getsize(path)) as trace:
+                pdf_path = pool.convert(path, work_dir)
+                trace.set(output_bytes=os.path.getsize(pdf_path))
+            return pdf_path
+
+        # One batch through the pool: conversions run on all idle workers
+        with ThreadPoolExecutor(max_workers=max(1, pool.size)) as executor:
+            futures = {
+                name: executor.submit(contextvars.copy_context().run, convert, name, path)
+                for name, path in sources.items()
+            }
+
+        results = {}
+        for name, future in futures.items():
+            try:
+                with open(future.result(), "rb") as f:
+                    results[name] = f.read()
+            except Exception as e:
+                results[name] = e
+
+        return results
+
+
+def render_pdf_thumbnail(pdf_bytes, dpi=60):
+    with fitz.open(stream=pdf_bytes, filetype="pdf") as pdf:
+        return pdf[0].get_pixmap(dpi=dpi).tobytes("png")
+
+
+def render_all_templates(structured_resume, environment="website", thumbnails=False, template_names=None):
+
+    template_names = template_names or list(TEMPLATE_MAP)
+
+    unknown = [name for name in template_names if name not in TEMPLATE_MAP]
+    if unknown:
+        raise ValueError(f"Unknown template(s): {', '.join(unknown)}")
+
+    # Sanitised once and shared read-only by every render
+    safe_data = sanitize_for_docx(structured_resume)
+
+    def render(name):
+        with span("render", "generate_docx", template=name) as trace:
+            buffer = _TEMPLATE_REGISTRY.render(TEMPLATE_MAP[name], safe_data)
+            trace.set(output_bytes=buffer.getbuffer().nbytes)
+        return buffer
+
+    with ThreadPoolExecutor(max_workers=len(template_names)) as executor:
+        futures = {
+            name: executor.submit(contextvars.copy_context().run, render, name)
+            for name in template_names
+        }
+
+    results = {}
+    docx_buffers = {}
+
+    for name, future in futures.items():
+        try:
+            docx_buffers[name] = future.result()
+            results[name] = {"docx": docx_buffers[name].getvalue(), "pdf": None, "thumbnail": None, "error": None}
+        except Exception as e:
+            results[name] = {"docx": None, "pdf": None, "thumbnail": None, "error": str(e)}
+
+    if docx_buffers:
+        for name, pdf in generate_pdfs_from_docx(docx_buffers, environment).items():
+            if isinstance(pdf, Exception):
+                results[name]["error"] = str(pdf)
+                continue
+
+            results[name]["pdf"] = pdf
+            if thumbnails:
+                # A failed preview keeps the PDF downloadable
+                try:
+                    results[name]["thumbnail"] = render_pdf_thumbnail(pdf)
+                except Exception as e:
+                    results[name]["error"] = f"Preview failed: {e}"
+
+    return results
@@ -1,13 +1,24 @@
 import streamlit as st
+import os
 import json
+import time
+from job_queue import get_job_queue
+from tracing import start_metrics_server
 from agent import (
-    initial_build,
+    load_resume_text,
+    stream_initial_build,
+    TruncatedJSONError,
     update_resume,
+    rescore_resume,
     generate_docx,
-    generate_pdf_from_docx
+    generate_pdf_from_docx,
+    render_all_templates
 )
 
 st.set_page_config(layout="wide")
+
+# Serves /metrics when METRICS_PORT is set; safe across reruns
+start_metrics_server()
 st.title("🚀 AI Resume Builder (Interactive ATS Optimizer Pro)")
 
 # ======================================================
@@ -22,6 +33,10 @@ def init_session():
         "ats_score_before": None,
         "additional_analysis": None,
         "job_description": "",
+        "timing_report": None,
+        "prompt_budget": None,
+        "llm_usage": None,
+        "job_id": None,
     }
     for k, v in defaults.items():
         if k not in st.session_state:
@@ -52,9 +67,14 @@ uploaded_resume = st.sidebar.file_uploader("Upload Resume", type=["pdf", "txt"])
 
 st.sidebar.header("🤖 LLM Configuration")
 
+# The pool spends the server's own keys, so visitors only see it when the
+# deployment opts in
+pool_in_ui = os.getenv("ENABLE_POOL_IN_UI", "").strip().lower() in ("1", "true", "yes", "on")
+
 provider = st.sidebar.selectbox(
     "Select LLM Provider",
-    ["Groq", "Gemini"]
+    ["Groq", "Gemini", "Pool"] if pool_in_ui else ["Groq", "Gemini"],
+    help="Pool spreads calls across the keys and providers listed in the LLM_POOL environment variable." if pool_in_ui else None
 )
 # -------------------------
 # MODEL LIST PER PROVIDER
@@ -68,11 +88,14 @@ if provider == "Groq":
         "Select Groq Model",
         groq_models
     )
-else:
+elif provider == "Gemini":
     model_choice = st.sidebar.selectbox(
         "Select Gemini Model",
         gemini_models
     )
+else:
+    # Models, keys and per-key RPM/TPM come from LLM_POOL
+    model_choice = "pool"
 
 # If user selects "Other"
 if model_choice == "Other":
@@ -85,16 +108,33 @@ else:
 
 st.sidebar.caption("⚠ Larger models support longer resumes and reduce JSON truncation risk.")
 
-api_key = st.sidebar.text_input(
-    f"Enter {provider} API Key",
-    type="password"
+if provider == "Pool":
+    api_key = ""
+    rpm = 30
+    st.sidebar.caption("Using the LLM_POOL keys; each key keeps its own RPM/TPM budget.")
+else:
+    api_key = st.sidebar.text_input(
+        f"Enter {provider} API Key",
+        type="password"
+    )
+
+    rpm = st.sidebar.number_input(
+        "Requests Per Minute (RPM Limit)",
+        min_value=1,
+        max_value=60,
+        value=5 if provider == "Gemini" else 30
+    )
+
+use_cache = st.sidebar.checkbox(
+    "Reuse cached LLM responses",
+    value=True,
+    help="Identical JD/resume inputs are answered from the local response cache instead of calling the LLM again."
 )
 
-rpm = st.sidebar.number_input(
-    "Requests Per Minute (RPM Limit)",
-    min_value=1,
-    max_value=60,
-    value=5 if provider == "Gemini" else 30
+use_queue = st.sidebar.checkbox(
+    "Run in background job queue",
+    value=False,
+    help="Submits the build to worker processes (python job_queue.py worker) and polls for the result."
 )
 
 name = st.sidebar.text_input("Name")
@@ -139,6 +179,42 @@ if not job_description:
     st.warning("Please paste Job Description before generating.")
 
 
+def render_stream_event(container, event):
+
+    key = event.get("key")
+    value = event.get("value")
+
+    if event["type"] == "item" and key == "experience" and isinstance(value, dict):
+        container.markdown(f"✅ **{value.get('position', '')}** — {value.get('company', '')}")
+    elif event["type"] == "section" and key == "summary":
+        container.markdown(f"✅ **Summary:** {value}")
+    elif event["type"] == "section" and key == "technical_skills" and isinstance(value, dict):
+        container.markdown("✅ **Skills:** " + ", ".join(value.keys()))
+    elif event["type"] == "truncated":
+        container.warning(f"Output truncated while writing '{event.get('open_key')}'. Requesting only the missing sections...")
+    elif event["type"] == "recovered":
+        report = event["report"]
+        container.info(
+            f"Recovered {len(report['continued_keys'])} section(s): "
+            f"salvaged ~{report['salvaged_tokens']} tokens, re-spent ~{report['continuation_tokens']}."
+        )
+
+
+def apply_build_result(result):
+
+    if result.get("generation_report", {}).get("missing_keys"):
+        st.warning("Some sections could not be recovered: " + ", ".join(result["generation_report"]["missing_keys"]))
+
+    st.session_state.resume_data = result["structured_resume"]
+    st.session_state.all_templates = None
+    st.session_state.questions = result["gap_questions"]
+    st.session_state.ats_score = result["ats_score"]
+    st.session_state.additional_analysis = result.get("additional_analysis")
+    st.session_state.timing_report = result.get("timing_report")
+    st.session_state.prompt_budget = result.get("prompt_budget")
+    st.session_state.llm_usage = result.get("llm_usage")
+
+
 if st.button("🚀 Generate Optimized Resume"):
    with st.spinner("Analyzing JD and Optimizing Resume..."):
 
@@ -152,12 +228,66 @@ if st.button("🚀 Generate Optimized Resume"):
             "projects": projects
         }
 
-        result = initial_build(uploaded_resume,user_info,job_description, provider.lower(),api_key,rpm,selected_model)
+        if use_queue:
+            # Identical submissions get the same job id back
+            st.session_state.job_id = get_job_queue().submit("build", {
+                "resume_text": load_resume_text(uploaded_resume),
+                "user_info": user_info,
+                "job_description": job_description,
+                "provider": provider.lower(),
+                "api_key": api_key,
+                "rpm": rpm,
+                "model": selected_model,
+                "use_cache": use_cache
+            })
+            st.rerun()
+
+        live_preview = st.container()
+        result = None
 
-        st.session_state.resume_data = result["structured_resume"]
-        st.session_state.questions = result["gap_questions"]
-        st.session_state.ats_score = result["ats_score"]
-        st.session_state.additional_analysis = result.get("additional_analysis")
+        try:
+            for event in stream_initial_build(uploaded_resume,user_info,job_description, provider.lower(),api_key,rpm,selected_model,use_cache):
+                if event["type"] == "result":
+                    result = event["result"]
+                else:
+                    render_stream_event(live_preview, event)
+        except TruncatedJSONError as e:
+            st.error(f"Generation was cut off while writing '{e.open_key}' and could not be recovered. Try a larger model or a shorter resume.")
+            st.stop()
+
+        apply_build_result(result)
+
+# ======================================================
+# JOB STATUS (QUEUE MODE)
+# ======================================================
+
+if st.session_state.job_id:
+
+    job = get_job_queue().get(st.session_state.job_id)
+
+    if job is None:
+        st.session_state.job_id = None
+
+    elif job["status"] == "done":
+        st.session_state.job_id = None
+        apply_build_result(job["result"])
+
+    elif job["status"] == "failed":
+        st.session_state.job_id = None
+        st.error(f"Background job failed: {job['error']}")
+
+    else:
+        stats = get_job_queue().stats()
+        if job["status"] == "queued":
+            st.info(
+                f"Job {job['id'][:8]} queued at position {job['position']} "
+                f"({stats['queue_depth']} waiting, avg wait {stats['avg_wait_seconds']}s)"
+            )
+        else:
+            st.info(f"Job {job['id'][:8]} running (waited {job['wait_seconds']}s in queue)...")
+
+        time.sleep(2)
+        st.rerun()
 
 # ======================================================
 # ATS SCORE VISUALIZATION
@@ -211,6 +341,47 @@ if st.session_state.additional_analysis:
     else:
         st.success("No major JD keywords missing.")
 
+# ======================================================
+# PIPELINE TIMING
+# ======================================================
+
+if st.session_state.timing_report:
+
+    report = st.session_state.timing_report
+
+    with st.expander("⏱ Pipeline Timing"):
+
+        col1, col2 = st.columns(2)
+        col1.metric("Wall Time (s)", report["wall_seconds"])
+        col2.metric("Critical Path (s)", report.get("critical_path_seconds", report["wall_seconds"]))
+
+        if report.get("critical_path"):
+            st.caption("Critical path: " + " → ".join(report["critical_path"]))
+
+        st.table({
+            "Node": list(report["nodes"].keys()),
+            "Start (s)": [n["start"] for n in report["nodes"].values()],
+            "Seconds": [n["seconds"] for n in report["nodes"].values()],
+        })
+
+        budget = st.session_state.prompt_budget
+        if budget:
+            st.caption(
+                f"Prompt inputs: {budget['total_before']} → {budget['total_after']} estimated tokens"
+            )
+            if budget["truncated"] or budget["truncated_sections"]:
+                st.caption("Trimmed to budget: " + ", ".join(budget["truncated"] + budget["truncated_sections"]))
+
+        usage = st.session_state.llm_usage
+        if usage:
+            st.table({
+                "Node": list(usage.keys()),
+                "LLM Calls": [u["calls"] for u in usage.values()],
+                "Cached Responses": [u["response_cache_hits"] for u in usage.values()],
+                "Input Tokens": [u["input_tokens"] for u in usage.values()],
+                "Prefix-Cached Input": [u["cached_input_tokens"] for u in usage.values()],
+            })
+
 # ======================================================
 # GAP QUESTIONS
 # ======================================================
@@ -229,13 +400,27 @@ if st.session_state.questions:
 
         with st.spinner("Enhancing resume..."):
 
-            updated = update_resume(st.session_state.resume_data,answers,st.session_state.job_description,provider.lower(), api_key,rpm,selected_model)
+            updated = update_resume(st.session_state.resume_data,answers,st.session_state.job_description,provider.lower(), api_key,rpm,selected_model,use_cache)
             st.session_state.resume_data = updated["structured_resume"]
+            st.session_state.all_templates = None
             st.session_state.ats_score = updated["ats_score"]
             st.session_state.additional_analysis = updated.get("additional_analysis")
+            st.session_state.timing_report = updated.get("timing_report")
+            st.session_state.prompt_budget = updated.get("prompt_budget")
+            st.session_state.llm_usage = updated.get("llm_usage")
 
         st.success("Resume Updated Successfully!")
 
+        updated_sections = updated.get("generation_report", {}).get("updated_sections")
+        if updated_sections:
+            st.caption("Updated sections: " + ", ".join(updated_sections))
+
+        if "update_resume" in updated.get("skipped_steps", []):
+            st.info(
+                "No answers were filled in, so the resume was not regenerated"
+                + (" and the score was reused from cache." if updated.get("rescored_from_cache") else ".")
+            )
+
 # ======================================================
 # BEFORE VS AFTER
 # ======================================================
@@ -272,14 +457,22 @@ if st.session_state.resume_data is not None:
         height=400
     )
 
+    use_llm_rescore = st.checkbox(
+        "Use LLM for rescoring",
+        value=False,
+        help="Off: instant local scoring (keywords, skill phrases, metrics). On: LLM keyword extraction and semantic relevance."
+    )
+
     if st.button("🔁 Recalculate ATS Score"):
         try:
             updated_resume = json.loads(edited_json)
             st.session_state.resume_data = updated_resume
+            st.session_state.all_templates = None
 
-            updated = update_resume(updated_resume, {}, st.session_state.job_description,provider.lower(),api_key,rpm,selected_model)
+            updated = rescore_resume(updated_resume, st.session_state.job_description, use_llm_rescore, provider.lower(), api_key, rpm, selected_model, use_cache)
 
             st.session_state.ats_score = updated["ats_score"]
+            st.session_state.additional_analysis = updated.get("additional_analysis")
             st.success("ATS Recalculated Successfully!")
 
         except:
@@ -316,4 +509,49 @@ if st.session_state.resume_data is not None:
             data=pdf_file,
             file_name="Final_ATS_Resume.pdf",
             mime="application/pdf"
-        )
\ No newline at end of file
+        )
+
+    if st.button("Preview All Templates"):
+
+        with st.spinner("Rendering every template..."):
+            try:
+                st.session_state.all_templates = render_all_templates(
+                    st.session_state.resume_data,
+                    runtime_env,
+                    thumbnails=True
+                )
+            except Exception as e:
+                st.session_state.all_templates = None
+                st.error(f"Could not render the templates: {e}")
+
+    if st.session_state.get("all_templates"):
+
+        columns = st.columns(len(st.session_state.all_templates))
+
+        for column, (name, files) in zip(columns, st.session_state.all_templates.items()):
+            with column:
+                st.markdown(f"**{name}**")
+
+                if files["thumbnail"]:
+                    st.image(files["thumbnail"], width="stretch")
+
+                if files["error"]:
+                    st.warning(files["error"])
+
+                if files["docx"]:
+                    st.download_button(
+                        "Download DOCX",
+                        data=files["docx"],
+                        file_name=f"{name}_ATS_Resume.docx",
+                        mime="application/vnd.openxmlformats-officedocument.wordprocessingml.document",
+                        key=f"docx_{name}"
+                    )
+
+                if files["pdf"]:
+                    st.download_button(
+                        "Download PDF",
+                        data=files["pdf"],
+                        file_name=f"{name}_ATS_Resume.pdf",
+                        mime="application/pdf",
+                        key=f"pdf_{name}"
+                    )
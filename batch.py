@@ -0,0 +1,395 @@
+# =========================================================
+# batch.py (BATCH MODE: TAILORING + SCREENING)
+# =========================================================
+
+import os
+import json
+import time
+import argparse
+import threading
+from itertools import islice
+from concurrent.futures import ThreadPoolExecutor, as_completed, wait, FIRST_COMPLETED
+from dotenv import load_dotenv
+
+from agent import (
+    build_from_text,
+    extract_resume_layout,
+    clean_resume_text,
+    get_llm,
+    extract_quality_keywords_llm,
+    match_keywords_in_text,
+    calculate_quant_score,
+    score_semantic_relevance_batch
+)
+
+
+# =========================================================
+# INPUT LOADING
+# =========================================================
+
+def read_resume_file(path):
+
+    with open(path, "rb") as f:
+        data = f.read()
+
+    if path.lower().endswith(".pdf"):
+        return clean_resume_text(extract_resume_layout(data)["text"])
+
+    return clean_resume_text(data.decode("utf-8"))
+
+
+def iter_job_descriptions(source):
+
+    # A directory of .txt/.md files (id = file name) or a JSONL file with
+    # {"id", "job_description", "title"?} per line
+    if os.path.isdir(source):
+        for name in sorted(os.listdir(source)):
+            if not name.lower().endswith((".txt", ".md")):
+                continue
+            with open(os.path.join(source, name), encoding="utf-8") as f:
+                yield {
+                    "id": os.path.splitext(name)[0],
+                    "title": os.path.splitext(name)[0],
+                    "job_description": f.read()
+                }
+        return
+
+    with open(source, encoding="utf-8") as f:
+        for line_no, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            record = json.loads(line)
+            jd_text = record.get("job_description") or record.get("jd") or record.get("text", "")
+            yield {
+                "id": str(record.get("id", line_no)),
+                "title": record.get("title", ""),
+                "job_description": jd_text
+            }
+
+
+# =========================================================
+# CHECKPOINT
+# =========================================================
+
+def load_checkpoint(output_path):
+
+    # The output JSONL doubles as the checkpoint: finished ids are skipped
+    done = {}
+
+    if not os.path.exists(output_path):
+        return done
+
+    with open(output_path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                # Last line may be half-written if the batch was killed
+                continue
+            if not record.get("error"):
+                done[record["id"]] = record
+
+    return done
+
+
+def rank_results(records):
+    return sorted(
+        records,
+        key=lambda r: r.get("overall_ats_score", 0),
+        reverse=True
+    )
+
+
+# =========================================================
+# BATCH RUNNER
+# =========================================================
+
+def tailor_resume_to_jds(resume_text, jobs, output_path, user_info=None, provider="groq", api_key="", rpm=30, model="openai/gpt-oss-120b", workers=4, use_cache=True):
+
+    done = load_checkpoint(output_path)
+    pending = [job for job in jobs if job["id"] not in done]
+
+    print(f"{len(done)} job(s) already done, {len(pending)} to process")
+
+    write_lock = threading.Lock()
+    started = time.time()
+
+    def run(job):
+        try:
+            # Every worker shares the process-wide client and limiter from
+            # get_llm, so the RPM budget is global to the batch
+            result = build_from_text(
+                resume_text,
+                user_info or {},
+                job["job_description"],
+                provider,
+                api_key,
+                rpm,
+                model,
+                use_cache
+            )
+            return {
+                "id": job["id"],
+                "title": job.get("title", ""),
+                "overall_ats_score": result["ats_score"]["overall_ats_score"],
+                "ats_score": result["ats_score"],
+                "additional_analysis": result.get("additional_analysis"),
+                "gap_questions": result.get("gap_questions"),
+                "structured_resume": result["structured_resume"]
+            }
+        except Exception as e:
+            return {"id": job["id"], "title": job.get("title", ""), "error": str(e)}
+
+    with open(output_path, "a", encoding="utf-8") as out, \
+            ThreadPoolExecutor(max_workers=workers) as pool:
+
+        futures = [pool.submit(run, job) for job in pending]
+
+        for count, future in enumerate(as_completed(futures), 1):
+            record = future.result()
+
+            with write_lock:
+                out.write(json.dumps(record, ensure_ascii=False) + "\n")
+                out.flush()
+
+            if not record.get("error"):
+                done[record["id"]] = record
+
+            status = record.get("error") or record["overall_ats_score"]
+            print(f"[{count}/{len(pending)}] {record['id']}: {status}")
+
+    elapsed = time.time() - started
+    print(f"Processed {len(pending)} job(s) in {elapsed:.1f}s")
+
+    return rank_results(done.values())
+
+
+# =========================================================
+# SCREENING: MANY RESUMES x ONE JD
+# =========================================================
+
+def iter_resume_paths(source):
+    for name in sorted(os.listdir(source)):
+        if name.lower().endswith((".pdf", ".txt")):
+            yield os.path.join(source, name)
+
+
+def _batched(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def screen_resumes(resume_paths, job_description, output_path, provider="groq", api_key="", rpm=30, model="openai/gpt-oss-120b", workers=4, batch_size=5, use_cache=True):
+
+    llm, limiter = get_llm(provider, api_key, rpm, model)
+
+    # JD keywords are extracted once for the whole run
+    jd_keywords, _ = extract_quality_keywords_llm("", job_description, llm, limiter, use_cache)
+    print(f"Extracted {len(jd_keywords)} JD keyword(s)")
+
+    done = load_checkpoint(output_path)
+    pending = (
+        path for path in resume_paths
+        if os.path.basename(path) not in done
+    )
+
+    def score_batch(paths):
+        # Resume texts live only for the duration of their batch
+        texts = []
+        records = []
+        for path in paths:
+            resume_id = os.path.basename(path)
+            try:
+                texts.append((resume_id, read_resume_file(path)))
+            except Exception as e:
+                records.append({"id": resume_id, "error": str(e)})
+
+        if not texts:
+            return records
+
+        try:
+            relevance = score_semantic_relevance_batch(
+                texts, job_description, llm, limiter, use_cache
+            )
+        except Exception as e:
+            return records + [{"id": rid, "error": str(e)} for rid, _ in texts]
+
+        for resume_id, text in texts:
+            matched = match_keywords_in_text(jd_keywords, text)
+            keyword_score = int(len(matched) / len(jd_keywords) * 100) if jd_keywords else 0
+            quant_score = calculate_quant_score(text)
+            relevance_score = relevance[resume_id]
+
+            overall = int(
+                (keyword_score * 0.4) +
+                (quant_score * 0.2) +
+                (relevance_score * 0.4)
+            )
+
+            records.append({
+                "id": resume_id,
+                "overall_ats_score": overall,
+                "ats_score": {
+                    "keyword_match_score": keyword_score,
+                    "quantification_score": quant_score,
+                    "semantic_relevance_score": relevance_score,
+                    "overall_ats_score": overall
+                },
+                "missing_keywords": sorted(set(jd_keywords) - matched)[:15]
+            })
+
+        return records
+
+    started = time.time()
+    processed = 0
+
+    with open(output_path, "a", encoding="utf-8") as out, \
+            ThreadPoolExecutor(max_workers=workers) as pool:
+
+        batches = _batched(pending, batch_size)
+        in_flight = set()
+
+        # Keep at most `workers` batches in memory at once
+        while True:
+            while len(in_flight) < workers:
+                chunk = next(batches, None)
+                if chunk is None:
+                    break
+                in_flight.add(pool.submit(score_batch, chunk))
+
+            if not in_flight:
+                break
+
+            finished, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+
+            for future in finished:
+                for record in future.result():
+                    out.write(json.dumps(record, ensure_ascii=False) + "\n")
+                    if not record.get("error"):
+                        done[record["id"]] = record
+                    processed += 1
+                out.flush()
+
+            elapsed = max(time.time() - started, 1e-6)
+            print(f"{processed} resume(s) scored, {processed / elapsed * 60:.1f} resumes/min")
+
+    elapsed = max(time.time() - started, 1e-6)
+    throughput = processed / elapsed * 60
+    print(f"Screened {processed} resume(s) in {elapsed:.1f}s ({throughput:.1f} resumes/min)")
+
+    return rank_results(done.values()), throughput
+
+
+# =========================================================
+# CLI
+# =========================================================
+
+def _api_key_for(provider, explicit):
+    if explicit:
+        return explicit
+    env_name = "GROQ_API_KEY" if provider == "groq" else "GEMINI_API_KEY"
+    return os.getenv(env_name, "")
+
+
+def _add_llm_arguments(parser):
+    parser.add_argument("--provider", default="groq", choices=["groq", "gemini"])
+    parser.add_argument("--model", default="openai/gpt-oss-120b")
+    parser.add_argument("--api-key", default="")
+    parser.add_argument("--rpm", type=int, default=30)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--no-cache", action="store_true")
+
+
+def _write_ranking(ranking, output_path):
+
+    ranking_path = os.path.splitext(output_path)[0] + ".ranking.json"
+    with open(ranking_path, "w", encoding="utf-8") as f:
+        json.dump(
+            [
+                {"rank": i, "id": r["id"], "title": r.get("title", ""),
+                 "overall_ats_score": r["overall_ats_score"]}
+                for i, r in enumerate(ranking, 1)
+            ],
+            f,
+            indent=2
+        )
+
+    print("\nRANKING (overall ATS score)")
+    for i, r in enumerate(ranking, 1):
+        print(f"{i:>3}. {r['overall_ats_score']:>3}  {r['id']}  {r.get('title', '')}")
+    print(f"\nResults: {output_path}\nRanking: {ranking_path}")
+
+
+def main(argv=None):
+
+    load_dotenv()
+
+    parser = argparse.ArgumentParser(description="ResumeForge batch mode")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    tailor = commands.add_parser("tailor", help="Tailor one resume to many job descriptions")
+    tailor.add_argument("--resume", required=True, help="Resume PDF or TXT")
+    tailor.add_argument("--jds", required=True, help="Directory of .txt/.md files or a JSONL file")
+    tailor.add_argument("--out", default="batch_results.jsonl")
+    tailor.add_argument("--user-info", default="", help="Optional JSON file with name/email/skills...")
+    _add_llm_arguments(tailor)
+
+    screen = commands.add_parser("screen", help="Rank many resumes against one job description")
+    screen.add_argument("--jd", required=True, help="Job description text file")
+    screen.add_argument("--resumes", required=True, help="Directory of resume PDF/TXT files")
+    screen.add_argument("--out", default="screening_results.jsonl")
+    screen.add_argument("--batch-size", type=int, default=5, help="Resumes per relevance prompt")
+    _add_llm_arguments(screen)
+
+    args = parser.parse_args(argv)
+
+    if args.command == "tailor":
+        resume_text = read_resume_file(args.resume)
+
+        user_info = {}
+        if args.user_info:
+            with open(args.user_info, encoding="utf-8") as f:
+                user_info = json.load(f)
+
+        ranking = tailor_resume_to_jds(
+            resume_text,
+            list(iter_job_descriptions(args.jds)),
+            args.out,
+            user_info=user_info,
+            provider=args.provider,
+            api_key=_api_key_for(args.provider, args.api_key),
+            rpm=args.rpm,
+            model=args.model,
+            workers=args.workers,
+            use_cache=not args.no_cache
+        )
+
+        _write_ranking(ranking, args.out)
+
+    elif args.command == "screen":
+        with open(args.jd, encoding="utf-8") as f:
+            job_description = f.read()
+
+        ranking, _ = screen_resumes(
+            iter_resume_paths(args.resumes),
+            job_description,
+            args.out,
+            provider=args.provider,
+            api_key=_api_key_for(args.provider, args.api_key),
+            rpm=args.rpm,
+            model=args.model,
+            workers=args.workers,
+            batch_size=args.batch_size,
+            use_cache=not args.no_cache
+        )
+
+        _write_ranking(ranking, args.out)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,776 @@
+# =========================================================
+# benchmark.py (OFFLINE BENCHMARK WITH A DETERMINISTIC FAKE LLM)
+# =========================================================
+#
+# Runs initial_build, update_resume, generate_docx and
+# generate_pdf_from_docx over benchmarks/fixtures with no network access or
+# API quota. get_llm gets a "fake" provider whose answers are derived from
+# the prompt, so the same corpus always gets the same output. Latency is
+# simulated as a time to first token plus prompt and output tokens at
+# configurable rates. Responses recorded from a real provider can be
+# replayed through the same simulator. The report gives p50/p95 latency per
+# step, throughput and peak RSS, and can be compared with a saved JSON
+# baseline.
+
+import os
+import re
+import ast
+import sys
+import json
+import time
+import random
+import asyncio
+import hashlib
+import argparse
+import platform
+import resource
+import threading
+import contextvars
+from io import BytesIO
+from typing import Any
+from concurrent.futures import ThreadPoolExecutor
+
+import fitz
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk
+from langchain_core.outputs import ChatResult, ChatGeneration, ChatGenerationChunk
+
+from agent import (
+    initial_build,
+    update_resume,
+    generate_docx,
+    generate_pdf_from_docx,
+    register_chat_model,
+    extract_skill_phrases,
+    _build_chat_model
+)
+from pdf_extract import parse_layout
+from prompt_budget import estimate_tokens
+from tracing import metrics_snapshot, reset_metrics
+
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+FIXTURES_DIR = os.path.join(REPO_DIR, "benchmarks", "fixtures")
+BASELINE_PATH = os.path.join(REPO_DIR, "benchmarks", "baseline.json")
+
+STEPS = ("initial_build", "update_resume", "generate_docx", "generate_pdf_from_docx")
+
+
+# =========================================================
+# DETERMINISTIC RESPONSES
+# =========================================================
+
+def _between(text, start, end=None):
+    begin = text.find(start)
+    if begin < 0:
+        return ""
+    begin += len(start)
+    stop = text.find(end, begin) if end else -1
+    return text[begin:stop if stop >= 0 else len(text)].strip()
+
+
+def _skills(text):
+    return sorted(extract_skill_phrases(text))
+
+
+def _score(*parts):
+    # Stable pseudo-score in 40..89 for prompts whose answer is a number
+    digest = hashlib.sha256("|".join(parts).encode("utf-8")).hexdigest()
+    return 40 + int(digest[:8], 16) % 50
+
+
+def _gap_questions(resume_text, jd_text, limit=5):
+    missing = [s for s in _skills(jd_text) if s not in set(_skills(resume_text))]
+    return [f"Do you have experience with {skill}? If yes, describe usage." for skill in missing[:limit]]
+
+
+def _entry_fields(line, names):
+    parts = [p.strip() for p in line.split("|")]
+    return {name: parts[i] if i < len(parts) else "" for i, name in enumerate(names)}
+
+
+def fake_resume(resume_text, jd_text=""):
+
+    # Structured resume in the generation schema, read from the (possibly
+    # compressed) resume text
+    layout = parse_layout([resume_text])
+    header = layout["header"]
+    contacts = layout["contacts"]
+
+    resume = {
+        "name": header[0] if header else "",
+        "title": "",
+        "location": "",
+        "phone": (contacts["phones"] or [""])[0],
+        "email": (contacts["emails"] or [""])[0],
+        "linkedin": next((l for l in contacts["links"] if "linkedin" in l), ""),
+        "github": next((l for l in contacts["links"] if "github" in l), ""),
+        "website": "",
+        "summary": "",
+        "experience": [],
+        "education": [],
+        "open_source": [],
+        "projects": [],
+        "technical_skills": {},
+        "certifications": [],
+        "gap_questions": _gap_questions(resume_text, jd_text)
+    }
+
+    for section in layout["sections"]:
+        heading = section["heading"].lower()
+        current = None
+
+        for line in section["lines"]:
+            bullet = line[2:] if line.startswith("- ") else None
+
+            if "experience" in heading or "employment" in heading:
+                if bullet is None:
+                    current = _entry_fields(line, ("position", "company", "duration"))
+                    current["description"] = []
+                    resume["experience"].append(current)
+                elif current:
+                    current["description"].append(bullet)
+
+            elif "education" in heading:
+                entry = _entry_fields(line, ("degree", "institution", "duration"))
+                entry["details"] = ""
+                resume["education"].append(entry)
+
+            elif "project" in heading or "open source" in heading:
+                target = resume["projects"] if "project" in heading else resume["open_source"]
+                if bullet is None:
+                    current = {"title": line, "description": []}
+                    if target is resume["open_source"]:
+                        current["link"] = ""
+                    target.append(current)
+                elif current:
+                    current["description"].append(bullet)
+
+            elif "skill" in heading:
+                category, _, items = line.rpartition(":")
+                resume["technical_skills"].setdefault(category.strip() or "Core", []).extend(
+                    item.strip() for item in items.split(",") if item.strip()
+                )
+
+            elif "certif" in heading:
+                resume["certifications"].append(bullet or line)
+
+            elif heading in ("summary", "profile", "professional summary", "objective", "about me"):
+                resume["summary"] = " ".join(filter(None, [resume["summary"], line]))
+
+    if resume["experience"]:
+        resume["title"] = resume["experience"][0]["position"]
+
+    return resume
+
+
+def _updated_sections(text):
+
+    sections = json.loads(_between(text, "SECTIONS TO UPDATE:", "USER ANSWERS:") or "{}")
+    answers = json.loads(_between(text, "USER ANSWERS:", "Return STRICT JSON") or "[]")
+    keys = json.loads(_between(text, "exactly these keys:") or "[]")
+
+    for key in keys:
+        value = sections.get(key)
+        notes = [a["answer"] for a in answers if key in a.get("sections", [])]
+        if not notes:
+            continue
+        if isinstance(value, list) and all(isinstance(v, str) for v in value):
+            value.extend(notes)
+        elif isinstance(value, dict) and isinstance(value.get("description"), list):
+            value["description"].extend(notes)
+        elif isinstance(value, str):
+            sections[key] = f"{value} {' '.join(notes)}".strip()
+
+    return {key: sections.get(key) for key in keys}
+
+
+def fake_response(text):
+
+    if "CONTINUATION REQUEST" in text:
+        resume = fake_resume(_between(text, "EXISTING RESUME:", "CONTINUATION REQUEST"))
+        keys = json.loads(_between(text, "following all rules above:") or "[]")
+        return json.dumps({key: resume.get(key) for key in keys})
+
+    if "SECTIONS TO UPDATE:" in text:
+        return json.dumps(_updated_sections(text))
+
+    if "keyword intelligence engine" in text:
+        jd = _between(text, "JOB DESCRIPTION:", "RESUME:")
+        resume = _between(text, "RESUME:")
+        return json.dumps({"jd_keywords": _skills(jd), "resume_keywords": _skills(resume)})
+
+    if "Rate each resume's relevance" in text:
+        ids = re.findall(r"RESUME \[(.+?)\]:", text)
+        return json.dumps({resume_id: _score(resume_id, text) for resume_id in ids})
+
+    if "Rate resume relevance" in text:
+        return str(_score(text))
+
+    if "Truth Validator" in text:
+        resume = _between(text, "Resume:", "Job Description:")
+        jd = _between(text, "Job Description:")
+        return json.dumps({"questions": _gap_questions(resume, jd)})
+
+    if "Enhance the resume using user answers" in text:
+        current = _between(text, "CURRENT RESUME:", "USER ANSWERS:")
+        try:
+            return json.dumps(ast.literal_eval(current))
+        except (ValueError, SyntaxError):
+            return json.dumps(fake_resume(current))
+
+    # Resume generation
+    jd = _between(text, "JOB DESCRIPTION:", "USER INFO:")
+    return json.dumps(fake_resume(_between(text, "EXISTING RESUME:"), jd), ensure_ascii=False)
+
+
+# =========================================================
+# FAKE / RECORDED CHAT MODELS
+# =========================================================
+
+# Simulated model seconds for the current benchmark step. A mutable list, so
+# node threads running in copied contexts add to the same total.
+_SIMULATED = contextvars.ContextVar("simulated_llm_seconds", default=None)
+
+
+def _prompt_text(messages):
+    return "\n".join(str(message.content) for message in messages)
+
+
+def prompt_key(messages):
+    blob = json.dumps([[m.type, m.content] for m in messages], ensure_ascii=False)
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+
+class FakeChatModel(BaseChatModel):
+    model: str = "fake"
+    temperature: float = 0.2
+    # Token-rate simulator: first_token + prompt/prompt_tps + output/output_tps;
+    # a rate of 0 means instant
+    first_token: float = 0.25
+    prompt_tps: float = 8000.0
+    output_tps: float = 250.0
+    jitter: float = 0.1
+    seed: int = 0
+    stream_chunk_tokens: int = 16
+    # Recorded responses by prompt_key; prompts not found are answered by
+    # fake_response
+    recorded: dict = {}
+
+    @property
+    def _llm_type(self):
+        return "fake"
+
+    def _respond(self, messages):
+
+        text = _prompt_text(messages)
+        content = self.recorded.get(prompt_key(messages))
+        if content is None:
+            content = fake_response(text)
+
+        input_tokens = estimate_tokens(text)
+        output_tokens = estimate_tokens(content)
+
+        def rate(tokens, tps):
+            return tokens / tps if tps else 0.0
+
+        # Jitter is seeded by the prompt, so reruns sleep the same amounts
+        rng = random.Random(f"{self.seed}:{prompt_key(messages)}")
+        factor = 1 + rng.uniform(-self.jitter, self.jitter)
+        prefill = (self.first_token + rate(input_tokens, self.prompt_tps)) * factor
+        decode = rate(output_tokens, self.output_tps) * factor
+
+        usage = {
+            "input_tokens": input_tokens,
+            "output_tokens": output_tokens,
+            "total_tokens": input_tokens + output_tokens
+        }
+
+        simulated = _SIMULATED.get()
+        if simulated is not None:
+            simulated[0] += prefill + decode
+
+        return content, usage, prefill, decode
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        content, usage, prefill, decode = self._respond(messages)
+        time.sleep(prefill + decode)
+        message = AIMessage(content=content, usage_metadata=usage, response_metadata={"finish_reason": "stop"})
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        content, usage, prefill, decode = self._respond(messages)
+        await asyncio.sleep(prefill + decode)
+        message = AIMessage(content=content, usage_metadata=usage, response_metadata={"finish_reason": "stop"})
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs):
+
+        content, usage, prefill, decode = self._respond(messages)
+        step = self.stream_chunk_tokens * 4
+        pieces = [content[i:i + step] for i in range(0, len(content), step)] or [""]
+
+        time.sleep(prefill)
+        for i, piece in enumerate(pieces):
+            time.sleep(decode / len(pieces))
+            last = i == len(pieces) - 1
+            yield ChatGenerationChunk(message=AIMessageChunk(
+                content=piece,
+                usage_metadata=usage if last else None,
+                response_metadata={"finish_reason": "stop"} if last else {}
+            ))
+
+
+class RecordingChatModel(BaseChatModel):
+    # Passes calls to a real model and keeps {prompt_key: content}
+    inner: Any
+    records: dict = {}
+    model: str = "recording"
+    temperature: float = 0.2
+
+    @property
+    def _llm_type(self):
+        return "recording"
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        response = self.inner.invoke(messages)
+        self.records[prompt_key(messages)] = response.content
+        return ChatResult(generations=[ChatGeneration(message=response)])
+
+
+def load_recordings(path):
+    with open(path, encoding="utf-8") as f:
+        return {row["key"]: row["content"] for row in map(json.loads, filter(str.strip, f))}
+
+
+def install_fake_llm(first_token=0.25, prompt_tps=8000.0, output_tps=250.0, jitter=0.1, seed=0, recorded=None):
+
+    # get_llm("fake", ...) returns one shared simulator per (key, model)
+    def factory(api_key, model):
+        return FakeChatModel(
+            model=model,
+            first_token=first_token,
+            prompt_tps=prompt_tps,
+            output_tps=output_tps,
+            jitter=jitter,
+            seed=seed,
+            recorded=recorded or {}
+        )
+
+    register_chat_model("fake", factory)
+
+
+# =========================================================
+# CORPUS
+# =========================================================
+
+class FixtureFile(BytesIO):
+    # Stands in for Streamlit's UploadedFile in initial_build
+    def __init__(self, data, type):
+        super().__init__(data)
+        self.type = type
+
+
+def text_to_pdf(text):
+
+    # A plain one-column PDF, so initial_build also pays for PDF extraction
+    with fitz.open() as pdf:
+        page = pdf.new_page()
+        y = 50
+        for line in text.splitlines():
+            if y > 800:
+                page = pdf.new_page()
+                y = 50
+            page.insert_text((50, y), line, fontsize=9)
+            y += 12
+        return pdf.tobytes()
+
+
+def load_corpus(fixtures_dir=FIXTURES_DIR, pdf_input=True, limit=None):
+
+    def read_dir(name):
+        directory = os.path.join(fixtures_dir, name)
+        items = []
+        for file_name in sorted(os.listdir(directory)):
+            if file_name.lower().endswith((".txt", ".md")):
+                with open(os.path.join(directory, file_name), encoding="utf-8") as f:
+                    items.append((os.path.splitext(file_name)[0], f.read()))
+        return items
+
+    cases = []
+    for resume_id, resume in read_dir("resumes"):
+        data = text_to_pdf(resume) if pdf_input else resume.encode("utf-8")
+        for jd_id, jd in read_dir("jds"):
+            cases.append({
+                "id": f"{resume_id}__{jd_id}",
+                "resume": data,
+                "type": "application/pdf" if pdf_input else "text/plain",
+                "job_description": jd
+            })
+
+    return cases[:limit] if limit else cases
+
+
+# =========================================================
+# RUN
+# =========================================================
+
+def _percentile(values, q):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+
+
+def peak_rss_mb():
+    # ru_maxrss is KiB on Linux; children covers soffice conversions
+    self_peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    children_peak = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024
+    return round(self_peak, 1), round(children_peak, 1)
+
+
+def _answers(questions):
+    return {q: f"Yes, I used it in production for 2 years ({i + 1})." for i, q in enumerate(questions or [])}
+
+
+def run_case(case, options, samples, lock):
+
+    def timed(step, fn, *args):
+        simulated = [0.0]
+        token = _SIMULATED.set(simulated)
+        started = time.perf_counter()
+        try:
+            result = fn(*args)
+            error = None
+        except Exception as e:
+            result, error = None, f"{type(e).__name__}: {e}"
+        finally:
+            _SIMULATED.reset(token)
+        seconds = time.perf_counter() - started
+
+        with lock:
+            samples[step].append({
+                "seconds": seconds,
+                "llm_seconds": simulated[0],
+                "error": error
+            })
+        return result
+
+    llm_args = ("fake", "offline", options["rpm"], options["model"], options["use_cache"])
+
+    built = timed(
+        "initial_build", initial_build,
+        FixtureFile(case["resume"], case["type"]), {}, case["job_description"], *llm_args
+    )
+    if not built:
+        return
+
+    resume = built["structured_resume"]
+
+    updated = timed(
+        "update_resume", update_resume,
+        resume, _answers(built.get("gap_questions")), case["job_description"], *llm_args
+    )
+    if updated:
+        resume = updated["structured_resume"]
+
+    docx = timed("generate_docx", generate_docx, resume, options["template"])
+
+    if docx is not None and not options["skip_pdf"]:
+        timed("generate_pdf_from_docx", generate_pdf_from_docx, docx, options["environment"])
+
+
+def summarize(samples, wall_seconds):
+
+    steps = {}
+    for step in STEPS:
+        rows = samples.get(step) or []
+        ok = [r for r in rows if r["error"] is None]
+        latencies = [r["seconds"] for r in ok]
+
+        steps[step] = {
+            "runs": len(rows),
+            "errors": len(rows) - len(ok),
+            "first_error": next((r["error"] for r in rows if r["error"]), None),
+            "p50_seconds": _round(_percentile(latencies, 0.5)),
+            "p95_seconds": _round(_percentile(latencies, 0.95)),
+            "mean_seconds": _round(sum(latencies) / len(latencies)) if latencies else None,
+            # Simulated model seconds summed over calls; parallel calls
+            # can make this exceed the step's wall time
+            "mean_llm_seconds": _round(sum(r["llm_seconds"] for r in ok) / len(ok)) if ok else None,
+            "throughput_per_min": round(len(ok) / wall_seconds * 60, 2) if wall_seconds and ok else 0.0
+        }
+
+    return steps
+
+
+def _round(value):
+    return round(value, 4) if value is not None else None
+
+
+def span_breakdown():
+
+    # Mean seconds per node / model call / render from the tracing histograms
+    rows = {}
+    for histogram in metrics_snapshot()["histograms"]:
+        if histogram["name"] != "resumeforge_span_seconds" or not histogram["count"]:
+            continue
+        labels = histogram["labels"]
+        rows[f"{labels['kind']}:{labels['name']}"] = {
+            "count": histogram["count"],
+            "mean_seconds": round(histogram["sum"] / histogram["count"], 4)
+        }
+    return dict(sorted(rows.items()))
+
+
+def run_benchmark(options):
+
+    install_fake_llm(
+        options["first_token"], options["prompt_tps"], options["output_tps"],
+        options["jitter"], options["seed"],
+        load_recordings(options["recorded"]) if options.get("recorded") else None
+    )
+    reset_metrics()
+
+    cases = load_corpus(options["fixtures"], not options["text_input"], options["limit"])
+    cases = cases * options["repeat"]
+
+    samples = {step: [] for step in STEPS}
+    lock = threading.Lock()
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=options["concurrency"]) as executor:
+        futures = [
+            executor.submit(contextvars.copy_context().run, run_case, case, options, samples, lock)
+            for case in cases
+        ]
+        for future in futures:
+            future.result()
+    wall_seconds = time.perf_counter() - started
+
+    rss_self, rss_children = peak_rss_mb()
+
+    return {
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count()
+        },
+        "config": {k: v for k, v in options.items() if k not in ("fixtures", "baseline", "save_baseline", "output")},
+        "cases": len(cases),
+        "wall_seconds": round(wall_seconds, 3),
+        "builds_per_min": round(len(samples["initial_build"]) / wall_seconds * 60, 2) if wall_seconds else 0.0,
+        "peak_rss_mb": rss_self,
+        "peak_child_rss_mb": rss_children,
+        "steps": summarize(samples, wall_seconds),
+        "spans": span_breakdown()
+    }
+
+
+# =========================================================
+# BASELINE
+# =========================================================
+
+def compare(result, baseline, tolerance=0.2, min_delta=0.05):
+
+    # A step regresses when its p50 or p95 is more than `tolerance` (and
+    # more than min_delta seconds) slower than the baseline, or when it
+    # starts failing. Steps the baseline never ran (e.g. PDF under
+    # --skip-pdf) have nothing to compare against.
+    regressions = []
+    rows = []
+
+    for step in STEPS:
+        now = result["steps"].get(step) or {}
+        then = (baseline.get("steps") or {}).get(step) or {}
+        if not then.get("runs"):
+            continue
+
+        for metric in ("p50_seconds", "p95_seconds"):
+            new, old = now.get(metric), then.get(metric)
+            if new is None or not old:
+                continue
+            change = (new - old) / old
+            rows.append({"step": step, "metric": metric, "baseline": old, "current": new, "change": round(change, 3)})
+            if change > tolerance and new - old > min_delta:
+                regressions.append(f"{step} {metric}: {old:.3f}s -> {new:.3f}s ({change:+.0%})")
+
+        if now.get("errors") and not then.get("errors"):
+            regressions.append(f"{step}: {now['errors']} error(s), baseline had none")
+
+    old_rss, new_rss = baseline.get("peak_rss_mb"), result.get("peak_rss_mb")
+    if old_rss and new_rss and (new_rss - old_rss) / old_rss > tolerance:
+        regressions.append(f"peak RSS: {old_rss} MB -> {new_rss} MB")
+
+    # Numbers are only comparable under the same simulator settings
+    differs = [
+        key for key in (
+            "first_token", "prompt_tps", "output_tps", "jitter", "concurrency",
+            "text_input", "use_cache", "recorded", "skip_pdf", "template", "environment"
+        )
+        if (baseline.get("config") or {}).get(key) != result["config"].get(key)
+    ]
+
+    return {"tolerance": tolerance, "rows": rows, "regressions": regressions, "config_differs": differs}
+
+
+def print_report(result, comparison=None):
+
+    print(f"\n{result['cases']} case(s) in {result['wall_seconds']}s "
+          f"({result['builds_per_min']} builds/min), peak RSS {result['peak_rss_mb']} MB "
+          f"(children {result['peak_child_rss_mb']} MB)\n")
+
+    print(f"{'step':<24}{'runs':>6}{'err':>5}{'p50 s':>9}{'p95 s':>9}{'llm s':>9}{'/min':>9}")
+    for step, row in result["steps"].items():
+        fmt = lambda v: f"{v:.3f}" if v is not None else "-"
+        print(f"{step:<24}{row['runs']:>6}{row['errors']:>5}{fmt(row['p50_seconds']):>9}"
+              f"{fmt(row['p95_seconds']):>9}{fmt(row['mean_llm_seconds']):>9}{row['throughput_per_min']:>9}")
+        if row["first_error"]:
+            print(f"    first error: {row['first_error'][:120]}")
+
+    if comparison is not None:
+        print("\nBASELINE COMPARISON")
+        if comparison["config_differs"]:
+            print(f"  (settings differ from the baseline: {', '.join(comparison['config_differs'])})")
+        for row in comparison["rows"]:
+            print(f"  {row['step']:<24}{row['metric']:<13}{row['baseline']:>8.3f} -> {row['current']:>8.3f}  {row['change']:+.1%}")
+        if comparison["regressions"]:
+            print("\nREGRESSIONS")
+            for line in comparison["regressions"]:
+                print(f"  {line}")
+        else:
+            print(f"\nNo regressions beyond {comparison['tolerance']:.0%}.")
+
+
+# =========================================================
+# RECORDING
+# =========================================================
+
+def record(options):
+
+    # Runs the corpus once against a real provider and saves every response,
+    # so later runs can replay real output sizes offline
+    provider = options["provider"]
+    records = {}
+
+    def factory(api_key, model):
+        return RecordingChatModel(inner=_build_chat_model(provider, api_key, model), records=records)
+
+    register_chat_model("fake", factory)
+
+    api_key = options["api_key"] or os.getenv(f"{provider.upper()}_API_KEY", "")
+    cases = load_corpus(options["fixtures"], not options["text_input"], options["limit"])
+
+    for case in cases:
+        built = initial_build(
+            FixtureFile(case["resume"], case["type"]), {}, case["job_description"],
+            "fake", api_key, options["rpm"], options["model"], False
+        )
+        update_resume(
+            built["structured_resume"], _answers(built.get("gap_questions")), case["job_description"],
+            "fake", api_key, options["rpm"], options["model"], False
+        )
+        print(f"recorded {case['id']} ({len(records)} responses)")
+
+    with open(options["output"], "w", encoding="utf-8") as f:
+        for key, content in records.items():
+            f.write(json.dumps({"key": key, "content": content}, ensure_ascii=False) + "\n")
+
+    print(f"Saved {len(records)} responses to {options['output']}")
+
+
+# =========================================================
+# CLI
+# =========================================================
+
+def main(argv=None):
+
+    parser = argparse.ArgumentParser(description="Offline ResumeForge benchmark")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    def corpus_args(command):
+        command.add_argument("--fixtures", default=FIXTURES_DIR, help="Directory with resumes/ and jds/")
+        command.add_argument("--limit", type=int, default=None, help="Use only the first N resume x JD cases")
+        command.add_argument("--text-input", action="store_true", help="Feed resumes as text instead of rendered PDFs")
+        command.add_argument("--rpm", type=int, default=100000)
+        command.add_argument("--model", default="openai/gpt-oss-120b")
+
+    run = commands.add_parser("run", help="Run the benchmark with the fake model")
+    corpus_args(run)
+    run.add_argument("--repeat", type=int, default=1, help="Run the corpus this many times")
+    run.add_argument("--concurrency", type=int, default=1, help="Cases run in parallel")
+    run.add_argument("--first-token", type=float, default=0.25, help="Simulated seconds to first token")
+    run.add_argument("--prompt-tps", type=float, default=8000.0, help="Simulated prompt tokens per second")
+    run.add_argument("--output-tps", type=float, default=250.0, help="Simulated output tokens per second")
+    run.add_argument("--jitter", type=float, default=0.1, help="Latency jitter fraction (seeded)")
+    run.add_argument("--seed", type=int, default=0)
+    run.add_argument("--no-latency", action="store_true", help="Answer instantly, to measure the pipeline's own overhead")
+    run.add_argument("--recorded", default=None, help="JSONL of recorded responses to replay")
+    run.add_argument("--use-cache", action="store_true", help="Allow response-cache hits (off by default)")
+    run.add_argument("--template", default="Classic")
+    run.add_argument("--environment", default="website", help="PDF engine: website or windows")
+    run.add_argument("--skip-pdf", action="store_true", default=None, help="Skip generate_pdf_from_docx (default: as in the baseline)")
+    run.add_argument("--output", default=None, help="Write the result JSON here")
+    run.add_argument("--baseline", default=BASELINE_PATH, help="Baseline JSON to compare against")
+    run.add_argument("--save-baseline", action="store_true", help="Store this run as the new baseline")
+    run.add_argument("--tolerance", type=float, default=0.2, help="Allowed slowdown before a step counts as regressed")
+
+    rec = commands.add_parser("record", help="Record real provider responses for replay")
+    corpus_args(rec)
+    rec.add_argument("--provider", default="groq", choices=["groq", "gemini"])
+    rec.add_argument("--api-key", default="")
+    rec.add_argument("--output", default=os.path.join(REPO_DIR, "benchmarks", "recorded.jsonl"))
+
+    args = parser.parse_args(argv)
+
+    # Templates are resolved relative to the repository, so run from there;
+    # paths given on the command line still mean the caller's directory
+    for name in ("fixtures", "output", "baseline", "recorded"):
+        if getattr(args, name, None):
+            setattr(args, name, os.path.abspath(getattr(args, name)))
+    os.chdir(REPO_DIR)
+
+    options = {k.replace("-", "_"): v for k, v in vars(args).items() if k != "command"}
+
+    if args.command == "record":
+        from dotenv import load_dotenv
+        load_dotenv()
+        record(options)
+        return 0
+
+    if args.no_latency:
+        options.update(first_token=0.0, prompt_tps=0.0, output_tps=0.0, jitter=0.0)
+
+    baseline = None
+    if args.baseline and os.path.exists(args.baseline) and not args.save_baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+
+    # Measure the same steps the baseline did unless told otherwise
+    if options["skip_pdf"] is None:
+        options["skip_pdf"] = bool(((baseline or {}).get("config") or {}).get("skip_pdf"))
+
+    result = run_benchmark(options)
+
+    comparison = None
+    if baseline is not None:
+        comparison = compare(result, baseline, args.tolerance)
+        result["comparison"] = comparison
+
+    print_report(result, comparison)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2)
+
+    if args.save_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2)
+        print(f"\nBaseline saved to {args.baseline}")
+
+    return 1 if comparison and comparison["regressions"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,396 @@
+# =========================================================
+# job_queue.py (SQLITE JOB QUEUE + WORKER PROCESSES)
+# =========================================================
+#
+# The app submits builds/updates as jobs and polls their status; worker
+# processes claim jobs and run the graphs. Identical inputs share one job
+# (deduplicated by input hash), so a double-clicked Generate costs one
+# pipeline run. API keys are needed by the worker, so they travel in the
+# payload; only a digest of the key goes into the hash, so jobs are shared
+# per key. The payload is cleared once the job ends, and results keep only
+# RESULT_FIELDS, never the graph inputs.
+
+import os
+import sys
+import json
+import time
+import uuid
+import sqlite3
+import hashlib
+import argparse
+import threading
+import multiprocessing
+
+
+QUEUE_PATH = os.getenv("JOB_QUEUE_PATH", ".cache/jobs.sqlite3")
+
+# Finished jobs answer identical submissions for this long
+DEDUPE_TTL = float(os.getenv("JOB_DEDUPE_TTL", 3600))
+
+JOB_KINDS = ("build", "update")
+
+# Credentials: never hashed or stored as-is
+_CREDENTIAL_FIELDS = ("api_key",)
+
+# Graph outputs the app reads back; the rest of the state (api_key, resume
+# text, prompts) stays in the worker
+RESULT_FIELDS = (
+    "structured_resume", "ats_score", "gap_questions", "additional_analysis",
+    "jd_keywords", "resume_keywords", "generation_report", "prompt_budget",
+    "timing_report", "llm_usage", "skipped_steps", "rescored_from_cache"
+)
+
+
+def input_hash(kind, payload):
+    # Salted with a digest of each credential, so a second user with the
+    # same inputs gets their own job rather than one billed to, or failing
+    # on, someone else's key
+    hashed = {
+        k: hashlib.sha256(str(v).encode("utf-8")).hexdigest() if k in _CREDENTIAL_FIELDS else v
+        for k, v in payload.items()
+    }
+    blob = json.dumps([kind, hashed], sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+
+# =========================================================
+# QUEUE
+# =========================================================
+
+class JobQueue:
+    def __init__(self, path=QUEUE_PATH, max_attempts=3, dedupe_ttl=DEDUPE_TTL):
+        self.path = path
+        self.max_attempts = max_attempts
+        self.dedupe_ttl = dedupe_ttl
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        # Autocommit mode; claims use explicit BEGIN IMMEDIATE so only one
+        # process can move a job from queued to running
+        self._conn = sqlite3.connect(
+            path, check_same_thread=False, isolation_level=None, timeout=30
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            " id TEXT PRIMARY KEY,"
+            " kind TEXT NOT NULL,"
+            " input_hash TEXT NOT NULL,"
+            " payload TEXT,"
+            " status TEXT NOT NULL,"
+            " result TEXT,"
+            " error TEXT,"
+            " attempts INTEGER NOT NULL DEFAULT 0,"
+            " worker TEXT,"
+            " created_at REAL NOT NULL,"
+            " started_at REAL,"
+            " finished_at REAL)"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs(status, created_at)"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_jobs_hash ON jobs(input_hash)"
+        )
+
+    def submit(self, kind, payload):
+
+        if kind not in JOB_KINDS:
+            raise ValueError(f"Unknown job kind: {kind}")
+
+        digest = input_hash(kind, payload)
+
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                # Reuse a queued, running or recently finished job with the
+                # same input
+                row = self._conn.execute(
+                    "SELECT id FROM jobs WHERE input_hash = ? AND ("
+                    " status IN ('queued', 'running')"
+                    " OR (status = 'done' AND finished_at > ?)) "
+                    "ORDER BY created_at DESC LIMIT 1",
+                    (digest, time.time() - self.dedupe_ttl)
+                ).fetchone()
+                if row:
+                    self._conn.execute("COMMIT")
+                    return row[0]
+
+                job_id = uuid.uuid4().hex
+                self._conn.execute(
+                    "INSERT INTO jobs (id, kind, input_hash, payload, status, created_at) "
+                    "VALUES (?, ?, ?, ?, 'queued', ?)",
+                    (job_id, kind, digest, json.dumps(payload, ensure_ascii=False), time.time())
+                )
+                self._conn.execute("COMMIT")
+                return job_id
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def claim(self, worker_id):
+
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute(
+                    "SELECT id, kind, payload FROM jobs WHERE status = 'queued' "
+                    "ORDER BY created_at LIMIT 1"
+                ).fetchone()
+                if row is None:
+                    self._conn.execute("COMMIT")
+                    return None
+
+                self._conn.execute(
+                    "UPDATE jobs SET status = 'running', worker = ?, started_at = ?, "
+                    "attempts = attempts + 1 WHERE id = ?",
+                    (worker_id, time.time(), row[0])
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+        return {"id": row[0], "kind": row[1], "payload": json.loads(row[2])}
+
+    def complete(self, job_id, worker_id, result):
+
+        # complete/fail only land while this worker still owns the job; a run
+        # that outlived max_runtime was requeued and may belong to someone else.
+        # Credentials never reach the results table, whatever the caller passes
+        result = {k: v for k, v in result.items() if k not in _CREDENTIAL_FIELDS}
+
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET status = 'done', result = ?, payload = NULL, "
+                "finished_at = ? WHERE id = ? AND worker = ? AND status = 'running'",
+                (json.dumps(result, ensure_ascii=False, default=str), time.time(), job_id, worker_id)
+            )
+
+    def fail(self, job_id, worker_id, error):
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET status = 'failed', error = ?, payload = NULL, "
+                "finished_at = ? WHERE id = ? AND worker = ? AND status = 'running'",
+                (str(error), time.time(), job_id, worker_id)
+            )
+
+    def requeue_stale(self, max_runtime):
+
+        # Jobs whose worker died mid-run go back to the queue, up to
+        # max_attempts; after that they fail
+        cutoff = time.time() - max_runtime
+
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET status = 'failed', error = 'worker did not finish', "
+                "payload = NULL, finished_at = ? "
+                "WHERE status = 'running' AND started_at < ? AND attempts >= ?",
+                (time.time(), cutoff, self.max_attempts)
+            )
+            self._conn.execute(
+                "UPDATE jobs SET status = 'queued', worker = NULL, started_at = NULL "
+                "WHERE status = 'running' AND started_at < ?",
+                (cutoff,)
+            )
+
+    def get(self, job_id):
+
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT id, kind, status, result, error, attempts, created_at, "
+                "started_at, finished_at FROM jobs WHERE id = ?",
+                (job_id,)
+            ).fetchone()
+
+            if row is None:
+                return None
+
+            position = None
+            if row[2] == "queued":
+                position = self._conn.execute(
+                    "SELECT COUNT(*) FROM jobs WHERE status = 'queued' AND created_at < ?",
+                    (row[6],)
+                ).fetchone()[0] + 1
+
+        job_id, kind, status, result, error, attempts, created_at, started_at, finished_at = row
+
+        return {
+            "id": job_id,
+            "kind": kind,
+            "status": status,
+            "position": position,
+            "attempts": attempts,
+            "wait_seconds": round((started_at or time.time()) - created_at, 3),
+            "run_seconds": round(finished_at - started_at, 3) if finished_at and started_at else None,
+            "result": json.loads(result) if result else None,
+            "error": error
+        }
+
+    def stats(self, window=200):
+
+        now = time.time()
+
+        with self._lock:
+            counts = dict(self._conn.execute(
+                "SELECT status, COUNT(*) FROM jobs GROUP BY status"
+            ).fetchall())
+            oldest = self._conn.execute(
+                "SELECT MIN(created_at) FROM jobs WHERE status = 'queued'"
+            ).fetchone()[0]
+            waits = [
+                row[0] for row in self._conn.execute(
+                    "SELECT started_at - created_at FROM jobs WHERE started_at IS NOT NULL "
+                    "ORDER BY started_at DESC LIMIT ?",
+                    (window,)
+                )
+            ]
+
+        waits.sort()
+
+        return {
+            "queue_depth": counts.get("queued", 0),
+            "running": counts.get("running", 0),
+            "done": counts.get("done", 0),
+            "failed": counts.get("failed", 0),
+            "oldest_queued_seconds": round(now - oldest, 3) if oldest else 0.0,
+            "avg_wait_seconds": round(sum(waits) / len(waits), 3) if waits else 0.0,
+            "p95_wait_seconds": round(waits[min(len(waits) - 1, int(len(waits) * 0.95))], 3) if waits else 0.0
+        }
+
+
+_QUEUE = None
+_QUEUE_LOCK = threading.Lock()
+
+
+def get_job_queue():
+    global _QUEUE
+
+    with _QUEUE_LOCK:
+        if _QUEUE is None:
+            _QUEUE = JobQueue(QUEUE_PATH)
+        return _QUEUE
+
+
+# =========================================================
+# WORKERS
+# =========================================================
+
+def run_job(kind, payload, rpm_share=1.0):
+
+    # Imported here so submitting jobs does not load the graphs
+    from agent import build_from_text, update_resume
+
+    # Each worker process has its own limiter, so it gets a slice of the RPM
+    payload = dict(payload, rpm=max(1, int(payload.get("rpm", 30) * rpm_share)))
+
+    if kind == "build":
+        result = build_from_text(
+            payload["resume_text"],
+            payload.get("user_info"),
+            payload["job_description"],
+            payload.get("provider", "groq"),
+            payload.get("api_key", ""),
+            payload.get("rpm", 30),
+            payload.get("model", "openai/gpt-oss-120b"),
+            payload.get("use_cache", True)
+        )
+
+    else:
+        result = update_resume(
+            payload["existing_resume"],
+            payload.get("user_answers"),
+            payload["job_description"],
+            payload.get("provider", "groq"),
+            payload.get("api_key", ""),
+            payload.get("rpm", 30),
+            payload.get("model", "openai/gpt-oss-120b"),
+            payload.get("use_cache", True),
+            payload.get("update_mode") or "incremental"
+        )
+
+    return {k: result[k] for k in RESULT_FIELDS if k in result}
+
+
+def run_worker(path=QUEUE_PATH, poll_interval=0.5, max_runtime=600, max_jobs=None, rpm_share=1.0, metrics_port=None):
+
+    # Metrics are per process, so each worker serves its own /metrics
+    if metrics_port:
+        from tracing import start_metrics_server
+        start_metrics_server(metrics_port)
+
+    queue = JobQueue(path)
+    worker_id = f"{os.getpid()}-{uuid.uuid4().hex[:6]}"
+    processed = 0
+
+    while max_jobs is None or processed < max_jobs:
+        queue.requeue_stale(max_runtime)
+
+        job = queue.claim(worker_id)
+        if job is None:
+            time.sleep(poll_interval)
+            continue
+
+        try:
+            queue.complete(job["id"], worker_id, run_job(job["kind"], job["payload"], rpm_share))
+        except Exception as e:
+            queue.fail(job["id"], worker_id, e)
+
+        processed += 1
+
+
+def start_workers(count, path=QUEUE_PATH, poll_interval=0.5, max_runtime=600, metrics_port=None):
+
+    # Worker i serves /metrics on metrics_port + i
+    workers = [
+        multiprocessing.Process(
+            target=run_worker,
+            args=(path, poll_interval, max_runtime, None, 1.0 / count, metrics_port + i if metrics_port else None),
+            daemon=True,
+            name=f"resume-worker-{i}"
+        )
+        for i in range(count)
+    ]
+    for worker in workers:
+        worker.start()
+    return workers
+
+
+def main(argv=None):
+
+    parser = argparse.ArgumentParser(description="ResumeForge job queue")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    worker = commands.add_parser("worker", help="Run worker processes")
+    worker.add_argument("--workers", type=int, default=int(os.getenv("JOB_WORKERS", 2)))
+    worker.add_argument("--poll-interval", type=float, default=0.5)
+    worker.add_argument("--max-runtime", type=float, default=600, help="Seconds before a running job is requeued")
+    worker.add_argument("--metrics-port", type=int, default=int(os.getenv("JOB_METRICS_PORT", 0)), help="First /metrics port (one per worker)")
+
+    commands.add_parser("stats", help="Print queue depth and wait times")
+
+    args = parser.parse_args(argv)
+
+    if args.command == "stats":
+        print(json.dumps(get_job_queue().stats(), indent=2))
+        return
+
+    from dotenv import load_dotenv
+    load_dotenv()
+
+    workers = start_workers(args.workers, QUEUE_PATH, args.poll_interval, args.max_runtime, args.metrics_port or None)
+    print(f"{len(workers)} worker(s) polling {QUEUE_PATH}")
+
+    try:
+        while True:
+            time.sleep(60)
+            print(json.dumps(get_job_queue().stats()), file=sys.stderr)
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,283 @@
+# =========================================================
+# llm_cache.py (CONTENT-ADDRESSED LLM RESPONSE CACHE)
+# =========================================================
+
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from collections import OrderedDict
+
+
+# =========================================================
+# MEMORY TIER (LRU + TTL)
+# =========================================================
+
+class MemoryCacheTier:
+    def __init__(self, max_entries: int = 256, ttl: float = 86400):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._items.get(key)
+            if item is None:
+                return None
+
+            value, created_at = item
+            if self.ttl and time.time() - created_at > self.ttl:
+                del self._items[key]
+                return None
+
+            self._items.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._items[key] = (value, time.time())
+            self._items.move_to_end(key)
+
+            while len(self._items) > self.max_entries:
+                self._items.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._items.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+
+    def __len__(self):
+        return len(self._items)
+
+
+# =========================================================
+# DISK TIER (SQLITE + TTL + LRU)
+# =========================================================
+
+class SQLiteCacheTier:
+    def __init__(self, path: str, max_entries: int = 5000, ttl: float = 7 * 86400):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS llm_cache ("
+            " key TEXT PRIMARY KEY,"
+            " value TEXT NOT NULL,"
+            " created_at REAL NOT NULL,"
+            " last_access REAL NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_llm_cache_access ON llm_cache(last_access)"
+        )
+        self._conn.commit()
+
+    def get(self, key):
+        now = time.time()
+
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, created_at FROM llm_cache WHERE key = ?",
+                (key,)
+            ).fetchone()
+
+            if row is None:
+                return None
+
+            value, created_at = row
+            if self.ttl and now - created_at > self.ttl:
+                self._conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+                self._conn.commit()
+                return None
+
+            self._conn.execute(
+                "UPDATE llm_cache SET last_access = ? WHERE key = ?",
+                (now, key)
+            )
+            self._conn.commit()
+            return value
+
+    def set(self, key, value):
+        now = time.time()
+
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, value, created_at, last_access) "
+                "VALUES (?, ?, ?, ?)",
+                (key, value, now, now)
+            )
+            self._evict(now)
+            self._conn.commit()
+
+    def _evict(self, now):
+        if self.ttl:
+            self._conn.execute(
+                "DELETE FROM llm_cache WHERE created_at < ?",
+                (now - self.ttl,)
+            )
+
+        # Drop least recently used rows beyond the size bound
+        self._conn.execute(
+            "DELETE FROM llm_cache WHERE key IN ("
+            " SELECT key FROM llm_cache ORDER BY last_access DESC LIMIT -1 OFFSET ?)",
+            (self.max_entries,)
+        )
+
+    def delete(self, key):
+        with self._lock:
+            self._conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+            self._conn.commit()
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM llm_cache")
+            self._conn.commit()
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0]
+
+
+# =========================================================
+# TIERED CACHE
+# =========================================================
+
+class LLMResponseCache:
+    def __init__(self, tiers=None, bypass: bool = False):
+        self.tiers = tiers if tiers is not None else [MemoryCacheTier()]
+        self.bypass = bypass
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "writes": 0}
+        self._tier_hits = [0] * len(self.tiers)
+
+    @staticmethod
+    def make_key(provider, model, temperature, prompt):
+        if not isinstance(prompt, str):
+            prompt = json.dumps(prompt, sort_keys=True, default=str)
+
+        payload = json.dumps(
+            [str(provider), str(model), temperature, prompt],
+            ensure_ascii=False
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key):
+        if self.bypass:
+            return None
+
+        for index, tier in enumerate(self.tiers):
+            value = tier.get(key)
+            if value is None:
+                continue
+
+            # Promote into the faster tiers
+            for upper in self.tiers[:index]:
+                upper.set(key, value)
+
+            with self._lock:
+                self._stats["hits"] += 1
+                self._tier_hits[index] += 1
+            return value
+
+        with self._lock:
+            self._stats["misses"] += 1
+        return None
+
+    def set(self, key, value):
+        if self.bypass:
+            return
+
+        for tier in self.tiers:
+            tier.set(key, value)
+
+        with self._lock:
+            self._stats["writes"] += 1
+
+    def delete(self, key):
+        for tier in self.tiers:
+            tier.delete(key)
+
+    def clear(self):
+        for tier in self.tiers:
+            tier.clear()
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            tier_hits = list(self._tier_hits)
+
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = round(stats["hits"] / lookups, 3) if lookups else 0.0
+        stats["tiers"] = [
+            {
+                "tier": type(tier).__name__,
+                "entries": len(tier),
+                "hits": hits
+            }
+            for tier, hits in zip(self.tiers, tier_hits)
+        ]
+        stats["bypass"] = self.bypass
+        return stats
+
+
+# =========================================================
+# PROCESS-WIDE INSTANCE
+# =========================================================
+
+_CACHE = None
+_CACHE_LOCK = threading.Lock()
+
+
+def _env_flag(name):
+    return os.getenv(name, "").strip().lower() in ("1", "true", "yes", "on")
+
+
+def build_default_cache():
+    ttl = float(os.getenv("LLM_CACHE_TTL", 86400))
+    tiers = [
+        MemoryCacheTier(
+            max_entries=int(os.getenv("LLM_CACHE_MEMORY_ENTRIES", 256)),
+            ttl=ttl
+        )
+    ]
+
+    if not _env_flag("LLM_CACHE_MEMORY_ONLY"):
+        tiers.append(
+            SQLiteCacheTier(
+                os.getenv("LLM_CACHE_PATH", ".cache/llm_cache.sqlite3"),
+                max_entries=int(os.getenv("LLM_CACHE_DISK_ENTRIES", 5000)),
+                ttl=ttl
+            )
+        )
+
+    return LLMResponseCache(tiers, bypass=_env_flag("LLM_CACHE_BYPASS"))
+
+
+def get_response_cache():
+    global _CACHE
+
+    with _CACHE_LOCK:
+        if _CACHE is None:
+            _CACHE = build_default_cache()
+        return _CACHE
+
+
+def set_response_cache(cache):
+    """Swap in any object exposing make_key/get/set/delete/stats."""
+    global _CACHE
+
+    with _CACHE_LOCK:
+        _CACHE = cache
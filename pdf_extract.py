@@ -0,0 +1,238 @@
+# =========================================================
+# pdf_extract.py (LAYOUT-AWARE RESUME TEXT EXTRACTION)
+# =========================================================
+#
+# Pages are read into a list (never concatenated with +=). In "blocks" mode
+# PyMuPDF's text blocks are sorted top-to-bottom, left-to-right so headings
+# stay above their bullets even in two-column layouts. Large documents are
+# split into page ranges and extracted in worker processes; PyMuPDF holds
+# the GIL, so threads would not help. The process pool is created once and
+# reused, with "spawn" so workers never inherit a forked copy of a threaded
+# parent (Streamlit, the job worker, the graph's node threads).
+
+import os
+import re
+import fitz
+import atexit
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+
+# Documents with at least this many pages are extracted in parallel
+PARALLEL_MIN_PAGES = int(os.getenv("PDF_PARALLEL_MIN_PAGES", 12))
+
+# Worker processes shared by every extraction in this process
+PDF_POOL_SIZE = int(os.getenv("PDF_POOL_SIZE", min(os.cpu_count() or 1, 4)))
+
+SECTION_HEADINGS = {
+    "summary", "professional summary", "profile", "objective",
+    "career objective", "about me", "experience", "work experience",
+    "professional experience", "employment history", "internships",
+    "internship", "education", "academic background", "skills",
+    "technical skills", "key skills", "core competencies", "projects",
+    "academic projects", "certifications", "certificates", "licenses",
+    "achievements", "awards", "honors", "publications", "research",
+    "leadership", "volunteering", "volunteer experience",
+    "extracurricular activities", "languages", "interests", "hobbies",
+    "training", "courses", "contact", "personal details", "references",
+}
+
+BULLET_RE = re.compile(r"^\s*(?:[•●▪■◦‣∙·\-\*–—➢➤►✓✔]|\d{1,2}[.)])\s+")
+EMAIL_RE = re.compile(r"[\w.+-]+@[\w-]+(?:\.[\w-]+)+")
+PHONE_RE = re.compile(r"(?:\+\d{1,3}[\s-]?)?(?:\(?\d{2,5}\)?[\s-]?)?\d{3,5}[\s-]?\d{4,5}")
+LINK_RE = re.compile(
+    r"(?:https?://|www\.)\S+|(?:linkedin\.com|github\.com)/\S+",
+    re.IGNORECASE
+)
+
+
+# =========================================================
+# PAGE EXTRACTION
+# =========================================================
+
+def _page_text(page, mode):
+    if mode != "blocks":
+        return page.get_text()
+
+    # (x0, y0, x1, y1, text, block_no, block_type); type 1 is an image
+    blocks = [
+        block for block in page.get_text("blocks", sort=True)
+        if block[6] == 0 and block[4].strip()
+    ]
+    return "\n".join(block[4].rstrip() for block in blocks)
+
+
+def _extract_range(file_bytes, start, stop, mode):
+    with fitz.open(stream=file_bytes, filetype="pdf") as pdf:
+        return [_page_text(pdf[i], mode) for i in range(start, stop)]
+
+
+_POOL = None
+_POOL_LOCK = threading.Lock()
+
+
+def _get_pool():
+    global _POOL
+
+    with _POOL_LOCK:
+        if _POOL is None:
+            _POOL = ProcessPoolExecutor(
+                max_workers=PDF_POOL_SIZE,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+            atexit.register(_POOL.shutdown)
+        return _POOL
+
+
+def _reset_pool(pool):
+    global _POOL
+
+    with _POOL_LOCK:
+        if _POOL is pool:
+            _POOL = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def extract_pages(file_bytes, mode="blocks", workers=None):
+
+    with fitz.open(stream=file_bytes, filetype="pdf") as pdf:
+        page_count = pdf.page_count
+
+        if page_count < PARALLEL_MIN_PAGES:
+            return [_page_text(page, mode) for page in pdf]
+
+    workers = workers or PDF_POOL_SIZE
+    step = -(-page_count // workers)
+    ranges = [(start, min(start + step, page_count)) for start in range(0, page_count, step)]
+
+    pool = _get_pool()
+    try:
+        futures = [
+            pool.submit(_extract_range, file_bytes, start, stop, mode)
+            for start, stop in ranges
+        ]
+        pages = []
+        for future in futures:
+            pages.extend(future.result())
+    except BrokenProcessPool:
+        # A crashed worker poisons the pool; replace it next time and finish
+        # this document in-process
+        _reset_pool(pool)
+        return _extract_range(file_bytes, 0, page_count, mode)
+
+    return pages
+
+
+# =========================================================
+# STRUCTURE
+# =========================================================
+
+def _normalise_line(line):
+    return re.sub(r"[ \t ]+", " ", line).strip()
+
+
+def is_heading(line, allow_caps=True):
+
+    text = line.strip().rstrip(":").strip()
+    if not text or len(text) > 40 or BULLET_RE.match(line):
+        return False
+
+    lowered = re.sub(r"[^a-z& ]", "", text.lower()).strip()
+    if lowered in SECTION_HEADINGS:
+        return True
+
+    # Short all-caps lines ("WORK HISTORY") are headings in most templates
+    letters = [c for c in text if c.isalpha()]
+    return (
+        allow_caps
+        and len(letters) >= 4
+        and all(c.isupper() for c in letters)
+        and len(text.split()) <= 4
+    )
+
+
+def extract_contacts(text):
+
+    # Phone matches are taken from the first lines only, where headers live;
+    # elsewhere long digit runs are usually dates or figures
+    header = "\n".join(text.splitlines()[:15])
+
+    return {
+        "emails": list(dict.fromkeys(EMAIL_RE.findall(text))),
+        "phones": list(dict.fromkeys(
+            p.strip() for p in PHONE_RE.findall(header)
+            if len(re.sub(r"\D", "", p)) >= 10
+        )),
+        "links": list(dict.fromkeys(
+            link.rstrip(".,;)") for link in LINK_RE.findall(text)
+        ))
+    }
+
+
+def parse_layout(pages):
+
+    # Returns {"header", "sections": [{"heading", "lines", "bullets"}],
+    # "bullets", "contacts", "pages"}
+    header = []
+    sections = []
+    current = None
+
+    for page in pages:
+        for raw in page.splitlines():
+            line = _normalise_line(raw)
+            if not line:
+                continue
+
+            # The first line is usually the candidate's name, often in caps
+            if is_heading(line, allow_caps=bool(header or sections)):
+                current = {"heading": line.rstrip(":").strip(), "lines": [], "bullets": []}
+                sections.append(current)
+                continue
+
+            target = current["lines"] if current else header
+            bullet = BULLET_RE.match(line)
+
+            if bullet:
+                item = line[bullet.end():].strip()
+                target.append("- " + item)
+                if current:
+                    current["bullets"].append(item)
+            elif target and target[-1].startswith("- ") and line[:1].islower():
+                # Wrapped bullet continuation
+                target[-1] += " " + line
+                if current and current["bullets"]:
+                    current["bullets"][-1] += " " + line
+            else:
+                target.append(line)
+
+    text = "\n".join(pages)
+
+    return {
+        "header": header,
+        "sections": sections,
+        "bullets": [b for section in sections for b in section["bullets"]],
+        "contacts": extract_contacts(text),
+        "pages": len(pages)
+    }
+
+
+def layout_to_text(layout):
+
+    # Compact rendering for prompts: headings, one line per entry, "- " bullets
+    parts = list(layout["header"])
+
+    for section in layout["sections"]:
+        parts.append("")
+        parts.append(section["heading"].upper())
+        parts.extend(section["lines"])
+
+    return "\n".join(parts).strip()
+
+
+def extract_resume_layout(file_bytes, mode="blocks", workers=None):
+
+    layout = parse_layout(extract_pages(file_bytes, mode, workers))
+    layout["text"] = layout_to_text(layout)
+    return layout
@@ -0,0 +1,200 @@
+# =========================================================
+# prompt_budget.py (PROMPT-SIZE REDUCTION BEFORE GENERATION)
+# =========================================================
+#
+# Shrinks the variable parts of the generation prompt: JD boilerplate
+# (EEO, benefits, application instructions) is dropped, repeated lines are
+# removed, user info is rendered as compact "key: value" lines instead of a
+# dict repr, and the resume is reduced to a section digest. Every part is
+# held to a token budget measured with the same local estimate used for
+# truncation reports.
+
+import os
+import re
+import math
+
+from pdf_extract import parse_layout, layout_to_text
+
+
+def estimate_tokens(text):
+    # ~4 characters per token holds well enough for English prompts
+    return math.ceil(len(text or "") / 4)
+
+
+DEFAULT_BUDGETS = {
+    "job_description": int(os.getenv("PROMPT_BUDGET_JD", 1500)),
+    "user_info": int(os.getenv("PROMPT_BUDGET_USER_INFO", 300)),
+    "resume_text": int(os.getenv("PROMPT_BUDGET_RESUME", 4000)),
+    "resume_section": int(os.getenv("PROMPT_BUDGET_RESUME_SECTION", 900)),
+}
+
+
+# =========================================================
+# JOB DESCRIPTION BOILERPLATE
+# =========================================================
+
+# Headings whose whole section is dropped
+BOILERPLATE_HEADING_RE = re.compile(
+    r"^(?:benefits|perks|perks (?:and|&) benefits|what we offer|why join us|"
+    r"our benefits|compensation (?:and|&) benefits|equal (?:employment )?opportunity|"
+    r"eeo statement|diversity(?:,? equity)?(?: (?:and|&) inclusion)?|"
+    r"how to apply|application process|privacy notice|disclaimer)\b",
+    re.IGNORECASE
+)
+
+# Sentences that are boilerplate wherever they appear. Benefits and
+# screening wording (insurance, 401k, background checks) is only dropped
+# with its heading's section, since it can also describe the work itself
+BOILERPLATE_SENTENCE_RE = re.compile(
+    r"\b(?:equal (?:employment )?opportunity (?:employer|workplace)|eeo|affirmative action|"
+    r"without regard to (?:race|color|religion|sex|gender|age|disability)|"
+    r"regardless of (?:race|gender|age)|protected veteran|sexual orientation|"
+    r"gender identity|national origin|reasonable accommodations?|e-verify|"
+    r"pay transparency|privacy (?:notice|policy)|recruitment agencies|"
+    r"unsolicited resumes)\b",
+    re.IGNORECASE
+)
+
+
+def _is_jd_heading(line):
+    text = line.strip()
+    words = text.rstrip(":").split()
+    if not words or len(words) > 6 or text.endswith("."):
+        return False
+    letters = [c for c in text if c.isalpha()]
+    return text.endswith(":") or bool(letters) and all(c.isupper() for c in letters)
+
+
+def _sentences(line):
+    return re.split(r"(?<=[.!?])\s+", line)
+
+
+def strip_jd_boilerplate(job_description):
+
+    kept = []
+    seen = set()
+    skipping = False
+
+    for raw in (job_description or "").splitlines():
+        line = re.sub(r"\s+", " ", raw).strip()
+        if not line:
+            continue
+
+        if _is_jd_heading(line) or BOILERPLATE_HEADING_RE.match(line.rstrip(":")):
+            skipping = bool(BOILERPLATE_HEADING_RE.match(line.rstrip(":")))
+            if skipping:
+                continue
+        elif skipping:
+            continue
+
+        # Pasted JDs often arrive as one paragraph, so filter per sentence
+        sentences = [s for s in _sentences(line) if not BOILERPLATE_SENTENCE_RE.search(s)]
+        line = " ".join(sentences).strip()
+
+        key = line.lower()
+        if not line or key in seen:
+            continue
+        seen.add(key)
+        kept.append(line)
+
+    return "\n".join(kept)
+
+
+# =========================================================
+# BUDGETS
+# =========================================================
+
+def truncate_to_budget(text, max_tokens):
+
+    # Cuts at the last line (or word) boundary that fits the budget
+    if estimate_tokens(text) <= max_tokens:
+        return text, False
+
+    limit = max_tokens * 4
+    cut = text[:limit]
+    boundary = cut.rfind("\n")
+    if boundary < limit // 2:
+        boundary = cut.rfind(" ")
+    return cut[:boundary if boundary > 0 else limit].rstrip(), True
+
+
+def compact_user_info(user_info):
+
+    lines = []
+    for key, value in (user_info or {}).items():
+        if isinstance(value, (list, tuple, set)):
+            value = ", ".join(str(v) for v in value if v)
+        elif isinstance(value, dict):
+            value = "; ".join(f"{k}: {v}" for k, v in value.items() if v)
+        value = re.sub(r"\s+", " ", str(value or "")).strip()
+        if value:
+            lines.append(f"{key}: {value}")
+
+    return "\n".join(lines)
+
+
+def resume_digest(resume_text, section_budget):
+
+    layout = parse_layout([resume_text or ""])
+    truncated = []
+
+    for section in layout["sections"]:
+        # Repeated lines (page headers, duplicated skills) carry no information
+        section["lines"] = list(dict.fromkeys(section["lines"]))
+        body, cut = truncate_to_budget("\n".join(section["lines"]), section_budget)
+        if cut:
+            truncated.append(section["heading"])
+        section["lines"] = body.splitlines()
+
+    layout["header"] = list(dict.fromkeys(layout["header"]))
+    return layout_to_text(layout), truncated
+
+
+# =========================================================
+# STAGE
+# =========================================================
+
+def compress_prompt_inputs(job_description, user_info, resume_text, budgets=None):
+
+    budgets = {**DEFAULT_BUDGETS, **(budgets or {})}
+
+    original = {
+        "job_description": job_description or "",
+        "user_info": str(user_info or {}),
+        "resume_text": resume_text or ""
+    }
+
+    jd, jd_cut = truncate_to_budget(
+        strip_jd_boilerplate(job_description), budgets["job_description"]
+    )
+    info, info_cut = truncate_to_budget(
+        compact_user_info(user_info), budgets["user_info"]
+    )
+    digest, cut_sections = resume_digest(resume_text, budgets["resume_section"])
+    digest, resume_cut = truncate_to_budget(digest, budgets["resume_text"])
+
+    compressed = {
+        "job_description": jd,
+        "user_info": info,
+        "resume_text": digest
+    }
+
+    before = {k: estimate_tokens(v) for k, v in original.items()}
+    after = {k: estimate_tokens(v) for k, v in compressed.items()}
+
+    report = {
+        "before_tokens": before,
+        "after_tokens": after,
+        "total_before": sum(before.values()),
+        "total_after": sum(after.values()),
+        "truncated": [
+            name for name, cut in (
+                ("job_description", jd_cut),
+                ("user_info", info_cut),
+                ("resume_text", resume_cut)
+            ) if cut
+        ],
+        "truncated_sections": cut_sections
+    }
+
+    return compressed, report
@@ -0,0 +1,101 @@
+# =========================================================
+# skills_lexicon.py (CURATED SKILL PHRASES FOR LOCAL ATS SCORING)
+# =========================================================
+
+# Lower-case phrases, tokenised the same way as agent.tokenize_for_matching.
+# Grouped by domain to mirror the role-adaptive skill categories the
+# generation prompt asks for. Ambiguous words ("go", "r", "ca", "spring",
+# "express") are left out on purpose to avoid false positives.
+
+TECH_SKILLS = {
+    # Languages
+    "python", "java", "javascript", "typescript", "c++", "c#", "golang",
+    "rust", "kotlin", "swift", "scala", "ruby", "php", "perl", "matlab",
+    "sql", "nosql", "bash", "shell scripting", "powershell", "html", "css",
+    # Frameworks & libraries
+    "react", "angular", "vue", "node.js", "express.js", "django", "flask",
+    "fastapi", "spring boot", ".net", "asp.net", "graphql",
+    "rest api", "rest apis", "restful", "microservices", "grpc",
+    "pandas", "numpy", "scikit-learn", "tensorflow", "pytorch", "keras",
+    "spark", "pyspark", "hadoop", "kafka", "airflow", "dbt", "langchain",
+    "langgraph", "streamlit", "hugging face", "opencv",
+    # Data & AI
+    "machine learning", "deep learning", "natural language processing",
+    "nlp", "computer vision", "data science", "data analysis",
+    "data engineering", "data visualization", "data modeling",
+    "data warehousing", "etl", "big data", "statistics",
+    "statistical modeling", "predictive modeling", "a/b testing",
+    "feature engineering", "mlops", "llm", "llms", "generative ai",
+    "prompt engineering", "rag", "time series", "recommendation systems",
+    # Databases
+    "postgresql", "mysql", "mongodb", "redis", "elasticsearch", "oracle",
+    "sql server", "snowflake", "bigquery", "redshift", "dynamodb",
+    "cassandra", "sqlite",
+    # Cloud & DevOps
+    "aws", "azure", "gcp", "google cloud", "docker", "kubernetes",
+    "terraform", "ansible", "jenkins", "ci/cd", "github actions", "gitlab",
+    "git", "linux", "devops", "serverless", "lambda", "ec2", "s3",
+    "cloudformation", "helm", "prometheus", "grafana", "observability",
+    "site reliability", "sre",
+    # Practices
+    "agile", "scrum", "kanban", "tdd", "unit testing", "test automation",
+    "selenium", "system design", "distributed systems", "api design",
+    "cybersecurity", "information security", "penetration testing",
+    "networking", "oauth", "jira", "confluence",
+    # BI tools
+    "tableau", "power bi", "looker", "excel", "advanced excel", "vba",
+}
+
+FINANCE_SKILLS = {
+    "financial analysis", "financial modeling", "financial modelling",
+    "financial reporting", "financial planning", "fp&a", "budgeting",
+    "forecasting", "variance analysis", "valuation", "dcf",
+    "investment banking", "equity research", "portfolio management",
+    "asset management", "wealth management", "risk management",
+    "credit risk", "credit risk modeling", "market risk", "operational risk",
+    "credit analysis", "underwriting", "treasury", "cash flow management",
+    "accounting", "bookkeeping", "accounts payable", "accounts receivable",
+    "general ledger", "reconciliation", "audit", "internal audit",
+    "statutory audit", "taxation", "gst", "tds", "income tax", "ifrs",
+    "gaap", "us gaap", "ind as", "sox", "regulatory compliance", "kyc",
+    "aml", "anti-money laundering", "basel", "sap", "sap fico",
+    "oracle financials", "tally", "quickbooks", "netsuite", "bloomberg",
+    "core banking", "loan processing", "mis reporting", "cost accounting",
+    "management accounting", "cpa", "cfa", "acca", "frm",
+}
+
+MARKETING_SKILLS = {
+    "digital marketing", "seo", "sem", "ppc", "google ads", "meta ads",
+    "facebook ads", "social media marketing", "content marketing",
+    "email marketing", "marketing automation", "hubspot", "marketo",
+    "salesforce", "crm", "google analytics", "ga4", "campaign management",
+    "campaign strategy", "brand management", "brand strategy",
+    "market research", "competitive analysis", "go-to-market",
+    "product marketing", "growth marketing", "performance marketing",
+    "conversion rate optimization", "copywriting", "public relations",
+    "influencer marketing", "affiliate marketing", "customer segmentation",
+    "lead generation", "demand generation", "b2b", "b2c", "ecommerce",
+}
+
+BUSINESS_SKILLS = {
+    "project management", "program management", "product management",
+    "stakeholder management", "vendor management", "change management",
+    "process improvement", "business analysis", "requirements gathering",
+    "business intelligence", "strategic planning", "operations management",
+    "supply chain", "supply chain management", "procurement", "logistics",
+    "inventory management", "lean", "six sigma", "kpi", "okrs", "pmp",
+    "prince2", "p&l management", "business development", "sales",
+    "account management", "customer success", "negotiation",
+    "team leadership", "people management", "cross-functional",
+    "recruitment", "talent acquisition", "onboarding", "payroll",
+    "performance management", "employee engagement", "hris", "workday",
+    "compensation and benefits", "learning and development",
+    "labor law", "employee relations",
+}
+
+SKILLS_LEXICON = frozenset(
+    TECH_SKILLS | FINANCE_SKILLS | MARKETING_SKILLS | BUSINESS_SKILLS
+)
+
+# Longest phrase in the lexicon, in tokens; bounds the n-gram window
+MAX_PHRASE_TOKENS = max(len(phrase.split()) for phrase in SKILLS_LEXICON)
@@ -0,0 +1,437 @@
+# =========================================================
+# soffice_pool.py (WARM LIBREOFFICE CONVERSION WORKERS)
+# =========================================================
+#
+# Each worker owns one long-lived headless soffice with its own profile
+# directory. Jobs reach it through a small UNO bridge process that reads
+# JSON lines on stdin and answers on stdout. The bridge needs a Python
+# that can `import uno` (Debian: python3-uno, usually /usr/bin/python3), so
+# this module only uses the standard library at import time.
+#
+# When no UNO-capable Python exists, workers fall back to one
+# `soffice --convert-to` per job. That is still bounded and profile-isolated,
+# but cold.
+
+import os
+import sys
+import json
+import time
+import uuid
+import queue
+import atexit
+import select
+import shutil
+import signal
+import tempfile
+import threading
+import subprocess
+from pathlib import Path
+
+
+def _rss_mb(pid):
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except (OSError, ValueError, IndexError):
+        pass
+    return 0.0
+
+
+def _tree_rss_mb(pid):
+
+    # The soffice launcher execs oosplash, which forks soffice.bin; the
+    # memory is in the children, so sum the whole process tree
+    children = {}
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                # "pid (comm) state ppid ..."; comm may contain spaces
+                ppid = int(f.read().rsplit(")", 1)[1].split()[1])
+        except (OSError, ValueError, IndexError):
+            continue
+        children.setdefault(ppid, []).append(int(entry))
+
+    total, pending = 0.0, [pid]
+    while pending:
+        current = pending.pop()
+        total += _rss_mb(current)
+        pending.extend(children.get(current, ()))
+    return total
+
+
+# =========================================================
+# UNO BRIDGE (RUNS UNDER A UNO-CAPABLE PYTHON)
+# =========================================================
+
+def _serve(profile_dir, soffice_bin, startup_timeout=60):
+
+    import uno
+    from com.sun.star.beans import PropertyValue
+    from com.sun.star.connection import NoConnectException
+
+    pipe_name = f"resumeforge_{uuid.uuid4().hex}"
+    office = subprocess.Popen([
+        soffice_bin,
+        "--headless",
+        "--invisible",
+        "--nologo",
+        "--norestore",
+        "--nodefault",
+        "--nolockcheck",
+        f"--accept=pipe,name={pipe_name};urp;StarOffice.ComponentContext",
+        f"-env:UserInstallation={Path(profile_dir).as_uri()}"
+    ], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+    local = uno.getComponentContext()
+    resolver = local.ServiceManager.createInstanceWithContext(
+        "com.sun.star.bridge.UnoUrlResolver", local
+    )
+
+    deadline = time.time() + startup_timeout
+    while True:
+        try:
+            ctx = resolver.resolve(
+                f"uno:pipe,name={pipe_name};urp;StarOffice.ComponentContext"
+            )
+            break
+        except NoConnectException:
+            if time.time() > deadline or office.poll() is not None:
+                print(json.dumps({"ready": False, "error": "soffice did not start"}), flush=True)
+                office.kill()
+                return
+            time.sleep(0.2)
+
+    desktop = ctx.ServiceManager.createInstanceWithContext(
+        "com.sun.star.frame.Desktop", ctx
+    )
+
+    def prop(name, value):
+        p = PropertyValue()
+        p.Name = name
+        p.Value = value
+        return p
+
+    print(json.dumps({"ready": True, "pid": office.pid}), flush=True)
+
+    for line in sys.stdin:
+        request = json.loads(line)
+
+        try:
+            if request["cmd"] == "convert":
+                doc = desktop.loadComponentFromURL(
+                    uno.systemPathToFileUrl(request["src"]),
+                    "_blank",
+                    0,
+                    (prop("Hidden", True),)
+                )
+                try:
+                    doc.storeToURL(
+                        uno.systemPathToFileUrl(request["dst"]),
+                        (prop("FilterName", "writer_pdf_Export"),)
+                    )
+                finally:
+                    doc.close(True)
+
+            elif request["cmd"] == "ping":
+                # Any round trip through the bridge proves soffice is responsive
+                desktop.getComponents()
+
+            reply = {"ok": True, "rss_mb": _tree_rss_mb(office.pid)}
+
+        except Exception as e:
+            reply = {"ok": False, "error": str(e), "rss_mb": _tree_rss_mb(office.pid)}
+
+        print(json.dumps(reply), flush=True)
+
+    try:
+        desktop.terminate()
+    except Exception:
+        pass
+    try:
+        office.wait(timeout=10)
+    except subprocess.TimeoutExpired:
+        office.kill()
+
+
+# =========================================================
+# WORKERS
+# =========================================================
+
+class WorkerError(Exception):
+    # The worker itself is dead, hung or unreachable; it gets replaced
+    pass
+
+
+class ConversionError(Exception):
+    # soffice is fine but could not load or export this document
+    pass
+
+
+class WarmSofficeWorker:
+    def __init__(self, uno_python, soffice_bin, startup_timeout=60):
+        self.profile_dir = tempfile.mkdtemp(prefix="lo_profile_")
+        self.jobs = 0
+        self.rss_mb = 0.0
+        self.idle_since = time.monotonic()
+        self.soffice_pid = None
+
+        self.proc = subprocess.Popen(
+            [uno_python, os.path.abspath(__file__), "--serve", self.profile_dir, soffice_bin],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            text=True,
+            bufsize=1,
+            # soffice (and the soffice.bin it forks) joins the bridge's process
+            # group, so close() can take the whole tree down
+            start_new_session=True
+        )
+
+        hello = self._read(startup_timeout)
+        if not hello.get("ready"):
+            self.close()
+            raise WorkerError(hello.get("error", "LibreOffice worker failed to start"))
+        self.soffice_pid = hello.get("pid")
+
+    def _read(self, timeout):
+        ready, _, _ = select.select([self.proc.stdout], [], [], timeout)
+        if not ready:
+            raise WorkerError("LibreOffice worker timed out")
+        line = self.proc.stdout.readline()
+        if not line:
+            raise WorkerError("LibreOffice worker exited")
+        return json.loads(line)
+
+    def _request(self, payload, timeout):
+        try:
+            self.proc.stdin.write(json.dumps(payload) + "\n")
+            self.proc.stdin.flush()
+        except (BrokenPipeError, OSError) as e:
+            raise WorkerError(f"LibreOffice worker is gone: {e}")
+
+        reply = self._read(timeout)
+        self.rss_mb = reply.get("rss_mb", self.rss_mb)
+        if not reply.get("ok"):
+            raise ConversionError(reply.get("error", "conversion failed"))
+        return reply
+
+    def convert(self, src_path, out_dir, timeout=60):
+        dst = os.path.join(out_dir, Path(src_path).stem + ".pdf")
+        self._request({"cmd": "convert", "src": src_path, "dst": dst}, timeout)
+        self.jobs += 1
+        return dst
+
+    def healthy(self, timeout=5):
+        if self.proc.poll() is not None:
+            return False
+        try:
+            self._request({"cmd": "ping"}, timeout)
+            return True
+        except (WorkerError, ConversionError):
+            return False
+
+    def close(self, graceful=True):
+        clean = False
+        if graceful and self.proc.poll() is None:
+            try:
+                self.proc.stdin.close()
+                clean = self.proc.wait(timeout=15) == 0
+            except Exception:
+                pass
+
+        # A hung or crashed bridge leaves soffice running; kill the whole
+        # group before removing the profile it may still be writing to
+        if not clean:
+            for kill, pid in ((os.killpg, self.proc.pid), (os.kill, self.soffice_pid)):
+                if pid:
+                    try:
+                        kill(pid, signal.SIGKILL)
+                    except (ProcessLookupError, PermissionError):
+                        pass
+            self.proc.wait()
+
+        shutil.rmtree(self.profile_dir, ignore_errors=True)
+
+
+class ColdSofficeWorker:
+    def __init__(self, soffice_bin):
+        self.soffice_bin = soffice_bin
+        self.profile_dir = tempfile.mkdtemp(prefix="lo_profile_")
+        self.jobs = 0
+        self.rss_mb = 0.0
+        self.idle_since = time.monotonic()
+
+    def convert(self, src_path, out_dir, timeout=60):
+        try:
+            subprocess.run([
+                self.soffice_bin,
+                "--headless",
+                f"-env:UserInstallation={Path(self.profile_dir).as_uri()}",
+                "--convert-to", "pdf",
+                src_path,
+                "--outdir", out_dir
+            ], check=True, timeout=timeout,
+                stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        except subprocess.CalledProcessError as e:
+            raise ConversionError(str(e))
+        except subprocess.SubprocessError as e:
+            raise WorkerError(str(e))
+
+        self.jobs += 1
+        return os.path.join(out_dir, Path(src_path).stem + ".pdf")
+
+    def healthy(self, timeout=5):
+        return shutil.which(self.soffice_bin) is not None
+
+    def close(self, graceful=True):
+        shutil.rmtree(self.profile_dir, ignore_errors=True)
+
+
+# =========================================================
+# POOL
+# =========================================================
+
+_UNO_PYTHON = None
+
+
+def find_uno_python():
+    global _UNO_PYTHON
+
+    if _UNO_PYTHON is None:
+        candidates = [
+            os.getenv("SOFFICE_PYTHON"),
+            sys.executable,
+            "/usr/bin/python3",
+            "/usr/lib/libreoffice/program/python",
+            "/opt/libreoffice/program/python"
+        ]
+        _UNO_PYTHON = ""
+        for candidate in candidates:
+            if not candidate or not os.path.exists(candidate):
+                continue
+            check = subprocess.run(
+                [candidate, "-c", "import uno"],
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL
+            )
+            if check.returncode == 0:
+                _UNO_PYTHON = candidate
+                break
+
+    return _UNO_PYTHON or None
+
+
+class SofficePool:
+    def __init__(self, size=2, max_jobs=50, max_rss_mb=600, timeout=60, soffice_bin="soffice", idle_check=30):
+        if shutil.which(soffice_bin) is None:
+            raise FileNotFoundError(soffice_bin)
+
+        self.size = size
+        self.max_jobs = max_jobs
+        self.max_rss_mb = max_rss_mb
+        self.timeout = timeout
+        self.idle_check = idle_check
+        self.soffice_bin = soffice_bin
+        self.uno_python = find_uno_python()
+
+        # Idle workers; the queue size is the concurrency bound. Workers are
+        # started lazily so an unused pool costs nothing.
+        self._idle = queue.Queue()
+        for _ in range(size):
+            self._idle.put(None)
+
+        self._lock = threading.Lock()
+        self._workers = set()
+        self._recycled = 0
+
+    @property
+    def mode(self):
+        return "warm" if self.uno_python else "cold"
+
+    def _spawn(self):
+        if self.uno_python:
+            worker = WarmSofficeWorker(self.uno_python, self.soffice_bin, self.timeout)
+        else:
+            worker = ColdSofficeWorker(self.soffice_bin)
+        with self._lock:
+            self._workers.add(worker)
+        return worker
+
+    def _retire(self, worker, graceful=True):
+        # Workers retired for failing are killed without waiting on them
+        with self._lock:
+            self._workers.discard(worker)
+            self._recycled += 1
+        worker.close(graceful)
+
+    def convert(self, src_path, out_dir):
+
+        worker = self._idle.get()
+
+        # A worker that sat idle may have wedged since its last job; ping it
+        # before trusting it with one
+        if worker is not None and time.monotonic() - worker.idle_since > self.idle_check:
+            if not worker.healthy():
+                self._retire(worker, graceful=False)
+                worker = None
+
+        try:
+            for attempt in range(2):
+                try:
+                    if worker is None:
+                        worker = self._spawn()
+                    return worker.convert(src_path, out_dir, self.timeout)
+                except WorkerError:
+                    # A wedged soffice is replaced once before giving up; a
+                    # ConversionError is the document's fault and passes through
+                    if worker is not None:
+                        self._retire(worker, graceful=False)
+                        worker = None
+                    if attempt:
+                        raise
+        finally:
+            if worker is not None and (
+                worker.jobs >= self.max_jobs or worker.rss_mb > self.max_rss_mb
+            ):
+                self._retire(worker)
+                worker = None
+            if worker is not None:
+                worker.idle_since = time.monotonic()
+            self._idle.put(worker)
+
+    def shutdown(self):
+        with self._lock:
+            workers = list(self._workers)
+            self._workers.clear()
+        for worker in workers:
+            worker.close()
+
+
+_POOL = None
+_POOL_LOCK = threading.Lock()
+
+
+def get_soffice_pool():
+    global _POOL
+
+    with _POOL_LOCK:
+        if _POOL is None:
+            _POOL = SofficePool(
+                size=int(os.getenv("SOFFICE_POOL_SIZE", 2)),
+                max_jobs=int(os.getenv("SOFFICE_MAX_JOBS", 50)),
+                max_rss_mb=float(os.getenv("SOFFICE_MAX_RSS_MB", 600)),
+                timeout=float(os.getenv("SOFFICE_TIMEOUT", 60)),
+                soffice_bin=os.getenv("SOFFICE_BIN", "soffice"),
+                idle_check=float(os.getenv("SOFFICE_IDLE_CHECK", 30))
+            )
+            atexit.register(_POOL.shutdown)
+        return _POOL
+
+
+if __name__ == "__main__":
+    if len(sys.argv) >= 4 and sys.argv[1] == "--serve":
+        _serve(sys.argv[2], sys.argv[3])
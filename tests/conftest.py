@@ -0,0 +1,6 @@
+import os
+import sys
+
+# Modules live at the repository root; tests never touch the on-disk caches
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("LLM_CACHE_MEMORY_ONLY", "1")
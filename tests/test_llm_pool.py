@@ -0,0 +1,84 @@
+import time
+
+import pytest
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+
+import agent
+
+
+class RateLimited(Exception):
+    status_code = 429
+
+
+class StubChatModel(BaseChatModel):
+    model: str = "stub"
+    fail: bool = False
+    calls: int = 0
+
+    @property
+    def _llm_type(self):
+        return "stub"
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        self.calls += 1
+        if self.fail:
+            raise RateLimited("429 Too Many Requests")
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=f"ok from {self.model}"))])
+
+
+@pytest.fixture
+def stub_providers():
+    models = {
+        "stub-limited": StubChatModel(model="limited", fail=True),
+        "stub-ok": StubChatModel(model="ok"),
+    }
+    for provider, model in models.items():
+        agent.register_chat_model(provider, lambda api_key, name, model=model: model)
+
+    yield models
+
+    for provider in models:
+        agent.CHAT_MODEL_FACTORIES.pop(provider, None)
+    agent.clear_llm_registry()
+
+
+def test_rate_limited_entry_fails_over_and_cools_down(stub_providers):
+    pool = agent.configure_llm_pool([
+        {"provider": "stub-limited", "api_key": "a", "model": "limited", "rpm": 60},
+        {"provider": "stub-ok", "api_key": "b", "model": "ok", "rpm": 60},
+    ])
+    limited, ok = pool.entries
+
+    response = pool.invoke("hello")
+
+    assert response.content == "ok from ok"
+    assert stub_providers["stub-limited"].calls == 1
+    assert stub_providers["stub-ok"].calls == 1
+
+    assert limited.failures == 1
+    assert limited.cooldown_until > time.time()
+    assert ok.failures == 0 and ok.cooldown_until == 0.0
+
+    # While cooling down the limited entry is skipped entirely
+    pool.invoke("again")
+    assert stub_providers["stub-limited"].calls == 1
+    assert stub_providers["stub-ok"].calls == 2
+
+
+class BadRequest(StubChatModel):
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        raise ValueError("bad request")
+
+
+def test_non_retryable_error_is_not_failed_over(stub_providers):
+    pool = agent.configure_llm_pool([
+        {"provider": "stub-ok", "api_key": "b", "model": "bad", "llm": BadRequest(model="bad")},
+        {"provider": "stub-ok", "api_key": "b", "model": "ok"},
+    ])
+
+    with pytest.raises(ValueError):
+        pool.invoke("hello")
+    assert stub_providers["stub-ok"].calls == 0
+    assert pool.entries[0].failures == 0
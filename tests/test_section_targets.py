@@ -0,0 +1,39 @@
+from agent import map_answers_to_sections
+
+
+RESUME = {
+    "experience": [
+        {"company": "Acme", "position": "Backend Developer"},
+        {"company": "Globex", "position": "SRE"},
+    ],
+    "technical_skills": {"Cloud": ["AWS"]},
+}
+
+
+def test_whole_section_target_absorbs_entry_targets():
+    answers = {
+        "What did you ship at Acme?": "The billing service at Acme",
+        "Have you worked with Kubernetes?": (
+            "Yes, I ran our Kubernetes clusters for two years, including "
+            "upgrades, autoscaling and on-call for the platform team"
+        ),
+    }
+
+    targets = map_answers_to_sections(RESUME, answers)
+
+    experience_keys = [k for k in targets if k.split("[")[0] == "experience"]
+    assert experience_keys == ["experience"]
+    assert len(targets["experience"]) == 2
+    assert "technical_skills" in targets
+
+
+def test_entry_answer_alone_targets_only_that_entry():
+    targets = map_answers_to_sections(RESUME, {"What did you ship at Acme?": "The billing service at Acme"})
+
+    assert list(targets) == ["experience[0]"]
+
+
+def test_short_team_answer_does_not_target_experience():
+    targets = map_answers_to_sections(RESUME, {"Have you worked with Kubernetes?": "Yes, on a side team."})
+
+    assert list(targets) == ["technical_skills"]
@@ -0,0 +1,376 @@
+# =========================================================
+# tracing.py (SPANS, JSON TRACE LOGS + PROMETHEUS METRICS)
+# =========================================================
+#
+# span(kind, name) times a block and collects attributes on it: tokens,
+# limiter wait, retries, cache hits, payload sizes. Spans nest through a
+# ContextVar, so model calls made inside a node carry its name and trace id.
+# This includes calls from worker threads that run in a copied context and
+# from asyncio tasks. Each finished span updates process-wide
+# Prometheus-style counters and histograms. When TRACE_LOG is set, it is
+# also written as one JSON line. Only sizes and counts are recorded, never
+# prompt, resume or response text.
+
+import os
+import sys
+import json
+import time
+import uuid
+import logging
+import threading
+import contextvars
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+# "stderr", a file path, or empty to keep spans in metrics only
+TRACE_LOG = os.getenv("TRACE_LOG", "")
+
+# {"model": [usd per 1M input tokens, usd per 1M output tokens]}
+LLM_PRICES = json.loads(os.getenv("LLM_PRICES", "{}") or "{}")
+
+DURATION_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 40, 60, 120)
+SIZE_BUCKETS = (1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+
+# =========================================================
+# METRICS
+# =========================================================
+
+class Metrics:
+    def __init__(self):
+        self._counters = {}
+        self._histograms = {}
+        self._help = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(name, labels):
+        return name, tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+    def inc(self, name, value=1, labels=None, help=""):
+        with self._lock:
+            key = self._key(name, labels or {})
+            self._counters[key] = self._counters.get(key, 0) + value
+            self._help.setdefault(name, (help, "counter"))
+
+    def observe(self, name, value, labels=None, buckets=DURATION_BUCKETS, help=""):
+        with self._lock:
+            key = self._key(name, labels or {})
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = {"buckets": buckets, "counts": [0] * len(buckets), "sum": 0.0, "count": 0}
+                self._histograms[key] = histogram
+
+            for i, bound in enumerate(buckets):
+                if value <= bound:
+                    histogram["counts"][i] += 1
+            histogram["sum"] += value
+            histogram["count"] += 1
+            self._help.setdefault(name, (help, "histogram"))
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "counters": [
+                    {"name": name, "labels": dict(labels), "value": value}
+                    for (name, labels), value in self._counters.items()
+                ],
+                "histograms": [
+                    {"name": name, "labels": dict(labels), "count": h["count"], "sum": round(h["sum"], 6)}
+                    for (name, labels), h in self._histograms.items()
+                ]
+            }
+
+    def render(self):
+
+        # Prometheus text exposition format
+        def fmt(labels, extra=()):
+            pairs = list(labels) + list(extra)
+            if not pairs:
+                return ""
+            return "{" + ",".join(f'{k}="{v}"' for k, v in pairs) + "}"
+
+        lines = []
+        with self._lock:
+            described = set()
+
+            def describe(name):
+                if name in described:
+                    return
+                described.add(name)
+                help_text, kind = self._help.get(name, ("", "untyped"))
+                if help_text:
+                    lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} {kind}")
+
+            for (name, labels), value in sorted(self._counters.items()):
+                describe(name)
+                lines.append(f"{name}{fmt(labels)} {value}")
+
+            for (name, labels), h in sorted(self._histograms.items()):
+                describe(name)
+                for bound, count in zip(h["buckets"], h["counts"]):
+                    lines.append(f"{name}_bucket{fmt(labels, [('le', bound)])} {count}")
+                lines.append(f"{name}_bucket{fmt(labels, [('le', '+Inf')])} {h['count']}")
+                lines.append(f"{name}_sum{fmt(labels)} {h['sum']}")
+                lines.append(f"{name}_count{fmt(labels)} {h['count']}")
+
+        return "\n".join(lines) + "\n"
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+
+METRICS = Metrics()
+
+
+def render_prometheus():
+    return METRICS.render()
+
+
+def metrics_snapshot():
+    return METRICS.snapshot()
+
+
+def reset_metrics():
+    METRICS.reset()
+
+
+def estimate_cost(model, input_tokens, output_tokens):
+    price = LLM_PRICES.get(model)
+    if not price:
+        return None
+    return (input_tokens * price[0] + output_tokens * price[1]) / 1_000_000
+
+
+# =========================================================
+# SPANS
+# =========================================================
+
+class Span:
+    def __init__(self, kind, name, parent=None, **attrs):
+        self.kind = kind
+        self.name = name
+        self.trace_id = parent.trace_id if parent else uuid.uuid4().hex[:16]
+        self.span_id = uuid.uuid4().hex[:8]
+        self.parent = parent
+        self.attrs = dict(attrs)
+        self.started_at = time.time()
+        self._start = time.perf_counter()
+        self.seconds = None
+        self._lock = threading.Lock()
+
+    def set(self, **attrs):
+        with self._lock:
+            self.attrs.update(attrs)
+
+    def add(self, key, value):
+        # Accumulates; threads of one node may add concurrently
+        with self._lock:
+            self.attrs[key] = self.attrs.get(key, 0) + value
+
+    def elapsed(self):
+        return time.perf_counter() - self._start
+
+    def to_dict(self):
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent.span_id if self.parent else None,
+            "kind": self.kind,
+            "name": self.name,
+            "started_at": round(self.started_at, 6),
+            "seconds": round(self.seconds, 6) if self.seconds is not None else None,
+            **self.attrs
+        }
+
+
+_CURRENT_SPAN = contextvars.ContextVar("trace_span", default=None)
+
+
+def current_span():
+    return _CURRENT_SPAN.get()
+
+
+def add_to_span(key, value):
+    span_ = _CURRENT_SPAN.get()
+    if span_ is not None:
+        span_.add(key, value)
+
+
+def set_on_span(**attrs):
+    span_ = _CURRENT_SPAN.get()
+    if span_ is not None:
+        span_.set(**attrs)
+
+
+def current_node():
+    # Name of the enclosing graph node, for labelling model calls
+    span_ = _CURRENT_SPAN.get()
+    while span_ is not None:
+        if span_.kind == "node":
+            return span_.name
+        span_ = span_.parent
+    return "direct"
+
+
+@contextmanager
+def span(kind, name, **attrs):
+
+    span_ = Span(kind, name, _CURRENT_SPAN.get(), **attrs)
+    token = _CURRENT_SPAN.set(span_)
+
+    try:
+        yield span_
+    except BaseException as e:
+        span_.set(status="error", error=type(e).__name__)
+        raise
+    else:
+        span_.attrs.setdefault("status", "ok")
+    finally:
+        _CURRENT_SPAN.reset(token)
+        span_.seconds = time.perf_counter() - span_._start
+        _finish(span_)
+
+
+def _finish(span_):
+
+    attrs = span_.attrs
+    labels = {"kind": span_.kind, "name": span_.name}
+
+    METRICS.observe(
+        "resumeforge_span_seconds", span_.seconds, labels,
+        help="Wall time per span"
+    )
+    if attrs.get("status") == "error":
+        METRICS.inc(
+            "resumeforge_span_errors_total", 1, {**labels, "error": attrs.get("error")},
+            help="Spans that raised"
+        )
+
+    if span_.kind == "llm":
+        _finish_llm(span_, labels)
+
+    for field in ("prompt_bytes", "response_bytes", "input_bytes", "output_bytes"):
+        if attrs.get(field) is not None:
+            METRICS.observe(
+                "resumeforge_payload_bytes", attrs[field], {**labels, "field": field},
+                buckets=SIZE_BUCKETS, help="Payload sizes per span"
+            )
+
+    # Waits and retries roll up to the enclosing node for its JSON line
+    if span_.kind == "llm" and span_.parent is not None:
+        for field in ("limiter_wait_seconds", "retries"):
+            if attrs.get(field):
+                span_.parent.add(field, attrs[field])
+
+    _emit(span_)
+
+
+def _finish_llm(span_, labels):
+
+    attrs = span_.attrs
+
+    METRICS.inc(
+        "resumeforge_llm_calls_total", 1,
+        {**labels, "cache": "hit" if attrs.get("cache_hit") else "miss"},
+        help="Model calls, by response-cache outcome"
+    )
+
+    for field in ("input_tokens", "cached_input_tokens", "output_tokens"):
+        if attrs.get(field):
+            METRICS.inc(
+                "resumeforge_llm_tokens_total", attrs[field],
+                {**labels, "type": field[:-len("_tokens")]},
+                help="Tokens reported by the provider"
+            )
+
+    if "limiter_wait_seconds" in attrs:
+        METRICS.observe(
+            "resumeforge_limiter_wait_seconds", attrs["limiter_wait_seconds"], labels,
+            help="Time spent waiting for rate-limit budget"
+        )
+
+    if attrs.get("retries"):
+        METRICS.inc(
+            "resumeforge_llm_retries_total", attrs["retries"], labels,
+            help="Failed attempts retried on another pool entry"
+        )
+
+    if attrs.get("cost_usd"):
+        METRICS.inc(
+            "resumeforge_llm_cost_usd_total", attrs["cost_usd"],
+            {**labels, "model": attrs.get("model")},
+            help="Estimated spend from LLM_PRICES"
+        )
+
+
+# =========================================================
+# JSON LOG EXPORT
+# =========================================================
+
+logger = logging.getLogger("resumeforge.trace")
+logger.propagate = False
+
+if TRACE_LOG:
+    _handler = (
+        logging.StreamHandler(sys.stderr) if TRACE_LOG == "stderr"
+        else logging.FileHandler(TRACE_LOG, encoding="utf-8")
+    )
+    _handler.setFormatter(logging.Formatter("%(message)s"))
+    logger.addHandler(_handler)
+    logger.setLevel(logging.INFO)
+
+
+def _emit(span_):
+    if logger.isEnabledFor(logging.INFO) and logger.handlers:
+        logger.info(json.dumps(span_.to_dict(), ensure_ascii=False, default=str))
+
+
+# =========================================================
+# /metrics ENDPOINT
+# =========================================================
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+
+        body = render_prometheus().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+_METRICS_SERVER = None
+_METRICS_SERVER_LOCK = threading.Lock()
+
+
+def start_metrics_server(port=None, host="0.0.0.0"):
+
+    # Idempotent, so Streamlit reruns do not try to bind twice
+    global _METRICS_SERVER
+
+    port = port or int(os.getenv("METRICS_PORT", 0))
+    if not port:
+        return None
+
+    with _METRICS_SERVER_LOCK:
+        if _METRICS_SERVER is None:
+            _METRICS_SERVER = ThreadingHTTPServer((host, port), _MetricsHandler)
+            threading.Thread(
+                target=_METRICS_SERVER.serve_forever,
+                daemon=True,
+                name="metrics-server"
+            ).start()
+        return _METRICS_SERVER